@@ -20,7 +20,12 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from components.dashboard_components import *
 from config.config import *
+from utils.escalation import start_auto_escalation
+from utils.funnel import funnel_from_states
 from utils.helpers import *
+from utils.ingest import start_order_ingest
+from utils.notifications import DASHBOARD_FEED
+from utils.sheets_sync import start_auto_sync
 
 # Cấu hình trang
 st.set_page_config(
@@ -71,9 +76,36 @@ st.markdown(
 )
 
 
+# Nhãn trục heatmap: 0 = thứ Hai ... 6 = Chủ nhật
+WEEKDAY_NAMES = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+
+# Khoảng dữ liệu cho trang tổng quan (số ngày tính từ đơn mới nhất)
+OVERVIEW_WINDOWS = {
+    "Toàn bộ lịch sử": None,
+    "7 ngày gần nhất": 7,
+    "30 ngày gần nhất": 30,
+    "90 ngày gần nhất": 90,
+}
+
+
 def main():
     """Main dashboard function"""
 
+    # Đồng bộ thống kê lên Google Sheets theo lịch (chỉ khởi động một lần)
+    start_auto_sync()
+    # Leo thang đơn mở quá lâu theo automation_rules.auto_escalation
+    start_auto_escalation()
+    # Nạp đơn mới từ data_processing.ingest_source, các trang đọc theo phiên bản dữ liệu
+    ingestor = start_order_ingest()
+
     # Header
     st.markdown(
         '<div class="main-header">🚀 Fulfillment Dashboard - Hệ thống ONE</div>',
@@ -92,6 +124,11 @@ def main():
 
         # Thời gian cập nhật
         st.info(f"⏰ Cập nhật lần cuối: {datetime.now().strftime('%H:%M:%S')}")
+        if ingestor is not None:
+            st.caption(
+                f"📡 Đã nạp {ingestor.stats['orders']:,} đơn mới"
+                f" (phiên bản dữ liệu {get_data_version(DATA_PATH)})"
+            )
 
         # Menu navigation
         menu_options = [
@@ -103,31 +140,53 @@ def main():
 
         selected_page = st.selectbox("Chọn trang", menu_options)
 
+        window_days = None
+        if selected_page == "📊 Tổng quan":
+            window_label = st.selectbox("Khoảng dữ liệu", list(OVERVIEW_WINDOWS))
+            window_days = OVERVIEW_WINDOWS[window_label]
+
+    # Trang cài đặt không cần dữ liệu đơn hàng
+    if selected_page == "⚙️ Cài đặt":
+        render_settings_page()
+        return
+
     # Load data
     try:
-        df = load_data(DATA_PATH)
-        if df is None:
+        start = None
+        if window_days:
+            _, latest = get_data_date_range(DATA_PATH)
+            if latest is not None:
+                start = (latest - timedelta(days=window_days - 1)).date()
+
+        # Lấy phiên bản trước khi tải để figure cache không giữ dữ liệu cũ
+        version = get_data_version(DATA_PATH)
+        # Các trang đọc cấu trúc dẫn xuất dựng sẵn, không tải lại dòng đơn hàng
+        if selected_page == "📋 Bảng dữ liệu":
+            data = load_filter_index(DATA_PATH)
+        else:
+            data = load_order_cube(DATA_PATH)
+        if data is None:
             st.error("❌ Không thể tải dữ liệu. Vui lòng kiểm tra file dữ liệu.")
             return
 
-        kpis = calculate_kpis(df)
-
     except Exception as e:
         st.error(f"❌ Lỗi: {e}")
         return
 
     # Main content based on selected page
     if selected_page == "📊 Tổng quan":
-        render_overview_page(df, kpis)
+        aggregates = data.cuboid(ORDER_AGGREGATE_KEYS)
+        # Toàn bộ lịch sử: số đơn theo trạng thái đọc từ bộ đếm của kho trạng thái
+        states = load_order_states(DATA_PATH) if start is None else None
+        kpis = calculate_kpis(None, aggregates, start=start, states=states)
+        render_overview_page(data, kpis, start, version)
     elif selected_page == "📈 Biểu đồ chi tiết":
-        render_charts_page(df)
+        render_charts_page(data, version, load_order_states(DATA_PATH))
     elif selected_page == "📋 Bảng dữ liệu":
-        render_data_page(df)
-    elif selected_page == "⚙️ Cài đặt":
-        render_settings_page()
+        render_data_page(data)
 
 
-def render_overview_page(df, kpis):
+def render_overview_page(cube, kpis, start=None, version=None):
     """Trang tổng quan"""
 
     # KPI Cards
@@ -136,12 +195,29 @@ def render_overview_page(df, kpis):
     st.markdown("---")
 
     # Performance charts
-    render_performance_charts(df)
+    render_performance_charts(None, cube, start, version)
 
     st.markdown("---")
 
     # Timeline
-    render_timeline_chart(df)
+    render_timeline_chart(None, cube.cuboid(ORDER_AGGREGATE_KEYS), start, version)
+
+    st.markdown("---")
+
+    # Mức trễ hạn SLA theo warning_levels
+    sla = load_sla_levels(DATA_PATH)
+    if sla is not None:
+        render_sla_breakdown(sla, start, version)
+
+        st.markdown("---")
+
+    # Cảnh báo theo alert_rules
+    alerts = load_order_alerts(DATA_PATH)
+    if alerts is not None:
+        render_alert_panel(alerts)
+    render_escalation_feed(DASHBOARD_FEED.recent(20))
+
+    st.markdown("---")
 
     # Thống kê nhanh
     st.markdown("## 📋 Thống Kê Nhanh")
@@ -178,89 +254,114 @@ def render_overview_page(df, kpis):
                 "Đơn hàng thấp nhất",
             ],
             "Giá trị": [
-                f"{df['order_value'].sum():,.0f} VND",
-                f"{df['order_value'].mean():,.0f} VND",
-                f"{df['order_value'].max():,.0f} VND",
-                f"{df['order_value'].min():,.0f} VND",
+                f"{kpis['total_value']:,.0f} VND",
+                f"{kpis['avg_order_value']:,.0f} VND",
+                f"{kpis['max_order_value']:,.0f} VND",
+                f"{kpis['min_order_value']:,.0f} VND",
             ],
         }
         st.dataframe(
             pd.DataFrame(value_stats), hide_index=True, use_container_width=True
         )
 
+    # Các chỉ số khai báo trong business_config.json
+    render_kpi_metrics(kpis, KPI_METRICS)
+
+
+def _hourly_figure(cube):
+    """Biểu đồ hiệu suất theo giờ"""
+    hourly = cube.query(["hour"])
+    hourly_data = pd.DataFrame(
+        {
+            "hour": hourly["hour"],
+            "order_id": hourly["orders"],
+            "is_confirmed_ontime": hourly["confirmed_ontime"] / hourly["orders"],
+        }
+    )
 
-def render_charts_page(df):
-    """Trang biểu đồ chi tiết"""
+    return px.bar(
+        hourly_data,
+        x="hour",
+        y="order_id",
+        title="Đơn hàng theo giờ trong ngày",
+        labels={"hour": "Giờ", "order_id": "Số đơn hàng"},
+    )
+
+
+def _heatmap_figure(cube):
+    """Biểu đồ heatmap theo ngày trong tuần"""
+    heatmap_data = cube.query(["weekday", "hour"])
+    heatmap_pivot = (
+        heatmap_data.pivot(index="weekday", columns="hour", values="orders")
+        .sort_index()
+        .fillna(0)
+    )
+    heatmap_pivot.index = [WEEKDAY_NAMES[day] for day in heatmap_pivot.index]
+
+    return px.imshow(
+        heatmap_pivot.values,
+        x=heatmap_pivot.columns,
+        y=heatmap_pivot.index,
+        title="Phân bố đơn hàng theo ngày & giờ",
+        color_continuous_scale="viridis",
+    )
+
+
+def _funnel_figure(states):
+    """Biểu đồ funnel theo status_flow: số đơn mỗi bước, trung vị thời gian giữa các bước"""
+    funnel = funnel_from_states(states)
+    funnel["duration"] = [
+        f"{hours:.1f} giờ từ {source}" if source else ""
+        for hours, source in zip(funnel["median_hours"], funnel["from_stage"])
+    ]
+    return px.funnel(
+        funnel,
+        x="orders",
+        y="stage",
+        hover_data={"conversion": ":.1f", "duration": True},
+        labels={
+            "orders": "Số đơn",
+            "stage": "Bước",
+            "conversion": "Chuyển đổi (%)",
+            "duration": "Trung vị",
+        },
+        title="Phễu chuyển đổi đơn hàng",
+    )
+
+
+def render_charts_page(cube, version=None, states=None):
+    """Trang biểu đồ chi tiết (đọc từ rollup cube, figure dùng chung qua cache)"""
     st.markdown("## 📈 Phân Tích Chi Tiết")
 
     # Advanced charts
     col1, col2 = st.columns(2)
 
     with col1:
-        # Biểu đồ hiệu suất theo giờ
-        hourly_perf = df.copy()
-        hourly_perf["hour"] = hourly_perf["order_date"].dt.hour
-        hourly_data = (
-            hourly_perf.groupby("hour")
-            .agg({"order_id": "count", "is_confirmed_ontime": "mean"})
-            .reset_index()
-        )
-
-        fig_hourly = px.bar(
-            hourly_data,
-            x="hour",
-            y="order_id",
-            title="Đơn hàng theo giờ trong ngày",
-            labels={"hour": "Giờ", "order_id": "Số đơn hàng"},
-        )
+        fig_hourly = cached_figure("hourly", version, {}, lambda: _hourly_figure(cube))
         st.plotly_chart(fig_hourly, use_container_width=True)
 
     with col2:
-        # Biểu đồ heatmap theo ngày trong tuần
-        df_copy = df.copy()
-        df_copy["weekday"] = df_copy["order_date"].dt.day_name()
-        df_copy["hour"] = df_copy["order_date"].dt.hour
-
-        heatmap_data = (
-            df_copy.groupby(["weekday", "hour"])["order_id"].count().reset_index()
-        )
-        heatmap_pivot = heatmap_data.pivot(
-            index="weekday", columns="hour", values="order_id"
-        ).fillna(0)
-
-        fig_heatmap = px.imshow(
-            heatmap_pivot.values,
-            x=heatmap_pivot.columns,
-            y=heatmap_pivot.index,
-            title="Phân bố đơn hàng theo ngày & giờ",
-            color_continuous_scale="viridis",
+        fig_heatmap = cached_figure(
+            "heatmap", version, {}, lambda: _heatmap_figure(cube)
         )
         st.plotly_chart(fig_heatmap, use_container_width=True)
 
     # Biểu đồ funnel
     st.markdown("### 🔄 Funnel Analysis")
-    funnel_data = {
-        "Stage": ["Đơn hàng tạo", "Đã xác nhận", "Đã giao hàng", "Hoàn thành"],
-        "Count": [
-            len(df),
-            len(df[df["status"] != "pending"]),
-            len(df[df["status"] == "delivered"]),
-            len(df[df["status"] == "delivered"]),
-        ],
-    }
-
-    fig_funnel = px.funnel(
-        pd.DataFrame(funnel_data),
-        x="Count",
-        y="Stage",
-        title="Phễu chuyển đổi đơn hàng",
-    )
-    st.plotly_chart(fig_funnel, use_container_width=True)
+    if states is not None:
+        # Sự kiện đổi trạng thái không đổi phiên bản dữ liệu, nên khóa theo revision
+        fig_funnel = cached_figure(
+            "funnel",
+            version,
+            {"revision": states.revision},
+            lambda: _funnel_figure(states),
+        )
+        st.plotly_chart(fig_funnel, use_container_width=True)
 
 
-def render_data_page(df):
+def render_data_page(index):
     """Trang dữ liệu chi tiết"""
-    render_detailed_table(df)
+    render_detailed_table(None, index)
 
 
 def render_settings_page():
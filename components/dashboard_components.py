@@ -3,12 +3,34 @@ Dashboard Components
 Các thành phần giao diện cho Dashboard
 """
 
+from datetime import datetime
+
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
 from plotly.subplots import make_subplots
 
+from config.config import (
+    CREDENTIALS_FILE,
+    GOOGLE_SHEETS_ENABLED,
+    PAGINATION,
+    SHEETS_CACHE_TTL,
+    SPREADSHEET_ID,
+)
+from utils.alerts import SEVERITY_ICONS
+from utils.figure_cache import cached_figure
+from utils.filter_index import DETAIL_COLUMNS, OrderFilterIndex
+from utils.kpi_engine import metric_level
+from utils.sheets_cache import (
+    CACHED_WORKSHEETS,
+    get_sheet_cache,
+    parse_duration_minutes,
+)
+from utils.sheets_session import get_session
+from utils.sheets_sync import STATS_WORKSHEET, get_stats_scheduler
+from utils.sla import SLA_STAGES
+
 
 def render_kpi_section(kpis):
     """Hiển thị section KPIs chính"""
@@ -44,59 +66,213 @@ def render_kpi_section(kpis):
         )
 
 
-def render_performance_charts(df):
-    """Hiển thị biểu đồ hiệu suất"""
+def render_kpi_metrics(kpis, metric_definitions):
+    """Bảng các chỉ số KPI theo cấu hình nghiệp vụ"""
+    st.markdown("### 📐 Chỉ Số Theo Cấu Hình")
+
+    level_icons = {
+        "good": "✅",
+        "off_target": "🔸",
+        "warning": "⚠️",
+        "critical": "❌",
+        None: "—",
+    }
+    units = {
+        "percent": lambda v: f"{v:.1f}%",
+        "days": lambda v: f"{v:.1f} ngày",
+        "currency": lambda v: f"{v:,.0f} VND",
+        "score": lambda v: f"{v:.1f}",
+    }
+
+    rows = []
+    definitions = sorted(
+        metric_definitions.items(), key=lambda item: item[1].get("display_order", 0)
+    )
+    for key, definition in definitions:
+        value = kpis["metrics"].get(key)
+        fmt = units.get(definition.get("unit"), lambda v: f"{v:,.2f}")
+        rows.append(
+            {
+                "Chỉ số": definition["name"],
+                "Mục tiêu": fmt(definition["target"]),
+                "Thực tế": fmt(value) if value is not None else "Chưa có dữ liệu",
+                "Trạng thái": level_icons[metric_level(value, definition)],
+            }
+        )
+
+    st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+    st.caption(
+        "✅ đạt mục tiêu · 🔸 chưa đạt mục tiêu · ⚠️ chạm ngưỡng cảnh báo"
+        " · ❌ chạm ngưỡng nghiêm trọng"
+    )
+
+
+def render_alert_panel(alerts, limit=20):
+    """Cảnh báo theo alert_rules (các rule gửi tới kênh dashboard)"""
+    st.markdown("### 🚨 Cảnh Báo")
+
+    summary = alerts.summary(channel="dashboard")
+    if summary.empty:
+        st.info("Không có quy tắc cảnh báo nào cho dashboard")
+        return
+
+    columns = st.columns(len(summary))
+    for column, row in zip(columns, summary.itertuples(index=False)):
+        icon = SEVERITY_ICONS.get(row.severity, "")
+        column.metric(f"{icon} {row.name}", f"{row.orders:,}")
+
+    if alerts.skipped:
+        skipped = ", ".join(
+            f"{alerts.rules[key].name} (thiếu {', '.join(names)})"
+            for key, names in alerts.skipped.items()
+        )
+        st.caption(f"Bỏ qua do dữ liệu không có cột cần thiết: {skipped}")
+
+    table = alerts.table(channel="dashboard", limit=limit)
+    if table.empty:
+        st.success("✅ Không có đơn hàng nào cần cảnh báo")
+        return
+
+    display = pd.DataFrame(
+        {
+            "Mức độ": table["severity"].map(
+                lambda severity: f"{SEVERITY_ICONS.get(severity, '')} {severity}"
+            ),
+            "Cảnh báo": table["alert"],
+            "Mã đơn": table["order_id"],
+            "Ngày đặt": table["order_date"].dt.strftime("%d/%m/%Y %H:%M"),
+            "Trạng thái": table["status"],
+            "Vùng": table["region"],
+            "Giá trị": _format_vnd(table["order_value"]),
+            "Số ngày": table["days_since_order"],
+        }
+    )
+    st.dataframe(display, hide_index=True, use_container_width=True)
+    st.caption(f"{len(table)} / {alerts.total:,} cảnh báo, nghiêm trọng và lâu nhất trước")
+
+
+def render_escalation_feed(events):
+    """Các lần leo thang gần nhất (kênh dashboard của automation_rules.auto_escalation)"""
+    if not events:
+        return
+    with st.expander(f"⏫ Leo thang gần đây ({len(events)})"):
+        st.dataframe(
+            pd.DataFrame(
+                {
+                    "Mã đơn": [event.order_id for event in events],
+                    "Cấp": [event.level for event in events],
+                    "Chuyển tới": [event.escalate_to for event in events],
+                    "Tới hạn": [
+                        event.due_at.strftime("%d/%m/%Y %H:%M") for event in events
+                    ],
+                    "Số giờ mở": [round(event.hours_open, 1) for event in events],
+                }
+            ),
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
+def _status_pie_figure(df, cube=None, start=None):
+    """Figure phân bố trạng thái đơn hàng"""
+    # Đọc từ rollup cube nếu có, không phải duyệt lại từng đơn hàng
+    if cube is not None:
+        status_counts = (
+            cube.query(["status"], start)
+            .set_index("status")["orders"]
+            .sort_values(ascending=False)
+        )
+    else:
+        status_counts = df["status"].value_counts()
+
+    return px.pie(
+        values=status_counts.values,
+        names=status_counts.index,
+        title="Phân bố trạng thái đơn hàng",
+        color_discrete_map={
+            "confirmed": "#2ca02c",
+            "delivered": "#1f77b4",
+            "cancelled": "#d62728",
+            "pending": "#ff7f0e",
+        },
+    )
+
+
+def _region_bar_figure(df, cube=None, start=None):
+    """Figure số đơn hàng theo vùng"""
+    if cube is not None:
+        region_data = cube.query(["region"], start).rename(
+            columns={"orders": "order_id"}
+        )[["region", "order_id"]]
+    else:
+        region_data = (
+            df.groupby("region", observed=True)["order_id"].count().reset_index()
+        )
+
+    fig_bar = px.bar(
+        region_data,
+        x="region",
+        y="order_id",
+        title="Đơn hàng theo vùng",
+        color="order_id",
+        color_continuous_scale="viridis",
+    )
+    fig_bar.update_layout(xaxis_title="Vùng", yaxis_title="Số đơn hàng")
+    return fig_bar
+
+
+def render_performance_charts(df, cube=None, start=None, version=None):
+    """Hiển thị biểu đồ hiệu suất (version: phiên bản dữ liệu của cube để cache)"""
     st.markdown("## 📈 Biểu Đồ Hiệu Suất")
 
     col1, col2 = st.columns(2)
 
     with col1:
         # Biểu đồ trạng thái đơn hàng
-        status_counts = df["status"].value_counts()
-        fig_pie = px.pie(
-            values=status_counts.values,
-            names=status_counts.index,
-            title="Phân bố trạng thái đơn hàng",
-            color_discrete_map={
-                "confirmed": "#2ca02c",
-                "delivered": "#1f77b4",
-                "cancelled": "#d62728",
-                "pending": "#ff7f0e",
-            },
+        fig_pie = cached_figure(
+            "performance_status_pie",
+            version,
+            {"start": start},
+            lambda: _status_pie_figure(df, cube, start),
         )
         st.plotly_chart(fig_pie, use_container_width=True)
 
     with col2:
         # Biểu đồ theo vùng
-        region_data = df.groupby("region")["order_id"].count().reset_index()
-        fig_bar = px.bar(
-            region_data,
-            x="region",
-            y="order_id",
-            title="Đơn hàng theo vùng",
-            color="order_id",
-            color_continuous_scale="viridis",
-        )
-        fig_bar.update_layout(xaxis_title="Vùng", yaxis_title="Số đơn hàng")
+        fig_bar = cached_figure(
+            "performance_region_bar",
+            version,
+            {"start": start},
+            lambda: _region_bar_figure(df, cube, start),
+        )
         st.plotly_chart(fig_bar, use_container_width=True)
 
 
-def render_timeline_chart(df):
-    """Biểu đồ timeline đơn hàng"""
-    st.markdown("## ⏰ Timeline Đơn Hàng")
-
-    # Nhóm theo ngày
-    daily_orders = (
-        df.groupby(df["order_date"].dt.date)
-        .agg(
+def _timeline_figure(df, aggregates=None, start=None):
+    """Figure timeline số đơn và tỷ lệ đúng hạn theo ngày"""
+    # Nhóm theo ngày (lấy từ bảng tổng hợp sẵn nếu có)
+    if aggregates is not None:
+        daily = aggregates.rollup(["day"], start=start)
+        daily_orders = pd.DataFrame(
             {
-                "order_id": "count",
-                "is_confirmed_ontime": "mean",
-                "is_delivered_ontime": "mean",
+                "order_date": daily["day"].dt.date,
+                "order_id": daily["orders"],
+                "is_confirmed_ontime": daily["confirmed_ontime"] / daily["orders"],
+                "is_delivered_ontime": daily["delivered_ontime"] / daily["orders"],
             }
         )
-        .reset_index()
-    )
+    else:
+        daily_orders = (
+            df.groupby(df["order_date"].dt.date)
+            .agg(
+                {
+                    "order_id": "count",
+                    "is_confirmed_ontime": "mean",
+                    "is_delivered_ontime": "mean",
+                }
+            )
+            .reset_index()
+        )
 
     # Tạo subplot với 2 trục y
     fig = make_subplots(
@@ -148,71 +324,182 @@ def render_timeline_chart(df):
     fig.update_xaxes(title_text="Ngày", row=2, col=1)
     fig.update_yaxes(title_text="Số đơn hàng", row=1, col=1)
     fig.update_yaxes(title_text="Tỷ lệ (%)", row=2, col=1)
+    return fig
+
+
+def render_timeline_chart(df, aggregates=None, start=None, version=None):
+    """Biểu đồ timeline đơn hàng"""
+    st.markdown("## ⏰ Timeline Đơn Hàng")
 
+    fig = cached_figure(
+        "timeline",
+        version,
+        {"start": start},
+        lambda: _timeline_figure(df, aggregates, start),
+    )
     st.plotly_chart(fig, use_container_width=True)
 
 
-def render_detailed_table(df):
-    """Bảng chi tiết đơn hàng"""
+def _sla_region_figure(sla, start=None):
+    """Biểu đồ cột chồng số đơn theo vùng và mức trễ hạn"""
+    by_region = sla.by_region(start=start)
+    fig = go.Figure()
+    for level in sla.levels.names:
+        fig.add_trace(
+            go.Bar(
+                x=by_region.index,
+                y=by_region[level],
+                name=level,
+                marker_color=sla.levels.color(level),
+            )
+        )
+    fig.update_layout(
+        barmode="stack",
+        title="Mức trễ hạn theo vùng",
+        xaxis_title="Vùng",
+        yaxis_title="Số đơn hàng",
+    )
+    return fig
+
+
+def render_sla_breakdown(sla, start=None, version=None):
+    """Phân bố đơn hàng theo mức trễ hạn (warning_levels) của từng giai đoạn"""
+    st.markdown("## ⏱️ Mức Độ Trễ Hạn SLA")
+
+    breakdown = sla.breakdown(start=start)
+    total = int(breakdown["overall"].sum())
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        rows = []
+        for level, counts in breakdown.iterrows():
+            settings = sla.levels.settings[level]
+            low, high = settings.get("min_delay_days"), settings.get("max_delay_days")
+            if high is not None and high >= 999:
+                days = f"≥ {low}"
+            else:
+                days = f"{low}" if low == high else f"{low}–{high}"
+            row = {"Mức": level, "Số ngày trễ": days}
+            for stage, label in SLA_STAGES:
+                share = counts[stage] / total * 100 if total else 0
+                row[label] = f"{counts[stage]:,} ({share:.1f}%)"
+            rows.append(row)
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        st.caption(
+            "Trễ hạn tính theo confirmation_deadlines (mức ưu tiên) và thời hạn"
+            " giao của nhóm vùng trong region_rules, làm tròn lên theo ngày"
+        )
+
+    with col2:
+        fig = cached_figure(
+            "sla_region",
+            version,
+            {"start": start},
+            lambda: _sla_region_figure(sla, start),
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def render_detailed_table(df, index=None):
+    """Bảng chi tiết đơn hàng (lọc qua chỉ mục, chỉ lấy ra các dòng khớp)"""
     st.markdown("## 📋 Chi Tiết Đơn Hàng")
 
+    if index is None:
+        index = OrderFilterIndex(df[list(DETAIL_COLUMNS)])
+    min_date, max_date = index.date_bounds()
+    if min_date is None:
+        st.info("Chưa có đơn hàng nào để hiển thị")
+        return
+
     # Bộ lọc
     col1, col2, col3 = st.columns(3)
 
     with col1:
         status_filter = st.selectbox(
-            "Lọc theo trạng thái", options=["Tất cả"] + list(df["status"].unique())
+            "Lọc theo trạng thái", options=["Tất cả"] + index.values("status")
         )
 
     with col2:
         region_filter = st.selectbox(
-            "Lọc theo vùng", options=["Tất cả"] + list(df["region"].unique())
+            "Lọc theo vùng", options=["Tất cả"] + index.values("region")
         )
 
     with col3:
         date_range = st.date_input(
             "Chọn khoảng thời gian",
-            value=[df["order_date"].min().date(), df["order_date"].max().date()],
-            min_value=df["order_date"].min().date(),
-            max_value=df["order_date"].max().date(),
+            value=[min_date.date(), max_date.date()],
+            min_value=min_date.date(),
+            max_value=max_date.date(),
         )
 
-    # Áp dụng bộ lọc
-    filtered_df = df.copy()
+    # Áp dụng bộ lọc: khoảng ngày là tìm kiếm nhị phân, trạng thái/vùng là chỉ mục
+    start, end = date_range if len(date_range) == 2 else (None, None)
+    positions = index.query(
+        start,
+        end,
+        status=None if status_filter == "Tất cả" else status_filter,
+        region=None if region_filter == "Tất cả" else region_filter,
+    )
 
-    if status_filter != "Tất cả":
-        filtered_df = filtered_df[filtered_df["status"] == status_filter]
+    # Sắp xếp và phân trang phía server
+    sort_options = {
+        "Ngày đặt hàng": "order_date",
+        "Mã đơn hàng": "order_id",
+        "Giá trị đơn hàng": "order_value",
+    }
+    page_sizes = [
+        size
+        for size in PAGINATION["page_size_options"]
+        if size <= PAGINATION["max_page_size"]
+    ] or [PAGINATION["max_page_size"]]
+    default_size = min(PAGINATION["default_page_size"], PAGINATION["max_page_size"])
+    if default_size not in page_sizes:
+        page_sizes = sorted(page_sizes + [default_size])
 
-    if region_filter != "Tất cả":
-        filtered_df = filtered_df[filtered_df["region"] == region_filter]
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        sort_label = st.selectbox("Sắp xếp theo", options=list(sort_options))
+    with col2:
+        order_label = st.selectbox("Thứ tự", options=["Tăng dần", "Giảm dần"])
+    descending = order_label == "Giảm dần"
+    with col3:
+        page_size = st.selectbox(
+            "Số dòng mỗi trang",
+            options=page_sizes,
+            index=page_sizes.index(default_size),
+        )
+    total_pages = max(1, -(-len(positions) // page_size))
+    with col4:
+        page = st.number_input(
+            "Trang", min_value=1, max_value=total_pages, value=1, step=1
+        )
 
-    if len(date_range) == 2:
-        filtered_df = filtered_df[
-            (filtered_df["order_date"].dt.date >= date_range[0])
-            & (filtered_df["order_date"].dt.date <= date_range[1])
-        ]
+    ordered = index.sort(positions, sort_options[sort_label], descending)
+    first = (page - 1) * page_size
+    page_positions = ordered[first : first + page_size]
 
-    # Hiển thị bảng
-    display_df = filtered_df[
-        [
-            "order_id",
-            "order_date",
-            "status",
-            "region",
-            "order_value",
-            "is_confirmed_ontime",
-            "is_delivered_ontime",
-        ]
-    ].copy()
+    # Hiển thị bảng: chỉ lấy và định dạng các dòng của trang hiện tại
+    display_df = index.rows(page_positions, DETAIL_COLUMNS)
     display_df["order_date"] = display_df["order_date"].dt.strftime("%Y-%m-%d %H:%M")
-    display_df["order_value"] = display_df["order_value"].apply(
-        lambda x: f"{x:,.0f} VND"
-    )
+    display_df["order_value"] = _format_vnd(display_df["order_value"])
 
     st.dataframe(display_df, use_container_width=True, hide_index=True)
 
-    st.info(f"Hiển thị {len(filtered_df)} đơn hàng (từ tổng {len(df)} đơn)")
+    if len(positions):
+        st.info(
+            f"Trang {page}/{total_pages}: đơn {first + 1}–{first + len(page_positions)}"
+            f" trong {len(positions)} đơn hàng (từ tổng {len(index)} đơn)"
+        )
+    else:
+        st.info(f"Không có đơn hàng nào khớp bộ lọc (từ tổng {len(index)} đơn)")
+
 
+def _format_vnd(values):
+    """Định dạng tiền VND theo cả cột (thêm dấu phân cách hàng nghìn)"""
+    digits = values.round().astype("int64").astype(str)
+    grouped = digits.str.replace(r"\B(?=(\d{3})+(?!\d))", ",", regex=True)
+    return grouped + " VND"
 
 
 def render_settings_panel():
@@ -276,13 +563,32 @@ def render_sla_settings():
     with col2:
         st.markdown("**📋 Quy tắc SLA theo loại đơn**")
 
-        # Bảng SLA rules
-        sla_data = {
-            "Loại đơn": ["Đơn thường", "Đơn ưu tiên", "Đơn VIP", "Đơn khẩn cấp"],
-            "Xác nhận (phút)": [30, 15, 10, 5],
-            "Giao hàng (giờ)": [24, 12, 6, 2],
-            "Ưu tiên": ["Thấp", "Trung bình", "Cao", "Khẩn cấp"]
-        }
+        # Bảng SLA rules: đọc từ cache của sheet "Quy tắc SLA" (không chờ mạng),
+        # dùng bảng mặc định khi cache chưa có dữ liệu
+        cache = _sheet_cache()
+        rules = cache.sla_rules(wait=False) if cache else []
+        priority_options = ["Thấp", "Trung bình", "Cao", "Khẩn cấp"]
+        if rules:
+            sla_data = {
+                "Loại đơn": [rule["loai_don"] for rule in rules],
+                "Xác nhận (phút)": [
+                    parse_duration_minutes(rule["thoi_gian_xac_nhan"]) for rule in rules
+                ],
+                "Giao hàng (giờ)": [
+                    _duration_hours(rule["thoi_gian_giao_hang"]) for rule in rules
+                ],
+                "Ưu tiên": [rule["muc_do_uu_tien"] for rule in rules]
+            }
+            priority_options += [
+                p for p in dict.fromkeys(sla_data["Ưu tiên"]) if p not in priority_options
+            ]
+        else:
+            sla_data = {
+                "Loại đơn": ["Đơn thường", "Đơn ưu tiên", "Đơn VIP", "Đơn khẩn cấp"],
+                "Xác nhận (phút)": [30, 15, 10, 5],
+                "Giao hàng (giờ)": [24, 12, 6, 2],
+                "Ưu tiên": ["Thấp", "Trung bình", "Cao", "Khẩn cấp"]
+            }
 
         sla_df = pd.DataFrame(sla_data)
         edited_sla = st.data_editor(
@@ -293,12 +599,13 @@ def render_sla_settings():
                 "Giao hàng (giờ)": st.column_config.NumberColumn("Giao hàng (giờ)", min_value=1),
                 "Ưu tiên": st.column_config.SelectboxColumn(
                     "Ưu tiên",
-                    options=["Thấp", "Trung bình", "Cao", "Khẩn cấp"]
+                    options=priority_options
                 )
             },
             hide_index=True,
             use_container_width=True
         )
+        _render_sheet_cache_status(cache)
 
     # Nút lưu cài đặt SLA
     if st.button("💾 Lưu cài đặt SLA", type="primary"):
@@ -361,8 +668,19 @@ def render_google_sheets_settings():
                     st.info(f"Mở worksheet: {ws}")
             with col_ws3:
                 if st.button("🔄", key=f"sync_{ws}", help="Đồng bộ worksheet"):
+                    cache = _sheet_cache()
+                    if cache and ws in CACHED_WORKSHEETS:
+                        # Tải lại ở luồng nền, lần render sau sẽ có dữ liệu mới
+                        cache.invalidate()
+                        cache.refresh_async()
+                    scheduler = get_stats_scheduler()
+                    if scheduler and ws == STATS_WORKSHEET:
+                        # Đẩy thống kê ở luồng nền, chỉ ghi các dòng đã đổi
+                        scheduler.trigger()
                     st.success(f"Đã đồng bộ: {ws}")
 
+        _render_sheet_cache_status(_sheet_cache())
+
     # Action buttons
     col_btn1, col_btn2, col_btn3 = st.columns(3)
 
@@ -379,6 +697,33 @@ def render_google_sheets_settings():
             st.markdown("🔗 [Mở Google Sheets](https://docs.google.com/spreadsheets/d/1xdfAEgbvDee_oJFwzb8bWW9ONmYO3RbQJ3Oscbmm5Uc)")
 
 
+def _sheet_cache():
+    """Cache các sheet SLA / cấu hình (None nếu tắt tích hợp Google Sheets)"""
+    if not (GOOGLE_SHEETS_ENABLED and SPREADSHEET_ID):
+        return None
+    session = get_session(SPREADSHEET_ID, CREDENTIALS_FILE or None)
+    return get_sheet_cache(session, ttl=SHEETS_CACHE_TTL)
+
+
+def _duration_hours(text):
+    """'24 giờ' / '30 phút' -> số giờ (None nếu không đọc được)"""
+    minutes = parse_duration_minutes(text)
+    return None if minutes is None else minutes / 60
+
+
+def _render_sheet_cache_status(cache):
+    """Dòng trạng thái cho dữ liệu đọc từ cache Google Sheets"""
+    if cache is None:
+        return
+    if cache.updated_at:
+        updated = datetime.fromtimestamp(cache.updated_at).strftime("%H:%M:%S %d/%m/%Y")
+        st.caption(f"📊 Dữ liệu Google Sheets cập nhật lúc {updated}")
+    elif cache.last_error is not None:
+        st.caption(f"⚠️ Chưa đọc được Google Sheets: {cache.last_error}")
+    else:
+        st.caption("🔄 Đang tải dữ liệu từ Google Sheets...")
+
+
 def render_notification_settings():
     """Cài đặt thông báo"""
     st.markdown("### 🔔 Cài đặt Thông báo")
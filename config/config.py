@@ -10,6 +10,7 @@ from pathlib import Path
 # Load system configuration from JSON
 CONFIG_DIR = Path(__file__).parent
 SYSTEM_CONFIG_PATH = CONFIG_DIR / "system_config.json"
+BUSINESS_CONFIG_PATH = CONFIG_DIR / "business_config.json"
 
 
 def load_system_config():
@@ -25,6 +26,19 @@ def load_system_config():
         return {}
 
 
+def load_business_config():
+    """Load business rules and KPI definitions from JSON file"""
+    try:
+        with open(BUSINESS_CONFIG_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"⚠️  Warning: {BUSINESS_CONFIG_PATH} not found, using defaults")
+        return {}
+    except json.JSONDecodeError as e:
+        print(f"❌ Error parsing {BUSINESS_CONFIG_PATH}: {e}")
+        return {}
+
+
 # Load .env if present
 try:
     from dotenv import load_dotenv
@@ -35,6 +49,7 @@ except Exception:
 
 # Load system config
 SYSTEM_CONFIG = load_system_config()
+BUSINESS_CONFIG = load_business_config()
 
 
 # Extract environment variables
@@ -76,6 +91,20 @@ ENABLE_FAST_MODE = SYSTEM_CONFIG.get("data_processing", {}).get(
 EXPORT_FORMATS = SYSTEM_CONFIG.get("data_processing", {}).get(
     "export_formats", ["json", "excel"]
 )
+# "parquet": đọc phân vùng cần thiết; "mmap": memory-map file Arrow IPC,
+# dùng chung bộ nhớ giữa nhiều tiến trình Streamlit
+SNAPSHOT_READ_MODE = SYSTEM_CONFIG.get("data_processing", {}).get(
+    "snapshot_read_mode", "parquet"
+)
+# Giới hạn bộ nhớ cho cache biểu đồ dùng chung giữa các phiên (MB)
+FIGURE_CACHE_MAX_MB = SYSTEM_CONFIG.get("data_processing", {}).get(
+    "figure_cache_max_mb", 64
+)
+# File nguồn (CSV / NDJSON ghi nối thêm) để nạp đơn mới theo luồng, rỗng: tắt
+INGEST_SOURCE = SYSTEM_CONFIG.get("data_processing", {}).get("ingest_source", "")
+INGEST_INTERVAL_SECONDS = SYSTEM_CONFIG.get("data_processing", {}).get(
+    "ingest_interval_seconds", 5
+)
 
 # Notifications
 EMAIL_ENABLED = (
@@ -110,6 +139,8 @@ CREDENTIALS_FILE = os.getenv(
     SYSTEM_CONFIG.get("google_sheets", {}).get("credentials_file", "config/service_account.json"),
 )
 AUTO_SYNC = SYSTEM_CONFIG.get("google_sheets", {}).get("auto_sync", True)
+# Thời gian giữ cache các sheet SLA / cấu hình trước khi kiểm tra lại revision
+SHEETS_CACHE_TTL = SYSTEM_CONFIG.get("google_sheets", {}).get("cache_ttl_seconds", 300)
 WORKSHEETS = SYSTEM_CONFIG.get("google_sheets", {}).get("worksheets", {})
 
 # Dashboard Settings (legacy compatibility)
@@ -124,6 +155,53 @@ KPI_THRESHOLDS = {
     "pending_hours_limit": 12,  # Tối đa 12 giờ chờ
 }
 
+# KPI definitions (business_config.json)
+KPI_METRICS = BUSINESS_CONFIG.get("kpi_metrics", {})
+
+# Quy tắc nghiệp vụ (business_config.json business_rules)
+BUSINESS_RULES = BUSINESS_CONFIG.get("business_rules", {})
+
+
+def _rule_section(name):
+    """Một mục của business_rules, bỏ khóa mô tả"""
+    section = BUSINESS_RULES.get(name, {})
+    return {key: value for key, value in section.items() if key != "description"}
+
+
+PRIORITY_RULES = _rule_section("priority_rules")
+# Tên cột trong điều kiện rule -> cột dữ liệu (business_rules.column_aliases)
+COLUMN_ALIASES = _rule_section("column_aliases")
+# Thời hạn xác nhận (ngày, theo mức ưu tiên) và giao hàng (ngày, theo hình thức giao)
+CONFIRMATION_DEADLINES = _rule_section("confirmation_deadlines")
+DELIVERY_DEADLINES = _rule_section("delivery_deadlines")
+# Mức cảnh báo theo số ngày trễ hạn và nhóm vùng giao hàng
+WARNING_LEVELS = _rule_section("warning_levels")
+REGION_RULES = _rule_section("region_rules")
+# Luồng trạng thái: sequence, cancel_allowed_from, return_allowed_from
+STATUS_FLOW = _rule_section("status_flow")
+
+# Quy tắc cảnh báo (business_config.json alert_rules)
+ALERT_RULES = BUSINESS_CONFIG.get("alert_rules", {})
+
+# Leo thang đơn hàng mở quá lâu (business_config.json automation_rules)
+AUTO_ESCALATION = BUSINESS_CONFIG.get("automation_rules", {}).get("auto_escalation", {})
+
+# Giới hạn tốc độ gọi Google API (utils.rate_limit)
+API_RATE_LIMITING = {
+    "enabled": True,
+    "requests_per_minute": 60,
+    "burst_limit": 10,
+    **BUSINESS_CONFIG.get("security_config", {}).get("api_rate_limiting", {}),
+}
+
+# Phân trang bảng chi tiết (business_config.json display_config)
+PAGINATION = {
+    "default_page_size": 20,
+    "max_page_size": 100,
+    "page_size_options": [10, 20, 50, 100],
+    **BUSINESS_CONFIG.get("display_config", {}).get("pagination", {}),
+}
+
 # Colors
 COLORS = {
     "primary": "#1f77b4",
@@ -163,11 +241,16 @@ CONFIG_EXPORT = {
         "max_rows_for_testing": MAX_ROWS_FOR_TESTING,
         "enable_fast_mode": ENABLE_FAST_MODE,
         "export_formats": EXPORT_FORMATS,
+        "snapshot_read_mode": SNAPSHOT_READ_MODE,
+        "figure_cache_max_mb": FIGURE_CACHE_MAX_MB,
+        "ingest_source": INGEST_SOURCE,
+        "ingest_interval_seconds": INGEST_INTERVAL_SECONDS,
     },
     "notifications": {"email_enabled": EMAIL_ENABLED, "slack_enabled": SLACK_ENABLED},
     "google_sheets": {
         "enabled": GOOGLE_SHEETS_ENABLED,
         "spreadsheet_id": SPREADSHEET_ID,
         "auto_sync": AUTO_SYNC,
+        "cache_ttl_seconds": SHEETS_CACHE_TTL,
     },
 }
@@ -116,6 +116,16 @@ class ConfigManager:
         else:
             print(f"❌ Unknown feature: {feature}")
 
+    def sync_to_sheets(self):
+        """Push the whole configuration to the Google Sheets config worksheet"""
+        config = self.load_config()
+        if not config:
+            return False
+
+        from scripts.gs_manager import GoogleSheetsManager
+
+        return GoogleSheetsManager().sync_config(config)
+
     def show_status(self):
         """Show current configuration status"""
         config = self.load_config()
@@ -174,6 +184,7 @@ def main():
         print("  python config_manager.py enable <feature>")
         print("  python config_manager.py disable <feature>")
         print("  python config_manager.py backup")
+        print("  python config_manager.py sync")
         print("")
         print("Features: email, slack, scheduling, google_sheets, fast_mode")
         return
@@ -185,6 +196,8 @@ def main():
         manager.show_status()
     elif command == "backup":
         manager.backup_config()
+    elif command == "sync":
+        manager.sync_to_sheets()
     elif command == "enable" and len(sys.argv) > 2:
         manager.enable_feature(sys.argv[2])
     elif command == "disable" and len(sys.argv) > 2:
@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+Benchmark
+Đo hiệu năng các engine xử lý đơn hàng trên dữ liệu giả lập
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Thêm thư mục gốc vào Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.config import (
+    COLUMN_ALIASES,
+    CONFIRMATION_DEADLINES,
+    DELIVERY_DEADLINES,
+    REGION_RULES,
+)
+from utils.aggregates import build_order_aggregates, build_order_cube
+from utils.alerts import ALERT_ENGINE
+from utils.column_buffer import RowColumns
+from utils.escalation import EscalationScheduler
+from utils.filter_index import DETAIL_COLUMNS, OrderFilterIndex
+from utils.funnel import compute_funnel
+from utils.ingest import OrderIngestor, orders_to_csv
+from utils.kpi_engine import compute_kpis
+from utils.order_schema import ORDER_STATUSES, STATUS_LABELS, read_orders_csv
+from utils.order_state import OrderStateStore
+from utils.order_store import OrderStore
+from utils.rule_engine import PriorityRules
+from utils.sla import WarningLevels, classify_orders
+from utils.snapshot import project_orders
+
+REGIONS = ["Hà Nội", "TP.HCM", "Đà Nẵng", "Hải Phòng", "Cần Thơ", "Khác"]
+CUSTOMER_TYPES = ["New", "Regular", "VIP"]
+PRODUCT_CATEGORIES = ["Books", "Electronics", "Fashion", "Home", "Sports"]
+
+
+def make_orders(rows, seed=42):
+    """Sinh frame đơn hàng giả lập đúng schema"""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2023-01-01T00:00:00")
+    offsets = rng.integers(0, 3 * 365 * 86400, rows).astype("timedelta64[s]")
+    return pd.DataFrame(
+        {
+            "order_id": [f"ORD_{i:07d}" for i in range(1, rows + 1)],
+            "order_date": pd.to_datetime(np.sort(start + offsets)).astype(
+                "datetime64[ns]"
+            ),
+            "status": pd.Categorical(
+                rng.choice(ORDER_STATUSES, rows, p=[0.1, 0.55, 0.28, 0.07]),
+                categories=ORDER_STATUSES,
+            ),
+            "region": pd.Categorical(rng.choice(REGIONS, rows)),
+            "order_value": rng.integers(100_000, 5_000_000, rows, dtype=np.int64),
+            "confirm_hours": rng.integers(1, 49, rows, dtype=np.int32),
+            "delivery_hours": rng.integers(12, 73, rows, dtype=np.int32),
+            "is_confirmed_ontime": rng.random(rows) < 0.9,
+            "is_delivered_ontime": rng.random(rows) < 0.85,
+            "customer_type": pd.Categorical(rng.choice(CUSTOMER_TYPES, rows)),
+            "product_category": pd.Categorical(rng.choice(PRODUCT_CATEGORIES, rows)),
+        }
+    )
+
+
+def timeit(func, repeat=5):
+    """Thời gian chạy tốt nhất (giây) sau nhiều lần lặp"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def report(name, baseline, optimized):
+    """In kết quả so sánh"""
+    print(f"📊 {name}")
+    print(f"   Cách cũ : {baseline * 1000:9.2f} ms")
+    print(f"   Engine  : {optimized * 1000:9.2f} ms")
+    print(f"   Tăng tốc: {baseline / optimized:9.1f}x")
+
+
+def _legacy_kpis(df):
+    """calculate_kpis cũ + 4 lượt duyệt order_value ở trang tổng quan"""
+    total_orders = len(df)
+    confirmed_ontime = df["is_confirmed_ontime"].sum()
+    delivered_ontime = df["is_delivered_ontime"].sum()
+    cancelled_orders = len(df[df["status"] == "cancelled"])
+    pending_orders = len(df[df["status"] == "pending"])
+    kpis = {
+        "total_orders": total_orders,
+        "confirmation_rate": confirmed_ontime / total_orders * 100,
+        "delivery_rate": delivered_ontime / total_orders * 100,
+        "cancelled_orders": cancelled_orders,
+        "pending_orders": pending_orders,
+        "cancellation_rate": cancelled_orders / total_orders * 100,
+        "avg_order_value": df["order_value"].mean(),
+    }
+    value_stats = [
+        df["order_value"].sum(),
+        df["order_value"].mean(),
+        df["order_value"].max(),
+        df["order_value"].min(),
+    ]
+    return kpis, value_stats
+
+
+def bench_kpis(df):
+    """KPI tổng quan: boolean mask + nhiều lượt duyệt so với engine một lượt"""
+    # Dữ liệu cũ được load bằng suy luận kiểu: status là chuỗi object
+    legacy_df = df.astype({"status": object})
+    baseline = timeit(lambda: _legacy_kpis(legacy_df))
+    optimized = timeit(lambda: compute_kpis(df))
+    report(f"KPI tổng quan ({len(df):,} đơn)", baseline, optimized)
+
+
+def bench_aggregates(df, batch_size=1000):
+    """Thêm một lô đơn mới: tính lại toàn bộ so với cộng dồn vào bảng tổng hợp"""
+    batch = make_orders(batch_size, seed=7)
+    history = pd.concat([df, batch], ignore_index=True)
+    table = build_order_aggregates(df)
+    baseline = timeit(lambda: build_order_aggregates(history), repeat=3)
+    optimized = timeit(lambda: table.append(batch), repeat=1)
+    report(f"Thêm {batch_size:,} đơn vào lịch sử {len(df):,} đơn", baseline, optimized)
+
+
+def _legacy_chart_groupbys(df):
+    """Các phép nhóm của trang biểu đồ và biểu đồ hiệu suất trên dữ liệu thô"""
+    hourly = df.copy()
+    hourly["hour"] = hourly["order_date"].dt.hour
+    hourly.groupby("hour").agg({"order_id": "count", "is_confirmed_ontime": "mean"})
+    heatmap = df.copy()
+    heatmap["weekday"] = heatmap["order_date"].dt.day_name()
+    heatmap["hour"] = heatmap["order_date"].dt.hour
+    heatmap.groupby(["weekday", "hour"])["order_id"].count()
+    df["status"].value_counts()
+    df.groupby("region", observed=True)["order_id"].count()
+
+
+def _cube_chart_queries(cube):
+    cube.query(["hour"])
+    cube.query(["weekday", "hour"])
+    cube.query(["status"])
+    cube.query(["region"])
+
+
+def bench_cube(df):
+    """Dữ liệu cho các biểu đồ: nhóm lại dữ liệu thô so với đọc rollup cube"""
+    cube = build_order_cube(df)
+    baseline = timeit(lambda: _legacy_chart_groupbys(df), repeat=3)
+    optimized = timeit(lambda: _cube_chart_queries(cube))
+    report(f"Dữ liệu biểu đồ ({len(df):,} đơn)", baseline, optimized)
+
+
+def _legacy_table_filter(df, status, region, start, end):
+    """Bộ lọc cũ của bảng chi tiết: copy frame rồi áp lần lượt từng mask"""
+    filtered = df.copy()
+    filtered = filtered[filtered["status"] == status]
+    filtered = filtered[filtered["region"] == region]
+    return filtered[
+        (filtered["order_date"].dt.date >= start)
+        & (filtered["order_date"].dt.date <= end)
+    ]
+
+
+def bench_filter(df):
+    """Lọc bảng chi tiết: mask tuần tự so với chỉ mục ngày + chỉ mục đảo"""
+    index = OrderFilterIndex(df)
+    start = df["order_date"].iloc[len(df) // 3].date()
+    end = df["order_date"].iloc[len(df) // 2].date()
+    args = ("delivered", "Hà Nội", start, end)
+    baseline = timeit(lambda: _legacy_table_filter(df, *args), repeat=3)
+    optimized = timeit(
+        lambda: index.rows(index.query(start, end, status=args[0], region=args[1]))
+    )
+    report(f"Lọc bảng chi tiết ({len(df):,} đơn)", baseline, optimized)
+
+
+def _legacy_condition(condition, names):
+    if condition == "default":
+        return True
+    try:
+        return eval(condition, {}, names)
+    except NameError:
+        # Cột không có trong dữ liệu (shipping_method...)
+        return False
+
+
+def _legacy_priorities(df, levels, aliases):
+    """Gán mức ưu tiên kiểu cũ: eval từng điều kiện trên từng dòng"""
+    priorities = []
+    for row in df.itertuples(index=False):
+        names = row._asdict()
+        names.update({alias: names[column] for alias, column in aliases.items()})
+        for name, settings in levels.items():
+            if any(_legacy_condition(c, names) for c in settings["conditions"]):
+                priorities.append(name)
+                break
+        else:
+            priorities.append(None)
+    return priorities
+
+
+def bench_rules(df, sample=20_000):
+    """Gán mức ưu tiên: eval từng dòng (đo trên mẫu, ngoại suy) so với rule engine"""
+    rules = PriorityRules.from_config()
+    sample_df = df.head(sample).astype({"customer_type": object, "region": object})
+    sample_time = timeit(
+        lambda: _legacy_priorities(sample_df, rules.settings, COLUMN_ALIASES), repeat=1
+    )
+    baseline = sample_time * len(df) / len(sample_df)
+    optimized = timeit(lambda: rules.assign(df), repeat=3)
+    report(f"Gán mức ưu tiên ({len(df):,} đơn)", baseline, optimized)
+
+
+def _legacy_alerts(df, engine, now):
+    """Cảnh báo kiểu cũ: tính biến và eval điều kiện cho từng đơn"""
+    alerts = []
+    for row in df.itertuples(index=False):
+        names = row._asdict()
+        names.update({alias: names[column] for alias, column in COLUMN_ALIASES.items()})
+        priority = next(
+            name
+            for name, rules in engine.priorities.settings.items()
+            if any(_legacy_condition(c, names) for c in rules["conditions"])
+        )
+        days = (now - row.order_date).total_seconds() / 86400
+        names.update(
+            status=STATUS_LABELS[row.status],
+            days_since_order=days,
+            days_since_confirmation=days - row.confirm_hours / 24,
+            confirmation_deadline=CONFIRMATION_DEADLINES.get(priority, 2),
+            delivery_deadline=DELIVERY_DEADLINES.get("default", 5),
+        )
+        for key, rule in engine.rules.items():
+            if all(
+                _legacy_condition(c, names)
+                for c in (c.text for c in rule.conditions.conditions)
+            ):
+                alerts.append((row.order_id, key))
+    return alerts
+
+
+def bench_alerts(df, sample=20_000):
+    """Đánh giá alert_rules: eval từng đơn (đo trên mẫu, ngoại suy) so với engine"""
+    now = pd.Timestamp("2026-01-01")
+    sample_df = df.head(sample).astype({"customer_type": object, "region": object})
+    sample_time = timeit(lambda: _legacy_alerts(sample_df, ALERT_ENGINE, now), repeat=1)
+    baseline = sample_time * len(df) / len(sample_df)
+    optimized = timeit(lambda: ALERT_ENGINE.evaluate(df, now), repeat=3)
+    report(f"Cảnh báo alert_rules ({len(df):,} đơn)", baseline, optimized)
+
+
+def _legacy_sla_levels(df, priorities, levels):
+    """Mức trễ hạn kiểu cũ: tra thời hạn và so từng mức cho từng đơn"""
+    tiers = {
+        region: tier["delivery_time_standard"]
+        for tier in REGION_RULES.values()
+        for region in tier["regions"]
+    }
+    result = []
+    for row, priority in zip(df.itertuples(index=False), priorities):
+        confirm_deadline = CONFIRMATION_DEADLINES.get(priority, 2)
+        delivery_deadline = tiers.get(row.region, DELIVERY_DEADLINES.get("default", 5))
+        delay = max(
+            0,
+            np.ceil(row.confirm_hours / 24 - confirm_deadline),
+            np.ceil(row.delivery_hours / 24 - delivery_deadline),
+        )
+        for name in reversed(levels.names):
+            if delay >= levels.settings[name]["min_delay_days"]:
+                result.append(name)
+                break
+    return result
+
+
+def bench_sla(df, sample=50_000):
+    """Phân loại mức trễ hạn: vòng lặp từng đơn (mẫu, ngoại suy) so với searchsorted"""
+    rules = PriorityRules.from_config()
+    codes, _ = rules.codes(df)
+    levels = WarningLevels()
+    sample_df = df.head(sample).astype({"region": object})
+    names = [rules.names[code] for code in codes[:sample]]
+    sample_time = timeit(lambda: _legacy_sla_levels(sample_df, names, levels), repeat=1)
+    baseline = sample_time * len(df) / len(sample_df)
+    optimized = timeit(
+        lambda: classify_orders(df, codes, rules.names, levels), repeat=3
+    )
+    report(f"Phân loại mức trễ hạn SLA ({len(df):,} đơn)", baseline, optimized)
+
+
+def _legacy_escalation_tick(orders, levels, now):
+    """Quét lại toàn bộ đơn mở mỗi tick để tìm đơn vừa vượt ngưỡng"""
+    events = []
+    for order in orders:
+        hours = (now - order["opened"]) / 3600
+        while order["level"] < len(levels) and hours >= levels[order["level"]]:
+            events.append((order["order_id"], order["level"] + 1))
+            order["level"] += 1
+    return events
+
+
+def bench_escalation(df, open_orders=100_000, ticks=60):
+    """Leo thang: quét toàn bộ backlog mỗi tick so với min-heap chỉ lấy đơn tới hạn"""
+    sample = df.head(open_orders)
+    opened = sample["order_date"].to_numpy()
+    # Bắt đầu khi backlog đã theo kịp lịch, mỗi tick một phút
+    start = pd.Timestamp(opened.max())
+    now = {"value": start}
+    scheduler = EscalationScheduler(notifier=None, clock=lambda: now["value"])
+    scheduler.open_many(sample["order_id"].tolist(), opened)
+    scheduler.tick()
+    legacy = [
+        {"order_id": order_id, "opened": value, "level": 0}
+        for order_id, value in zip(
+            sample["order_id"], opened.astype("datetime64[s]").astype(np.int64)
+        )
+    ]
+    hours = [level.delay_ns / 3.6e12 for level in scheduler.levels]
+    _legacy_escalation_tick(legacy, hours, start.timestamp())
+
+    def run_legacy():
+        for minute in range(1, ticks + 1):
+            _legacy_escalation_tick(legacy, hours, start.timestamp() + minute * 60)
+
+    def run_heap():
+        for minute in range(1, ticks + 1):
+            scheduler.tick(start + pd.Timedelta(minutes=minute))
+
+    baseline = timeit(run_legacy, repeat=1) / ticks
+    optimized = timeit(run_heap, repeat=1) / ticks
+    report(f"Một tick leo thang ({open_orders:,} đơn mở)", baseline, optimized)
+
+
+def _read_csv_orders(path, columns=None, start=None, end=None, signature=None):
+    frame, issues = read_orders_csv(path, size=signature and signature[1])
+    return project_orders(frame, columns, start, end), issues
+
+
+def _build_ingest_derived(store, path):
+    """Các cấu trúc dẫn xuất dashboard giữ cho dữ liệu đơn hàng"""
+    priorities = ALERT_ENGINE.priorities
+    store.derived(path, "cube", build_order_cube)
+    store.derived(path, "index", OrderFilterIndex, columns=DETAIL_COLUMNS)
+    store.derived(path, "inputs", lambda df: RowColumns(ALERT_ENGINE.inputs, df))
+    store.derived(
+        path,
+        "sla",
+        lambda df: classify_orders(df, None, priorities.names, priorities=priorities),
+    )
+
+
+def _stream_batch(df, batch_size, number):
+    """Lô thứ number của luồng: mã đơn mới, đặt sau mọi đơn đã có"""
+    batch = make_orders(batch_size, seed=7 + number)
+    batch["order_id"] = [f"NEW_{number:03d}_{i:07d}" for i in range(batch_size)]
+    batch["order_date"] = df["order_date"].max() + pd.to_timedelta(
+        np.arange(1, batch_size + 1) + number * batch_size, unit="s"
+    )
+    return batch
+
+
+def _ingest_per_batch(df, batch_size, batches, tmp):
+    """Thời gian nạp một lô (trung vị sau lô khởi động) với lịch sử df
+
+    Trả về (thời gian tải lại toàn bộ, thời gian mỗi lô)
+    """
+    data_path = Path(tmp) / f"orders_{len(df)}.csv"
+    source_path = Path(tmp) / f"incoming_{len(df)}.csv"
+    data_path.write_bytes(
+        ",".join(df.columns).encode("utf-8") + b"\n" + orders_to_csv(df)
+    )
+    source_path.write_bytes(",".join(df.columns).encode("utf-8") + b"\n")
+
+    def full_reload():
+        store = OrderStore(reader=_read_csv_orders)
+        store.get(data_path)
+        _build_ingest_derived(store, data_path)
+
+    baseline = timeit(full_reload, repeat=1)
+
+    store = OrderStore(reader=_read_csv_orders)
+    _build_ingest_derived(store, data_path)
+    ingestor = OrderIngestor(source_path, data_path, store, state_path=None)
+
+    def micro_batch():
+        ingestor.poll()
+        store.get(data_path)
+        _build_ingest_derived(store, data_path)
+
+    timings = []
+    for number in range(batches + 1):
+        with open(source_path, "ab") as f:
+            f.write(orders_to_csv(_stream_batch(df, batch_size, number)))
+        timings.append(timeit(micro_batch, repeat=1))
+    # Lô đầu tiên mang chi phí một lần (đọc mã đơn đã có, chuyển sang bộ đệm nối)
+    return baseline, float(np.median(timings[1:]))
+
+
+def bench_ingest(df, batch_size=1000, batches=5):
+    """Nạp lô đơn mới từ luồng: tải lại CSV + dựng lại cube, chỉ mục, mức ưu tiên,
+    SLA so với chỉ parse phần mới và nối vào
+
+    Thời gian mỗi lô đo ở hai kích thước lịch sử, không được tăng theo lịch sử
+    """
+    sizes = sorted({max(len(df) // 10, batch_size), len(df)})
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            results[rows] = _ingest_per_batch(df.iloc[:rows], batch_size, batches, tmp)
+
+    baseline, optimized = results[len(df)]
+    report(
+        f"Nạp {batch_size:,} đơn mới vào lịch sử {len(df):,} đơn", baseline, optimized
+    )
+    small, large = results[sizes[0]][1], optimized
+    print(
+        f"   Mỗi lô  : {small * 1000:9.2f} ms ({sizes[0]:,} đơn) → "
+        f"{large * 1000:.2f} ms ({len(df):,} đơn)"
+    )
+    if large > 2 * small:
+        print("   ⚠️  Thời gian mỗi lô tăng theo kích thước lịch sử")
+
+
+def bench_states(df, events=200):
+    """Đổi trạng thái đơn: sửa frame rồi đếm lại theo trạng thái so với bộ đếm O(1)"""
+    states = OrderStateStore.from_frame(df)
+    pending = np.flatnonzero((df["status"] == "pending").to_numpy())[:events]
+    order_ids = df["order_id"].to_numpy()[pending].tolist()
+    legacy_df = df[["order_id", "status"]].copy()
+    at = df["order_date"].max()
+
+    def run_legacy():
+        for position in pending:
+            legacy_df.iloc[position, 1] = "confirmed"
+            legacy_df["status"].value_counts()
+
+    def run_states():
+        for order_id in order_ids:
+            states.apply(order_id, "confirmed", at)
+            states.order_status_counts()
+
+    baseline = timeit(run_legacy, repeat=1) / len(order_ids)
+    optimized = timeit(run_states, repeat=1) / len(order_ids)
+    report(f"Một sự kiện đổi trạng thái ({len(df):,} đơn)", baseline, optimized)
+
+
+def _legacy_funnel(df):
+    """Phễu cũ: ba lượt lọc frame theo trạng thái, không có thời gian giữa các bước"""
+    total_orders = len(df)
+    confirmed = len(df[df["status"] != "pending"])
+    delivered = len(df[df["status"] == "delivered"])
+    completed = len(df[df["status"] == "delivered"])
+    return [total_orders, confirmed, delivered, completed]
+
+
+def bench_funnel(df):
+    """Phễu chuyển đổi: lọc frame nhiều lượt so với một lượt bincount (kèm trung vị)"""
+    legacy_df = df.astype({"status": object})
+    baseline = timeit(lambda: _legacy_funnel(legacy_df), repeat=3)
+    optimized = timeit(lambda: compute_funnel(df), repeat=3)
+    report(f"Phễu chuyển đổi ({len(df):,} đơn)", baseline, optimized)
+
+
+BENCHMARKS = {
+    "kpis": bench_kpis,
+    "aggregates": bench_aggregates,
+    "cube": bench_cube,
+    "filter": bench_filter,
+    "rules": bench_rules,
+    "alerts": bench_alerts,
+    "sla": bench_sla,
+    "escalation": bench_escalation,
+    "ingest": bench_ingest,
+    "states": bench_states,
+    "funnel": bench_funnel,
+}
+
+
+def main():
+    """Hàm chính"""
+    parser = argparse.ArgumentParser(description="Benchmark engine đơn hàng")
+    parser.add_argument("names", nargs="*", help=f"Chọn trong: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Số đơn giả lập")
+    args = parser.parse_args()
+
+    names = args.names or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"❌ Không có benchmark: {', '.join(unknown)}")
+        sys.exit(1)
+
+    print(f"🧪 Sinh {args.rows:,} đơn hàng giả lập...")
+    df = make_orders(args.rows)
+
+    for name in names:
+        BENCHMARKS[name](df)
+
+
+if __name__ == "__main__":
+    main()
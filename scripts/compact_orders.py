@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Compact Orders
+Nén file CSV đơn hàng thành snapshot Parquet phân vùng theo tháng
+"""
+
+import sys
+from pathlib import Path
+
+# Thêm thư mục gốc vào Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.config import DATA_PATH
+from utils.snapshot import compact_csv, snapshot_available, snapshot_dir_for
+
+
+def main():
+    """Hàm chính"""
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else DATA_PATH
+    snapshot_dir = sys.argv[2] if len(sys.argv) > 2 else snapshot_dir_for(csv_path)
+
+    if not snapshot_available():
+        print("❌ Thiếu thư viện! Chạy: pip install pyarrow")
+        sys.exit(1)
+
+    print(f"📥 Nguồn: {csv_path}")
+    manifest = compact_csv(csv_path, snapshot_dir)
+
+    print(f"✅ Đã tạo snapshot: {snapshot_dir}")
+    print(f"📦 Số đơn hàng: {manifest['rows']:,}")
+    print(f"📅 Khoảng ngày: {manifest['min_date']} → {manifest['max_date']}")
+    for partition in manifest["partitions"]:
+        print(f"   - {partition['month']}: {partition['rows']:,} đơn")
+    if manifest["invalid_rows"]:
+        print(f"⚠️  Bỏ qua {manifest['invalid_rows']} dòng không hợp lệ")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ Google Sheets Manager - Quản lý Google Sheets
 Script tiện ích cho nhân viên
 """
 
+import csv
 import json
 import sys
 from datetime import datetime
@@ -12,20 +13,37 @@ from pathlib import Path
 # Thêm thư mục gốc vào Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
-try:
-    import gspread
-    from google.oauth2.service_account import Credentials
-except ImportError:
-    print("❌ Thiếu thư viện! Chạy: pip install gspread google-auth")
-    sys.exit(1)
+from config_manager import ConfigManager
+from utils.sheets_batch import SheetBatchWriter
+from utils.sheets_cache import get_sheet_cache
+from utils.sheets_config import (
+    CONFIG_WORKSHEET,
+    UPDATED_AT_CELL,
+    VALUE_COLUMN,
+    config_sheet_values,
+)
+from utils.sheets_log import (
+    LOG_WORKSHEET,
+    LogTailReader,
+    SheetsLogWriter,
+    build_log_row,
+)
+from utils.sheets_session import get_session
+
 
 class GoogleSheetsManager:
-    def __init__(self):
+    def __init__(self, session=None):
         self.config_path = Path("config/system_config.json")
         self.credentials_path = Path("config/service_account.json")
         self.client = None
         self.spreadsheet = None
         self.config = self.load_config()
+        # Phiên dùng lại giữa các lần gọi; truyền session riêng khi chạy thử
+        self.session = session
+        # Tạo khi ghi log lần đầu; các dòng chưa gửi nằm trong data/*.spool.jsonl
+        self.log_writer = None
+        # Đọc log cuối theo vùng nhỏ; dòng cuối được cập nhật theo các lần ghi log
+        self.log_reader = LogTailReader(lambda: self.session.worksheet(LOG_WORKSHEET))
 
     def load_config(self):
         """Tải cấu hình"""
@@ -36,64 +54,46 @@ class GoogleSheetsManager:
             return {}
 
     def connect(self):
-        """Kết nối Google Sheets"""
-        try:
-            scope = [
-                'https://www.googleapis.com/auth/spreadsheets',
-                'https://www.googleapis.com/auth/drive'
-            ]
-
-            # Ưu tiên biến môi trường GOOGLE_CREDENTIALS_FILE
-            import os
-            env_creds = os.getenv('GOOGLE_CREDENTIALS_FILE')
-            creds_path = env_creds if env_creds else str(self.credentials_path)
-
-            creds = Credentials.from_service_account_file(
-                creds_path, scopes=scope
-            )
-            self.client = gspread.authorize(creds)
+        """Kết nối Google Sheets (chỉ xác thực và mở spreadsheet ở lần đầu)"""
+        if self.spreadsheet is not None:
+            return True
 
+        try:
             spreadsheet_id = self.config.get("google_sheets", {}).get("spreadsheet_id")
-            if spreadsheet_id:
-                self.spreadsheet = self.client.open_by_key(spreadsheet_id)
-                print(f"✅ Đã kết nối: {self.spreadsheet.title}")
-                return True
-            else:
+            if not spreadsheet_id:
                 print("❌ Không tìm thấy Spreadsheet ID trong config")
                 return False
 
+            # Credentials lấy từ GOOGLE_CREDENTIALS_FILE hoặc config/service_account.json
+            if self.session is None:
+                self.session = get_session(spreadsheet_id)
+            self.client = self.session.client
+            self.spreadsheet = self.session.spreadsheet
+            print(f"✅ Đã kết nối: {self.spreadsheet.title}")
+            return True
+
         except Exception as e:
             print(f"❌ Lỗi kết nối: {e}")
             return False
 
+    @property
+    def sheet_cache(self):
+        """Cache các sheet SLA / cấu hình của phiên hiện tại"""
+        ttl = self.config.get("google_sheets", {}).get("cache_ttl_seconds", 300)
+        return get_sheet_cache(self.session, ttl=ttl)
+
     def log_activity(self, activity, status, details="", user="System"):
-        """Ghi log hoạt động"""
+        """Ghi log hoạt động (đưa vào hàng đợi, luồng nền nối thêm lên Sheets)"""
         if not self.connect():
             return False
 
         try:
-            worksheet = self.spreadsheet.worksheet("Nhật ký tự động")
-
-            # Tìm dòng trống đầu tiên (sau header)
-            values = worksheet.get_all_values()
-            next_row = len([row for row in values if any(row)]) + 1
-
-            # Tạo dữ liệu log
-            log_data = [
-                datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
-                activity,
-                status,
-                "0",  # Số đơn xử lý
-                "1" if "thành công" in status.lower() else "0",  # Thành công
-                "0" if "thành công" in status.lower() else "1",  # Lỗi
-                "< 1s",  # Thời gian xử lý
-                user,
-                details,
-                "",  # Chi tiết
-                f"LOG_{datetime.now().strftime('%Y%m%d_%H%M%S')}"  # ID phiên
-            ]
-
-            worksheet.update(f'A{next_row}:K{next_row}', [log_data])
+            if self.log_writer is None:
+                self.log_writer = SheetsLogWriter(
+                    lambda: self.session.worksheet(LOG_WORKSHEET),
+                    on_append=self.log_reader.observe_append,
+                )
+            self.log_writer.write(build_log_row(activity, status, details, user))
             print(f"✅ Đã ghi log: {activity}")
             return True
 
@@ -103,59 +103,74 @@ class GoogleSheetsManager:
 
     def update_config_value(self, section, setting, new_value):
         """Cập nhật giá trị cấu hình trên Google Sheets"""
+        return self.update_config_values({(section, setting): new_value})
+
+    def update_config_values(self, updates, log=True):
+        """Cập nhật nhiều cài đặt trong một request và một dòng log
+
+        updates: {cài đặt: giá trị} hoặc {(phần, cài đặt): giá trị}; vị trí ô lấy
+        từ chỉ mục của cache nên không phải đọc lại worksheet
+        """
         if not self.connect():
             return False
 
         try:
-            worksheet = self.spreadsheet.worksheet("Cấu hình hệ thống")
-            values = worksheet.get_all_values()
-
-            # Tìm dòng chứa setting
-            for i, row in enumerate(values):
-                if len(row) >= 2 and row[1] == setting:
-                    # Cập nhật giá trị
-                    worksheet.update_cell(i + 1, 3, new_value)
-                    print(f"✅ Đã cập nhật {setting}: {new_value}")
-
-                    # Ghi log
-                    self.log_activity(
-                        f"Cập nhật cấu hình",
-                        "✅ Thành công",
-                        f"Thay đổi {setting} thành {new_value}"
+            changes = self.sheet_cache.config_index().changed(updates)
+            if not changes:
+                print("✅ Cấu hình trên Sheets đã khớp, không cần cập nhật")
+                return True
+
+            worksheet = self.session.worksheet(CONFIG_WORKSHEET)
+            cells = {(row, VALUE_COLUMN): value for row, value in changes.values()}
+            cells[UPDATED_AT_CELL] = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+
+            # Mọi ô thay đổi đi chung một values.batchUpdate
+            writer = SheetBatchWriter(self.spreadsheet)
+            for (row, col), value in cells.items():
+                writer.write_rows(worksheet, [[value]], start_row=row, start_col=col)
+            writer.flush()
+            self.sheet_cache.update_cells(CONFIG_WORKSHEET, cells)
+
+            for (_, setting), (_, value) in changes.items():
+                print(f"✅ Đã cập nhật {setting}: {value}")
+
+            if log:
+                self.log_activity(
+                    "Cập nhật cấu hình",
+                    "✅ Thành công",
+                    "; ".join(
+                        f"Thay đổi {setting} thành {value}"
+                        for (_, setting), (_, value) in changes.items()
                     )
-                    return True
+                )
+            return True
 
-            print(f"❌ Không tìm thấy setting: {setting}")
+        except KeyError as e:
+            print(f"❌ {e.args[0]}")
             return False
-
         except Exception as e:
             print(f"❌ Lỗi cập nhật: {e}")
             return False
 
+    def sync_config(self, config=None):
+        """Đẩy toàn bộ system_config.json lên worksheet cấu hình (chỉ các ô đã đổi)"""
+        if config is None:
+            config = ConfigManager().load_config()
+            if not config:
+                return False
+        return self.update_config_values(config_sheet_values(config))
+
     def get_sla_rules(self):
         """Lấy quy tắc SLA"""
         if not self.connect():
             return []
 
         try:
-            worksheet = self.spreadsheet.worksheet("Quy tắc SLA")
-            values = worksheet.get_all_values()
-
-            # Lấy dữ liệu SLA (bỏ qua header)
-            sla_rules = []
-            for row in values[4:]:  # Bỏ qua 4 dòng đầu
-                if row and row[0] and "Đơn" in row[0]:
-                    sla_rules.append({
-                        "loai_don": row[0],
-                        "thoi_gian_xac_nhan": row[1],
-                        "thoi_gian_giao_hang": row[2],
-                        "muc_do_uu_tien": row[3],
-                        "ghi_chu": row[4] if len(row) > 4 else "",
-                        "trang_thai": row[5] if len(row) > 5 else "",
-                        "nguoi_phu_trach": row[6] if len(row) > 6 else ""
-                    })
-
-            return sla_rules
+            # Quy tắc SLA lấy từ cache (TTL + kiểm tra modifiedTime trên Drive)
+            rules = self.sheet_cache.sla_rules()
+            if self.sheet_cache.last_error is not None:
+                print(f"⚠️ Dùng dữ liệu SLA đã cache: {self.sheet_cache.last_error}")
+            return rules
 
         except Exception as e:
             print(f"❌ Lỗi đọc SLA: {e}")
@@ -187,17 +202,12 @@ class GoogleSheetsManager:
             return
 
         try:
-            worksheet = self.spreadsheet.worksheet("Nhật ký tự động")
-            values = worksheet.get_all_values()
-
-            # Lấy log gần đây (bỏ qua header)
-            logs = []
-            for row in values[4:]:  # Bỏ qua header
-                if row and row[0] and "/" in row[0]:  # Có thời gian
-                    logs.append(row)
+            # Gửi nốt các log còn trong hàng đợi để danh sách đầy đủ
+            if self.log_writer is not None:
+                self.log_writer.flush(timeout=10)
 
-            # Lấy logs gần nhất
-            recent_logs = logs[-limit:] if len(logs) > limit else logs
+            # Chỉ đọc vùng cuối worksheet, không tải toàn bộ lịch sử
+            recent_logs = self.log_reader.tail(limit)
 
             print(f"📝 {len(recent_logs)} LOG GẦN NHẤT")
             print("=" * 60)
@@ -220,6 +230,29 @@ class GoogleSheetsManager:
         except Exception as e:
             print(f"❌ Lỗi đọc logs: {e}")
 
+    def export_logs(self, output_path):
+        """Xuất toàn bộ nhật ký ra CSV, đọc từng trang để không giữ cả sheet trong bộ nhớ"""
+        if not self.connect():
+            return False
+
+        try:
+            if self.log_writer is not None:
+                self.log_writer.flush(timeout=10)
+
+            total = 0
+            with open(output_path, "w", encoding="utf-8-sig", newline="") as f:
+                writer = csv.writer(f)
+                for page in self.log_reader.iter_pages():
+                    writer.writerows(page)
+                    total += len(page)
+
+            print(f"✅ Đã xuất {total} log ra {output_path}")
+            return True
+
+        except Exception as e:
+            print(f"❌ Lỗi xuất logs: {e}")
+            return False
+
     def backup_sheets(self):
         """Backup Google Sheets"""
         if not self.connect():
@@ -259,10 +292,11 @@ def main():
         print("3. ✏️  Ghi log mới")
         print("4. 💾 Backup sheets")
         print("5. 🔗 Mở Google Sheets")
-        print("6. ❌ Thoát")
+        print("6. 🔄 Đồng bộ cấu hình lên Sheets")
+        print("7. ❌ Thoát")
         print()
 
-        choice = input("👉 Chọn chức năng (1-6): ").strip()
+        choice = input("👉 Chọn chức năng (1-7): ").strip()
 
         if choice == "1":
             manager.show_sla_summary()
@@ -298,6 +332,9 @@ def main():
                 print("❌ Không tìm thấy Spreadsheet ID")
 
         elif choice == "6":
+            manager.sync_config()
+
+        elif choice == "7":
             print("👋 Tạm biệt!")
             break
 
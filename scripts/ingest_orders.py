@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Ingest Orders
+Nạp đơn hàng mới từ file nguồn ghi nối thêm (CSV / NDJSON) vào file dữ liệu
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Thêm thư mục gốc vào Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.config import DATA_PATH, INGEST_INTERVAL_SECONDS, INGEST_SOURCE
+from utils.ingest import OrderIngestor
+
+
+def report(ingestor, orders):
+    """In kết quả các lô vừa nạp"""
+    print(f"📥 Nạp {orders:,} đơn mới (tổng {ingestor.stats['orders']:,})")
+    issues = ingestor.last_issues
+    if issues is not None and len(issues):
+        print(f"⚠️  Bỏ qua {issues['line'].nunique()} dòng không hợp lệ")
+    if ingestor.stats["duplicates"]:
+        print(f"⚠️  Đã bỏ qua {ingestor.stats['duplicates']:,} đơn trùng mã đơn đã có")
+    ingestor.last_issues = None
+
+
+def main():
+    """Hàm chính"""
+    parser = argparse.ArgumentParser(description="Nạp đơn hàng mới theo luồng")
+    parser.add_argument(
+        "source", nargs="?", default=INGEST_SOURCE, help="File nguồn CSV / NDJSON"
+    )
+    parser.add_argument("--data", default=DATA_PATH, help="File đơn hàng đích")
+    parser.add_argument(
+        "--follow", action="store_true", help="Tiếp tục theo dõi file nguồn"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=INGEST_INTERVAL_SECONDS,
+        help="Chu kỳ kiểm tra khi --follow (giây)",
+    )
+    args = parser.parse_args()
+
+    if not args.source:
+        print("❌ Chưa chỉ định file nguồn (hoặc data_processing.ingest_source)")
+        sys.exit(1)
+
+    ingestor = OrderIngestor(args.source, args.data)
+    print(f"📡 Nguồn: {args.source} → {args.data}")
+    report(ingestor, ingestor.drain())
+
+    try:
+        while args.follow:
+            time.sleep(args.interval)
+            orders = ingestor.drain()
+            # last_issues chỉ được đặt khi có lô mới được đọc
+            if ingestor.last_issues is not None:
+                report(ingestor, orders)
+    except KeyboardInterrupt:
+        print("👋 Dừng theo dõi")
+
+
+if __name__ == "__main__":
+    main()
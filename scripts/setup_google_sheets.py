@@ -15,19 +15,25 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 try:
     import gspread
-    from google.oauth2.service_account import Credentials
     import pandas as pd
 except ImportError:
-    print("❌ Thiếu thư viện cần thiết!")
-    print("Cài đặt: pip install gspread google-auth pandas openpyxl")
-    sys.exit(1)
+    # Vẫn chạy thử được với client giả lập (--dry-run) khi chưa cài thư viện
+    gspread = None
+
+from utils.fake_sheets import FakeSheetsClient, WorksheetNotFound
+from utils.rate_limit import API_SCHEDULER
+from utils.sheets_batch import SheetBatchWriter
+from utils.sheets_config import CONFIG_WORKSHEET, config_sheet_header, config_sheet_rows
+from utils.sheets_session import authorize_client
+
 
 class GoogleSheetsSetup:
-    def __init__(self):
+    def __init__(self, client=None):
         self.config_path = Path("config/system_config.json")
         self.credentials_path = Path("config/service_account.json")
         self.config = self.load_config()
-        self.client = None
+        # Có thể truyền client sẵn (ví dụ FakeSheetsClient khi chạy thử)
+        self.client = client
         self.spreadsheet = None
         
     def load_config(self):
@@ -44,6 +50,14 @@ class GoogleSheetsSetup:
     
     def setup_credentials(self):
         """Thiết lập xác thực Google API"""
+        if self.client is not None:
+            return True
+        
+        if gspread is None:
+            print("❌ Thiếu thư viện cần thiết!")
+            print("Cài đặt: pip install gspread google-auth pandas openpyxl")
+            return False
+        
         if not self.credentials_path.exists():
             print(f"❌ Không tìm thấy file credentials: {self.credentials_path}")
             print("💡 Hướng dẫn tạo service account:")
@@ -55,15 +69,8 @@ class GoogleSheetsSetup:
             return False
         
         try:
-            scope = [
-                'https://www.googleapis.com/auth/spreadsheets',
-                'https://www.googleapis.com/auth/drive'
-            ]
-            
-            creds = Credentials.from_service_account_file(
-                self.credentials_path, scopes=scope
-            )
-            self.client = gspread.authorize(creds)
+            # Dùng chung pool kết nối và giới hạn tốc độ với các script khác
+            self.client = authorize_client(str(self.credentials_path))
             print("✅ Kết nối Google API thành công")
             return True
             
@@ -108,70 +115,33 @@ class GoogleSheetsSetup:
         
         print(f"✅ Đã cập nhật config với Spreadsheet ID: {spreadsheet_id}")
     
+    def prepare_worksheet(self, writer, title, rows, cols):
+        """Lấy worksheet (xóa dữ liệu cũ trong cùng batch) hoặc tạo mới"""
+        try:
+            worksheet = self.spreadsheet.worksheet(title)
+            writer.clear(worksheet)
+        except WorksheetNotFound:
+            worksheet = self.spreadsheet.add_worksheet(
+                title=title, 
+                rows=rows, 
+                cols=cols
+            )
+        return worksheet
+    
     def setup_config_worksheet(self):
         """Tạo worksheet cấu hình hệ thống"""
         try:
             # Tạo hoặc lấy worksheet
-            try:
-                worksheet = self.spreadsheet.worksheet("Cấu hình hệ thống")
-                worksheet.clear()
-            except:
-                worksheet = self.spreadsheet.add_worksheet(
-                    title="Cấu hình hệ thống", 
-                    rows=100, 
-                    cols=20
-                )
+            writer = SheetBatchWriter(self.spreadsheet)
+            worksheet = self.prepare_worksheet(writer, CONFIG_WORKSHEET, 100, 20)
             
-            # Header
-            headers = [
-                ["🏗️ DASHBOARD FULFILLMENT - CẤU HÌNH HỆ THỐNG", "", ""],
-                ["📅 Cập nhật lần cuối:", datetime.now().strftime("%d/%m/%Y %H:%M:%S"), ""],
-                ["", "", ""],
-                ["PHẦN", "CÀI ĐẶT", "GIÁ TRỊ", "MÔ TẢ"]
-            ]
-            
-            # Cấu hình hệ thống
-            system_config = [
-                ["🌐 HỆ THỐNG", "URL chính", self.config["system"]["one_url"], "Địa chỉ hệ thống ONE"],
-                ["", "URL đơn hàng", self.config["system"]["orders_url"], "Đường dẫn trang đơn hàng"],
-                ["", "Thời gian chờ đăng nhập", f"{self.config['system']['login_timeout']} giây", "Thời gian chờ tối đa để đăng nhập"],
-                ["", "Thời gian tải trang", f"{self.config['system']['page_load_timeout']} giây", "Thời gian chờ tối đa để tải trang"],
-                ["", "Tối ưu JavaScript", "✅ Bật" if self.config["system"]["use_javascript_optimization"] else "❌ Tắt", "Sử dụng tối ưu hóa JavaScript"],
-                ["", "Thời gian phiên", f"{self.config['system']['session_timeout']} giây", "Thời gian phiên làm việc"],
-                ["", "", ""],
-                
-                ["📊 XỬ LÝ DỮ LIỆU", "Số dòng test tối đa", str(self.config["data_processing"]["max_rows_for_testing"]), "Giới hạn dữ liệu khi test"],
-                ["", "Chế độ nhanh", "✅ Bật" if self.config["data_processing"]["enable_fast_mode"] else "❌ Tắt", "Xử lý dữ liệu nhanh"],
-                ["", "Định dạng xuất", ", ".join(self.config["data_processing"]["export_formats"]), "Các định dạng file xuất"],
-                ["", "", ""],
-                
-                ["📧 THÔNG BÁO EMAIL", "Trạng thái", "✅ Bật" if self.config["notifications"]["email"]["enabled"] else "❌ Tắt", "Gửi thông báo qua email"],
-                ["", "SMTP Server", self.config["notifications"]["email"]["smtp_server"], "Máy chủ gửi email"],
-                ["", "SMTP Port", str(self.config["notifications"]["email"]["smtp_port"]), "Cổng SMTP"],
-                ["", "Người nhận", ", ".join(self.config["notifications"]["email"]["recipients"]), "Danh sách email nhận thông báo"],
-                ["", "", ""],
-                
-                ["💬 THÔNG BÁO SLACK", "Trạng thái", "✅ Bật" if self.config["notifications"]["slack"]["enabled"] else "❌ Tắt", "Gửi thông báo qua Slack"],
-                ["", "", ""],
-                
-                ["⏰ TỰ ĐỘNG HÓA", "Trạng thái", "✅ Bật" if self.config["scheduling"]["enabled"] else "❌ Tắt", "Chạy tự động theo lịch"],
-                ["", "Chu kỳ", f"{self.config['scheduling']['interval_hours']} giờ", "Khoảng thời gian giữa các lần chạy"],
-                ["", "", ""],
-                
-                ["📊 GOOGLE SHEETS", "Trạng thái", "✅ Bật" if self.config["google_sheets"]["enabled"] else "❌ Tắt", "Đồng bộ với Google Sheets"],
-                ["", "Spreadsheet ID", self.config["google_sheets"]["spreadsheet_id"], "ID của bảng tính Google"],
-                ["", "Tự động đồng bộ", "✅ Bật" if self.config["google_sheets"]["auto_sync"] else "❌ Tắt", "Tự động cập nhật dữ liệu"],
-            ]
-            
-            # Ghi dữ liệu
-            all_data = headers + system_config
+            # Header + cấu hình hệ thống (bố cục dùng chung với gs_manager)
+            all_data = config_sheet_header() + config_sheet_rows(self.config)
             
-            # Ghi từng dòng để tránh lỗi
-            for i, row in enumerate(all_data, 1):
-                worksheet.update(f'A{i}:D{i}', [row])
-            
-            # Format
-            self.format_config_worksheet(worksheet)
+            # Ghi cả worksheet trong một vùng, định dạng trong cùng lần gửi
+            writer.write_rows(worksheet, all_data)
+            self.format_config_worksheet(worksheet, writer)
+            writer.flush()
             
             print("✅ Đã tạo worksheet 'Cấu hình hệ thống'")
             return True
@@ -183,15 +153,8 @@ class GoogleSheetsSetup:
     def setup_sla_rules_worksheet(self):
         """Tạo worksheet quy tắc SLA"""
         try:
-            try:
-                worksheet = self.spreadsheet.worksheet("Quy tắc SLA")
-                worksheet.clear()
-            except:
-                worksheet = self.spreadsheet.add_worksheet(
-                    title="Quy tắc SLA", 
-                    rows=100, 
-                    cols=15
-                )
+            writer = SheetBatchWriter(self.spreadsheet)
+            worksheet = self.prepare_worksheet(writer, "Quy tắc SLA", 100, 15)
             
             # Header và dữ liệu SLA
             headers = [
@@ -217,12 +180,10 @@ class GoogleSheetsSetup:
             
             all_data = headers + sla_data
             
-            # Ghi dữ liệu
-            for i, row in enumerate(all_data, 1):
-                worksheet.update(f'A{i}:G{i}', [row])
-            
-            # Format
-            self.format_sla_worksheet(worksheet)
+            # Ghi dữ liệu và định dạng
+            writer.write_rows(worksheet, all_data)
+            self.format_sla_worksheet(worksheet, writer)
+            writer.flush()
             
             print("✅ Đã tạo worksheet 'Quy tắc SLA'")
             return True
@@ -234,15 +195,8 @@ class GoogleSheetsSetup:
     def setup_automation_logs_worksheet(self):
         """Tạo worksheet log tự động hóa"""
         try:
-            try:
-                worksheet = self.spreadsheet.worksheet("Nhật ký tự động")
-                worksheet.clear()
-            except:
-                worksheet = self.spreadsheet.add_worksheet(
-                    title="Nhật ký tự động", 
-                    rows=1000, 
-                    cols=12
-                )
+            writer = SheetBatchWriter(self.spreadsheet)
+            worksheet = self.prepare_worksheet(writer, "Nhật ký tự động", 1000, 12)
             
             # Header
             headers = [
@@ -277,12 +231,10 @@ class GoogleSheetsSetup:
             
             all_data = headers + sample_data
             
-            # Ghi dữ liệu
-            for i, row in enumerate(all_data, 1):
-                worksheet.update(f'A{i}:K{i}', [row])
-            
-            # Format
-            self.format_logs_worksheet(worksheet)
+            # Ghi dữ liệu và định dạng
+            writer.write_rows(worksheet, all_data)
+            self.format_logs_worksheet(worksheet, writer)
+            writer.flush()
             
             print("✅ Đã tạo worksheet 'Nhật ký tự động'")
             return True
@@ -291,69 +243,81 @@ class GoogleSheetsSetup:
             print(f"❌ Lỗi tạo worksheet logs: {e}")
             return False
     
-    def format_config_worksheet(self, worksheet):
-        """Format worksheet cấu hình"""
+    def format_config_worksheet(self, worksheet, writer=None):
+        """Format worksheet cấu hình (gửi kèm batch của writer nếu có)"""
+        flush = writer is None
+        writer = writer or SheetBatchWriter(self.spreadsheet)
         try:
             # Header chính
-            worksheet.format('A1:D1', {
+            writer.format(worksheet, 'A1:D1', {
                 'backgroundColor': {'red': 0.2, 'green': 0.6, 'blue': 1.0},
                 'textFormat': {'bold': True, 'foregroundColor': {'red': 1, 'green': 1, 'blue': 1}},
                 'horizontalAlignment': 'CENTER'
             })
             
             # Header cột
-            worksheet.format('A4:D4', {
+            writer.format(worksheet, 'A4:D4', {
                 'backgroundColor': {'red': 0.9, 'green': 0.9, 'blue': 0.9},
                 'textFormat': {'bold': True},
                 'horizontalAlignment': 'CENTER'
             })
             
             # Cột phần
-            worksheet.format('A:A', {
+            writer.format(worksheet, 'A:A', {
                 'textFormat': {'bold': True},
                 'backgroundColor': {'red': 0.95, 'green': 0.95, 'blue': 0.95}
             })
             
+            if flush:
+                writer.flush()
         except Exception as e:
             print(f"⚠️  Không thể format worksheet: {e}")
     
-    def format_sla_worksheet(self, worksheet):
-        """Format worksheet SLA"""
+    def format_sla_worksheet(self, worksheet, writer=None):
+        """Format worksheet SLA (gửi kèm batch của writer nếu có)"""
+        flush = writer is None
+        writer = writer or SheetBatchWriter(self.spreadsheet)
         try:
             # Header chính
-            worksheet.format('A1:G1', {
+            writer.format(worksheet, 'A1:G1', {
                 'backgroundColor': {'red': 1.0, 'green': 0.6, 'blue': 0.2},
                 'textFormat': {'bold': True, 'foregroundColor': {'red': 1, 'green': 1, 'blue': 1}},
                 'horizontalAlignment': 'CENTER'
             })
             
             # Header cột
-            worksheet.format('A4:G4', {
+            writer.format(worksheet, 'A4:G4', {
                 'backgroundColor': {'red': 0.9, 'green': 0.9, 'blue': 0.9},
                 'textFormat': {'bold': True},
                 'horizontalAlignment': 'CENTER'
             })
             
+            if flush:
+                writer.flush()
         except Exception as e:
             print(f"⚠️  Không thể format worksheet: {e}")
     
-    def format_logs_worksheet(self, worksheet):
-        """Format worksheet logs"""
+    def format_logs_worksheet(self, worksheet, writer=None):
+        """Format worksheet logs (gửi kèm batch của writer nếu có)"""
+        flush = writer is None
+        writer = writer or SheetBatchWriter(self.spreadsheet)
         try:
             # Header chính
-            worksheet.format('A1:K1', {
+            writer.format(worksheet, 'A1:K1', {
                 'backgroundColor': {'red': 0.6, 'green': 0.8, 'blue': 0.6},
                 'textFormat': {'bold': True, 'foregroundColor': {'red': 1, 'green': 1, 'blue': 1}},
                 'horizontalAlignment': 'CENTER'
             })
             
             # Header cột
-            worksheet.format('A4:K4', {
+            writer.format(worksheet, 'A4:K4', {
                 'backgroundColor': {'red': 0.9, 'green': 0.9, 'blue': 0.9},
                 'textFormat': {'bold': True},
                 'horizontalAlignment': 'CENTER'
             })
             
+            if flush:
+                writer.flush()
         except Exception as e:
             print(f"⚠️  Không thể format worksheet: {e}")
     
@@ -423,8 +387,20 @@ class GoogleSheetsSetup:
 def main():
     """Hàm chính"""
     try:
-        setup = GoogleSheetsSetup()
+        # --dry-run: chạy với Google Sheets giả lập trong bộ nhớ, đếm số request
+        dry_run = "--dry-run" in sys.argv[1:]
+        client = FakeSheetsClient(scheduler=API_SCHEDULER) if dry_run else None
+        setup = GoogleSheetsSetup(client=client)
         setup.run()
+        if dry_run:
+            print(f"🧪 Chạy thử: {client.total_calls()} request")
+            for method, calls in sorted(client.calls.items()):
+                print(f"  - {method}: {calls}")
+            stats = API_SCHEDULER.stats
+            print(
+                f"⏱️  Giới hạn tốc độ: {stats['calls']} lượt gửi, {stats['retries']} lần thử lại, "
+                f"chờ {stats['wait_seconds']:.1f}s"
+            )
     except KeyboardInterrupt:
         print("\n⚠️  Đã hủy thiết lập")
     except Exception as e:
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Sync Stats
+Đồng bộ KPI và số liệu theo ngày lên worksheet "Thống kê tổng quan"
+
+    python scripts/sync_stats.py             # đồng bộ một lần
+    python scripts/sync_stats.py --watch     # đồng bộ mỗi scheduling.interval_hours
+    python scripts/sync_stats.py --dry-run   # chạy với Google Sheets giả lập
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Thêm thư mục gốc vào Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.config import CREDENTIALS_FILE, DATA_PATH, INTERVAL_HOURS, SPREADSHEET_ID
+from utils.fake_sheets import FakeSheetsClient
+from utils.helpers import get_order_aggregates
+from utils.sheets_session import SheetsSession, get_session
+from utils.sheets_sync import STATS_WORKSHEET, StatsSync, SyncScheduler
+
+
+def main():
+    """Hàm chính"""
+    args = sys.argv[1:]
+    dry_run = "--dry-run" in args
+
+    if not SPREADSHEET_ID:
+        print("❌ Không tìm thấy Spreadsheet ID trong config")
+        sys.exit(1)
+
+    aggregates = lambda: get_order_aggregates(DATA_PATH)
+    if dry_run:
+        # Không ghi state ra đĩa để không ảnh hưởng lần đồng bộ thật
+        client = FakeSheetsClient()
+        session = SheetsSession(SPREADSHEET_ID, client=client)
+        sync = StatsSync(session, aggregates, state_path=None)
+    else:
+        session = get_session(SPREADSHEET_ID, CREDENTIALS_FILE or None)
+        sync = StatsSync(session, aggregates)
+
+    if "--watch" in args:
+        print(f"⏰ Đồng bộ mỗi {INTERVAL_HOURS} giờ (Ctrl+C để dừng)")
+        scheduler = SyncScheduler(sync.sync).start()
+        try:
+            while True:
+                time.sleep(60)
+                if scheduler.last_error is not None:
+                    print(f"⚠️  Lỗi đồng bộ: {scheduler.last_error}")
+        except KeyboardInterrupt:
+            scheduler.stop()
+            print("\n👋 Đã dừng đồng bộ")
+        return
+
+    rows = sync.sync()
+    print(f"✅ Đã đồng bộ '{STATS_WORKSHEET}': {rows} dòng thay đổi")
+
+    if dry_run:
+        # Lần thứ hai không có gì đổi nên không gửi request ghi nào
+        before = client.total_calls()
+        rows = sync.sync()
+        print(
+            f"🧪 Lần 2: {rows} dòng thay đổi, {client.total_calls() - before} request"
+        )
+        print(f"🧪 Tổng cộng: {client.total_calls()} request")
+        for method, calls in sorted(client.calls.items()):
+            print(f"  - {method}: {calls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Cấu hình pytest: chạy từ thư mục gốc của dự án như các script
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+
+# Thêm thư mục gốc vào Python path
+sys.path.append(str(ROOT))
+
+
+def load_script(name):
+    """Nạp một script trong scripts/ (không phải package) như một module"""
+    spec = importlib.util.spec_from_file_location(name, ROOT / "scripts" / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeClock:
+    """Đồng hồ đơn điệu giả (giây), chỉ chạy khi gọi advance()"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
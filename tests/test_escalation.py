@@ -0,0 +1,205 @@
+"""
+Kiểm thử utils.escalation với đồng hồ giả và kênh dashboard trong bộ nhớ
+"""
+
+import shutil
+
+import pandas as pd
+import pytest
+from conftest import ROOT, FakeClock
+
+import utils.escalation
+from utils.alerts import ALERT_ENGINE
+from utils.escalation import OPEN_STATUSES, EscalationScheduler, sync_from_store
+from utils.notifications import DashboardFeed, Notifier, summarize
+from utils.order_store import ORDER_STORE
+
+START = pd.Timestamp("2024-06-01 08:00")
+LEVELS = [
+    {"delay_hours": 4, "escalate_to": "team_lead", "conditions": ["priority == 'Cao'"]},
+    {
+        "delay_hours": 8,
+        "escalate_to": "manager",
+        "conditions": ["priority == 'Cao'", "no_response == true"],
+    },
+    {
+        "delay_hours": 24,
+        "escalate_to": "director",
+        "conditions": ["critical_issues > 0"],
+    },
+]
+
+
+@pytest.fixture
+def ts_clock():
+    return FakeClock(START)
+
+
+@pytest.fixture
+def feed():
+    return DashboardFeed()
+
+
+@pytest.fixture
+def escalation(ts_clock, feed):
+    return EscalationScheduler(LEVELS, Notifier({"dashboard": feed}), ts_clock)
+
+
+def fired(events):
+    return [(event.order_id, event.level) for event in events]
+
+
+def test_tick_escalates_due_levels_in_order(escalation, ts_clock, feed):
+    escalation.open("A", START, priority="Cao")
+    escalation.open("B", START, priority="Thấp")
+
+    assert escalation.tick() == []
+    assert escalation.next_due() == START + pd.Timedelta(hours=4)
+
+    ts_clock.advance(pd.Timedelta(hours=4))
+    assert fired(escalation.tick()) == [("A", 1)]
+
+    ts_clock.advance(pd.Timedelta(hours=4))
+    assert fired(escalation.tick()) == [("A", 2)]
+    # Mỗi mức chỉ được xét một lần
+    assert escalation.tick() == []
+    assert fired(feed.recent()) == [("A", 2), ("A", 1)]
+
+
+def test_acknowledge_skips_no_response_levels(escalation, ts_clock):
+    escalation.open("A", START, priority="Cao")
+    ts_clock.advance(pd.Timedelta(hours=4))
+    assert fired(escalation.tick()) == [("A", 1)]
+
+    escalation.acknowledge("A")
+    ts_clock.advance(pd.Timedelta(hours=4))
+    assert escalation.tick() == []
+
+    escalation.update("A", critical_issues=2)
+    ts_clock.advance(pd.Timedelta(hours=16))
+    assert fired(escalation.tick()) == [("A", 3)]
+    assert escalation.next_due() is None
+
+
+def test_close_stops_escalation(escalation, ts_clock):
+    escalation.open("A", START, priority="Cao")
+    escalation.open("B", START, priority="Cao")
+    escalation.close("A")
+    assert len(escalation) == 1
+
+    ts_clock.advance(pd.Timedelta(hours=30))
+    assert fired(escalation.tick()) == [("B", 1), ("B", 2)]
+
+
+def test_reopen_restarts_from_first_level(escalation, ts_clock):
+    escalation.open("A", START, priority="Cao")
+    ts_clock.advance(pd.Timedelta(hours=4))
+    escalation.tick()
+
+    escalation.open("A", ts_clock(), priority="Cao")
+    ts_clock.advance(pd.Timedelta(hours=4))
+    assert fired(escalation.tick()) == [("A", 1)]
+
+
+def test_levels_overdue_at_start_are_not_sent(escalation, ts_clock):
+    # Đơn đã mở 10 giờ khi lịch khởi động: mức 1 và 2 đã quá hạn, bỏ qua
+    escalation.open("old", START - pd.Timedelta(hours=10), priority="Cao")
+    escalation.open_many(
+        ["older", "new"],
+        [START - pd.Timedelta(hours=30), START],
+        {"priority": ["Cao", "Cao"], "critical_issues": [1, 1]},
+    )
+    assert len(escalation) == 3
+    assert escalation.tick() == []
+    assert escalation.next_due() == START + pd.Timedelta(hours=4)
+
+    # Mức 3 của "old" tới hạn sau khởi động (24 - 10 giờ) nên vẫn được xét
+    escalation.update("old", critical_issues=1)
+    ts_clock.advance(pd.Timedelta(hours=14))
+    assert sorted(fired(escalation.tick())) == [("new", 1), ("new", 2), ("old", 3)]
+
+    # "older" đã quá mọi mức từ trước khi khởi động
+    ts_clock.advance(pd.Timedelta(hours=10))
+    assert fired(escalation.tick()) == [("new", 3)]
+    assert escalation.next_due() is None
+
+
+def test_restart_does_not_resend_backlog(ts_clock):
+    df = pd.DataFrame(
+        {
+            "order_id": ["A", "B", "C"],
+            "order_date": [START - pd.Timedelta(hours=h) for h in (2, 9, 50)],
+            "status": ["pending", "confirmed", "delivered"],
+        }
+    )
+    first = EscalationScheduler(LEVELS, None, ts_clock)
+    assert first.sync_orders(df, [0, 0, 0], ["high_priority"]) == 2
+    ts_clock.advance(pd.Timedelta(hours=2))
+    assert fired(first.tick()) == [("A", 1)]
+
+    # Khởi động lại: mức 1 của A đã gửi, mức 2 của B đã quá hạn từ trước
+    restarted = EscalationScheduler(LEVELS, None, ts_clock)
+    restarted.sync_orders(df, [0, 0, 0], ["high_priority"])
+    assert restarted.tick() == []
+    ts_clock.advance(pd.Timedelta(hours=6))
+    assert fired(restarted.tick()) == [("A", 2)]
+
+
+def test_sync_orders_closes_finished_orders(escalation, ts_clock):
+    df = pd.DataFrame(
+        {
+            "order_id": ["A", "B"],
+            "order_date": [START, START],
+            "status": ["pending", "pending"],
+        }
+    )
+    assert escalation.sync_orders(df, [0, 0], ["high_priority"]) == 2
+    df["status"] = ["delivered", "pending"]
+    assert escalation.sync_orders(df, [0, 0], ["high_priority"]) == 0
+    assert len(escalation) == 1
+
+    ts_clock.advance(pd.Timedelta(hours=4))
+    assert fired(escalation.tick()) == [("B", 1)]
+
+
+def test_sync_orders_rejects_misaligned_priorities(escalation):
+    df = pd.DataFrame(
+        {"order_id": ["A", "B"], "order_date": [START, START], "status": "pending"}
+    )
+    with pytest.raises(ValueError):
+        escalation.sync_orders(df, [0], ["high_priority"])
+
+
+def test_sync_from_store_with_priorities_of_older_version(
+    escalation, tmp_path, monkeypatch
+):
+    data_path = tmp_path / "orders.csv"
+    shutil.copy(ROOT / "data" / "orders_sample.csv", data_path)
+    df = ORDER_STORE.get(data_path)
+    codes, _ = ALERT_ENGINE.priorities.codes(df)
+    # Mức ưu tiên cache của phiên bản trước, khi còn thiếu 10 đơn cuối
+    monkeypatch.setattr(
+        utils.escalation, "get_order_priorities", lambda path: codes[:-10]
+    )
+
+    try:
+        opened = sync_from_store(escalation, data_path)
+    finally:
+        ORDER_STORE.invalidate(data_path)
+    assert opened == int(df["status"].isin(OPEN_STATUSES).sum())
+
+
+def test_large_batches_are_summarized(escalation, ts_clock):
+    escalation.open_many(
+        [f"O{i}" for i in range(50)], [START] * 50, {"priority": ["Cao"] * 50}
+    )
+    ts_clock.advance(pd.Timedelta(hours=8))
+    events = escalation.tick()
+    assert len(events) == 100
+
+    lines = summarize(events, limit=20)
+    assert len(lines) == 21
+    assert lines[-1] == (
+        "… và 80 thông báo khác (cấp 2 → manager: 50, cấp 1 → team_lead: 30)"
+    )
+    assert summarize(events[:5], limit=20) == [str(event) for event in events[:5]]
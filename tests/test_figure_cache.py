@@ -0,0 +1,37 @@
+"""
+Kiểm thử cache figure: lưu JSON, mỗi lần gọi nhận một figure riêng
+"""
+
+import plotly.graph_objects as go
+import plotly.io
+
+from utils.figure_cache import FigureCache, cached_figure
+
+
+def bar_figure():
+    return go.Figure(go.Bar(x=["Hà Nội", "TP.HCM"], y=[3, 5]), {"title": "Vùng"})
+
+
+def test_cache_stores_json_and_builds_once():
+    cache = FigureCache(max_bytes=1 << 20)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return bar_figure()
+
+    first_json, figure = cache.get_or_build("bar", 1, {"start": None}, build)
+    second_json, cached = cache.get_or_build("bar", 1, {"start": None}, build)
+    assert len(builds) == 1 and cached is None
+    assert first_json is second_json
+    assert first_json == plotly.io.to_json(figure, validate=False)
+    assert cache.stats()["bytes"] == len(first_json)
+
+
+def test_callers_get_independent_figures():
+    first = cached_figure("independent_bar", ("test", 1), {}, bar_figure)
+    first.update_layout(title="Đã sửa")
+    second = cached_figure("independent_bar", ("test", 1), {}, bar_figure)
+    third = cached_figure("independent_bar", ("test", 1), {}, bar_figure)
+    assert second.layout.title.text == "Vùng"
+    assert second is not third
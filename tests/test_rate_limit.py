@@ -0,0 +1,150 @@
+"""
+Kiểm thử giới hạn tốc độ / thử lại / gộp request (utils.rate_limit)
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils.rate_limit import RequestScheduler, ThrottledAdapter
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+def scripted(*statuses):
+    """send() trả lần lượt các mã HTTP đã cho, đếm số lần gửi"""
+    calls = []
+
+    def send():
+        calls.append(1)
+        return Response(statuses[min(len(calls), len(statuses)) - 1])
+
+    return send, calls
+
+
+@pytest.fixture
+def scheduler():
+    return RequestScheduler(sleep=lambda seconds: None)
+
+
+def test_retries_server_errors_only_when_allowed(scheduler):
+    send, calls = scripted(503, 200)
+    assert scheduler.execute(send).status_code == 200
+    assert len(calls) == 2
+
+    # Request không idempotent (POST append): 5xx trả về ngay, không gửi lại
+    send, calls = scripted(503, 200)
+    assert scheduler.execute(send, retry_errors=False).status_code == 503
+    assert len(calls) == 1
+
+    # 429 luôn được gửi lại
+    send, calls = scripted(429, 200)
+    assert scheduler.execute(send, retry_errors=False).status_code == 200
+    assert len(calls) == 2
+
+
+def test_connection_errors_retried_for_get_only(scheduler):
+    attempts = []
+
+    def send():
+        attempts.append(1)
+        raise ConnectionError("reset")
+
+    with pytest.raises(ConnectionError):
+        scheduler.execute(send, retry_errors=False)
+    assert len(attempts) == 1
+    with pytest.raises(ConnectionError):
+        scheduler.execute(send)
+    assert len(attempts) == 1 + 1 + scheduler.max_retries
+
+
+class Handler(BaseHTTPRequestHandler):
+    hits = []
+    unauthorized = set()
+    delay = 0.0
+
+    def do_GET(self):
+        Handler.hits.append(self.path)
+        time.sleep(Handler.delay)
+        token = self.headers.get("Authorization")
+        status = 401 if token in Handler.unauthorized else 200
+        body = f"{self.path} {token}".encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.hits, Handler.unauthorized, Handler.delay = [], set(), 0.0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+class RefreshingSession(requests.Session):
+    """Như AuthorizedSession: gặp 401 thì làm mới token rồi gọi lại request()"""
+
+    def __init__(self):
+        super().__init__()
+        self.token = "old"
+
+    def request(self, method, url, **kwargs):
+        headers = {"Authorization": self.token}
+        response = super().request(method, url, headers=headers, **kwargs)
+        if response.status_code == 401 and self.token == "old":
+            self.token = "new"
+            return self.request(method, url, **kwargs)
+        return response
+
+
+def mount(session, scheduler):
+    session.mount("http://", ThrottledAdapter(scheduler))
+    return session
+
+
+def test_retry_after_token_refresh_does_not_block(server, scheduler):
+    Handler.unauthorized = {"old"}
+    session = mount(RefreshingSession(), scheduler)
+    result = {}
+    thread = threading.Thread(
+        target=lambda: result.update(response=session.get(f"{server}/values")),
+        daemon=True,
+    )
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert result["response"].text == "/values new"
+    assert Handler.hits == ["/values", "/values"]
+
+
+def test_concurrent_gets_are_coalesced(server, scheduler):
+    Handler.delay = 0.3
+    session = mount(requests.Session(), scheduler)
+    responses = []
+    threads = [
+        threading.Thread(target=lambda: responses.append(session.get(f"{server}/a")))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join(5)
+
+    assert Handler.hits == ["/a"]
+    assert [response.text for response in responses] == ["/a None"] * 4
+    assert scheduler.stats["coalesced"] == 3
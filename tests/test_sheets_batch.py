@@ -0,0 +1,101 @@
+"""
+Kiểm thử ghi batch Google Sheets (utils.sheets_batch) trên client giả lập
+"""
+
+import shutil
+
+import pytest
+from conftest import ROOT, load_script
+
+from utils.fake_sheets import FakeSheetsClient
+from utils.sheets_batch import SheetBatchWriter, a1_to_grid_range
+
+
+@pytest.fixture
+def spreadsheet():
+    client = FakeSheetsClient()
+    spreadsheet = client.open_by_key("test")
+    spreadsheet.add_worksheet("A", rows=100, cols=5)
+    spreadsheet.add_worksheet("B", rows=100, cols=5)
+    client.calls.clear()
+    return spreadsheet
+
+
+def test_a1_to_grid_range():
+    assert a1_to_grid_range("A1:D1", 7) == {
+        "sheetId": 7,
+        "startColumnIndex": 0,
+        "startRowIndex": 0,
+        "endColumnIndex": 4,
+        "endRowIndex": 1,
+    }
+    assert a1_to_grid_range("A:A", 1) == {
+        "sheetId": 1,
+        "startColumnIndex": 0,
+        "endColumnIndex": 1,
+    }
+
+
+def test_flush_sends_one_request_per_kind(spreadsheet):
+    client = spreadsheet.client
+    a, b = spreadsheet._by_title("A"), spreadsheet._by_title("B")
+    writer = SheetBatchWriter(spreadsheet)
+    writer.clear(a).write_rows(a, [["x", 1], ["y"]]).format(a, "A1:B1", {"wrap": 1})
+    writer.write_rows(b, [["z"]], start_row=3, start_col=2)
+
+    assert writer.flush() == 2
+    assert client.calls == {"batchUpdate": 1, "values.batchUpdate": 1}
+    assert a._read() == [["x", "1"], ["y"]]
+    assert b._read() == [[], [], ["", "z"]]
+    assert a.formats == [(a1_to_grid_range("A1:B1", a.id), {"wrap": 1})]
+    # Hàng đợi đã gửi xong
+    assert writer.flush() == 0
+    assert client.total_calls() == 2
+
+
+def test_values_are_raw_unless_requested(spreadsheet):
+    client = spreadsheet.client
+    a = spreadsheet._by_title("A")
+    writer = SheetBatchWriter(spreadsheet)
+    writer.write_rows(a, [["=1+1"]])
+    writer.write_rows(a, [["=SUM(A1)"]], start_row=2, value_input_option="USER_ENTERED")
+
+    # Mỗi valueInputOption một request
+    assert writer.flush() == 2
+    assert client.value_input_options == {"RAW": 1, "USER_ENTERED": 1}
+
+
+def test_large_blocks_split_by_cell_limit(spreadsheet):
+    client = spreadsheet.client
+    a = spreadsheet._by_title("A")
+    rows = [[i, i * 2] for i in range(25)]
+    writer = SheetBatchWriter(spreadsheet, max_cells=20)
+    writer.write_rows(a, rows)
+
+    # 25 dòng × 2 cột, tối đa 20 ô mỗi request
+    assert writer.flush() == 3
+    assert client.total_calls() == 3
+    assert a._read() == [[str(x) for x in row] for row in rows]
+
+
+def test_setup_script_batches_each_worksheet(tmp_path, monkeypatch, capsys):
+    (tmp_path / "config").mkdir()
+    shutil.copy(ROOT / "config" / "system_config.json", tmp_path / "config")
+    monkeypatch.chdir(tmp_path)
+    setup_module = load_script("setup_google_sheets")
+
+    client = FakeSheetsClient()
+    assert setup_module.GoogleSheetsSetup(client=client).run()
+    # Mở spreadsheet, rồi mỗi worksheet: tìm, tạo, một batch định dạng, một batch giá trị
+    assert client.total_calls() == 13
+    assert client.calls["values.batchUpdate"] == 3
+    assert client.value_input_options == {"RAW": 3}
+
+    # Chạy lại: worksheet đã có được xóa trong cùng batch với định dạng
+    client.calls.clear()
+    setup = setup_module.GoogleSheetsSetup(client=client)
+    assert setup.run()
+    assert client.calls == {"get": 4, "batchUpdate": 3, "values.batchUpdate": 3}
+    sla = setup.spreadsheet._by_title("Quy tắc SLA")._read()
+    assert sla[3][0] == "LOẠI ĐƠN HÀNG"
+    assert sla[4][:3] == ["Đơn thường", "2 giờ", "24 giờ"]
@@ -0,0 +1,39 @@
+"""
+Kiểm thử cache worksheet theo TTL + revision Drive (utils.sheets_cache)
+"""
+
+from utils.fake_sheets import FakeSheetsClient
+from utils.sheets_cache import SLA_WORKSHEET, SheetCache
+from utils.sheets_session import SheetsSession
+
+
+def make_cache(clock):
+    client = FakeSheetsClient()
+    session = SheetsSession("test", client=client)
+    worksheet = session.spreadsheet.add_worksheet(SLA_WORKSHEET, rows=100, cols=7)
+    worksheet.update("A1:B1", [["📋 QUY TẮC SLA", ""]])
+    client.calls.clear()
+    return client, worksheet, SheetCache(session, titles=[SLA_WORKSHEET], clock=clock)
+
+
+def test_reloads_only_when_revision_changes(clock):
+    client, worksheet, cache = make_cache(clock)
+    assert cache.get(SLA_WORKSHEET) == [["📋 QUY TẮC SLA"]]
+    assert client.calls == {"drive.files.get": 1, "values.batchGet": 1}
+
+    # Trong TTL: không gọi mạng
+    clock.advance(100)
+    cache.get(SLA_WORKSHEET)
+    assert client.total_calls() == 2
+
+    # Hết TTL nhưng sheet không đổi: chỉ kiểm tra revision
+    clock.advance(300)
+    cache.get(SLA_WORKSHEET)
+    assert client.calls == {"drive.files.get": 2, "values.batchGet": 1}
+
+    # Sheet đổi sau khi mở: revision mới được đọc từ Drive, không phải lúc mở
+    worksheet.update("A2:B2", [["Đơn gấp", "30 phút"]])
+    clock.advance(300)
+    assert cache.get(SLA_WORKSHEET) == [["📋 QUY TẮC SLA"], ["Đơn gấp", "30 phút"]]
+    assert client.calls["values.batchGet"] == 2
+    assert cache.fetches == 2
@@ -0,0 +1,114 @@
+"""
+Kiểm thử ghi nhật ký nối thêm (utils.sheets_log) trên client giả lập
+"""
+
+import json
+
+import pytest
+
+from utils.fake_sheets import FakeSheetsClient
+from utils.sheets_log import (
+    SPOOL_PREFIX,
+    SPOOL_SUFFIX,
+    LogTailReader,
+    SheetsLogWriter,
+)
+
+# Bố cục worksheet nhật ký do setup_google_sheets tạo: dòng 3 và 6 để trống
+LOG_LAYOUT = [
+    ["📝 NHẬT KÝ HỆ THỐNG TỰ ĐỘNG"],
+    ["📅 Tạo:", "01/01/2024 08:00:00"],
+    [],
+    ["THỜI GIAN", "HOẠT ĐỘNG", "TRẠNG THÁI"],
+    ["01/01/2024 08:00:00", "Khởi tạo hệ thống", "✅ Thành công"],
+    [],
+    ["📋 HƯỚNG DẪN SỬ DỤNG:"],
+    ["- Hệ thống sẽ tự động ghi log vào đây"],
+]
+
+
+@pytest.fixture
+def worksheet():
+    spreadsheet = FakeSheetsClient().open_by_key("test")
+    worksheet = spreadsheet.add_worksheet("Nhật ký tự động", rows=1000, cols=12)
+    worksheet.update(f"A1:C{len(LOG_LAYOUT)}", LOG_LAYOUT)
+    spreadsheet.client.calls.clear()
+    return worksheet
+
+
+def spool(tmp_path, pid):
+    return tmp_path / f"{SPOOL_PREFIX}{pid}{SPOOL_SUFFIX}"
+
+
+def test_appends_after_data_block_raw(tmp_path, worksheet):
+    writer = SheetsLogWriter(lambda: worksheet, spool_path=spool(tmp_path, 1))
+    for i in range(3):
+        writer.write([f"02/01/2024 0{i}:00:00", f"=HOẠT ĐỘNG {i}", "OK"])
+    assert writer.flush(timeout=5)
+    writer.close()
+
+    rows = worksheet._read()
+    # Tiêu đề và dòng trống giữ nguyên, log nối sau khối hướng dẫn
+    assert rows[: len(LOG_LAYOUT)] == LOG_LAYOUT
+    assert [row[1] for row in rows[len(LOG_LAYOUT) :]] == [
+        "=HOẠT ĐỘNG 0",
+        "=HOẠT ĐỘNG 1",
+        "=HOẠT ĐỘNG 2",
+    ]
+    client = worksheet.spreadsheet.client
+    assert client.calls == {"values.append": 1}
+    assert client.value_input_options == {"RAW": 1}
+    # Gửi hết thì không để lại spool của tiến trình
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spool_is_exclusive_per_writer(tmp_path, worksheet):
+    writer = SheetsLogWriter(lambda: worksheet, spool_path=spool(tmp_path, 1))
+    with pytest.raises(RuntimeError):
+        SheetsLogWriter(lambda: worksheet, spool_path=spool(tmp_path, 1))
+    writer.close()
+
+
+def test_adopts_spool_of_stopped_process(tmp_path, worksheet):
+    # Tiến trình còn chạy, dòng chưa gửi (chờ đủ lô / hết chu kỳ)
+    live = SheetsLogWriter(
+        lambda: worksheet,
+        spool_path=spool(tmp_path, 2),
+        batch_size=100,
+        flush_interval=60,
+    )
+    live.write(["03/01/2024 00:00:00", "Đang chờ"])
+    # Spool của tiến trình đã dừng (không còn ai giữ khóa)
+    orphan = spool(tmp_path, 999)
+    orphan.write_text(json.dumps(["03/01/2024 00:00:00", "Dở dang"]) + "\n")
+
+    writer = SheetsLogWriter(lambda: worksheet, spool_path=spool(tmp_path, 1))
+    assert not orphan.exists()
+    assert spool(tmp_path, 2).exists()
+    assert writer.flush(timeout=5)
+    writer.close()
+    live.close()
+
+    assert [row[1] for row in worksheet._read()[len(LOG_LAYOUT) :]] == [
+        "Dở dang",
+        "Đang chờ",
+    ]
+
+
+def test_tail_probes_grid_instead_of_column(worksheet):
+    logs = [[f"02/01/2024 00:{i:02d}:00", f"Hoạt động {i}"] for i in range(30)]
+    worksheet.update(f"A9:B{8 + len(logs)}", logs)
+    client = worksheet.spreadsheet.client
+    client.calls.clear()
+
+    reader = LogTailReader(lambda: worksheet)
+    assert reader.tail(5) == logs[-5:]
+    # Lưới 1000 dòng: dò 501-1000 (trống), 5-500, rồi đọc phần cuối
+    assert client.calls == {"values.get": 3}
+    assert reader.last_row == 8 + len(logs)
+
+    # Lần sau chỉ một values.get nhỏ
+    client.calls.clear()
+    worksheet.append_rows([["03/01/2024 00:00:00", "Mới"]])
+    assert reader.tail(2) == [logs[-1], ["03/01/2024 00:00:00", "Mới"]]
+    assert client.calls == {"values.get": 1, "values.append": 1}
@@ -0,0 +1,126 @@
+"""
+Kiểm thử đồng bộ thống kê (utils.sheets_sync) trên client giả lập và đồng hồ giả
+"""
+
+import json
+
+import pytest
+from conftest import ROOT
+
+from utils.aggregates import ORDER_AGGREGATE_KEYS, build_order_cube
+from utils.fake_sheets import FakeSheetsClient
+from utils.order_schema import read_orders_csv
+from utils.sheets_session import SheetsSession
+from utils.sheets_sync import STATS_WORKSHEET, StatsSync, SyncScheduler, stats_rows
+
+
+@pytest.fixture(scope="module")
+def orders():
+    frame, _ = read_orders_csv(ROOT / "data" / "orders_sample.csv")
+    return frame.sort_values("order_date", kind="stable").reset_index(drop=True)
+
+
+def aggregates_of(frame):
+    return build_order_cube(frame).cuboid(ORDER_AGGREGATE_KEYS)
+
+
+def make_sync(client, frames, state_path, spreadsheet_id="test"):
+    session = SheetsSession(spreadsheet_id, client=client)
+    return StatsSync(session, lambda: aggregates_of(frames[-1]), state_path=state_path)
+
+
+def sheet_rows(client):
+    worksheet = client.open_by_key("test")._by_title(STATS_WORKSHEET)
+    client.calls.clear()
+    return worksheet._read()
+
+
+def test_sync_writes_only_changed_rows(orders, tmp_path):
+    client = FakeSheetsClient()
+    state_path = tmp_path / "stats_sync.state.json"
+    last_day = orders["order_date"].dt.normalize().max()
+    frames = [orders[orders["order_date"] < last_day]]
+    sync = make_sync(client, frames, state_path)
+
+    # Lần đầu: lấy danh sách worksheet, tạo worksheet, một batch ghi toàn bộ
+    written = sync.sync()
+    expected = stats_rows(aggregates_of(frames[-1]))
+    assert written == len(expected)
+    assert client.calls == {"get": 2, "batchUpdate": 1, "values.batchUpdate": 1}
+    assert client.value_input_options == {"RAW": 1}
+    assert sheet_rows(client)[4:] == [
+        [str(value) for value in row if value != ""] for row in expected[4:]
+    ]
+    assert json.loads(state_path.read_text())["rows"] == expected
+
+    # Không đổi gì: không gửi request nào
+    assert sync.sync() == 0
+    assert client.total_calls() == 0
+
+    # Thêm ngày cuối: chỉ ghi các dòng đổi (KPI, thời điểm cập nhật, ngày mới)
+    frames.append(orders)
+    written = sync.sync()
+    new = json.loads(state_path.read_text())["rows"]
+    assert new == [
+        row if i != 1 else new[1]
+        for i, row in enumerate(stats_rows(aggregates_of(orders)))
+    ]
+    assert written == sum(
+        1 for i, row in enumerate(new) if i >= len(expected) or expected[i] != row
+    )
+    assert written < len(new) // 2
+    assert client.calls == {"values.batchUpdate": 1}
+    assert sheet_rows(client)[-1][0] == last_day.strftime("%d/%m/%Y")
+
+
+def test_state_file_survives_restart(orders, tmp_path):
+    client = FakeSheetsClient()
+    state_path = tmp_path / "stats_sync.state.json"
+    make_sync(client, [orders], state_path).sync()
+    client.calls.clear()
+
+    # Khởi động lại với cùng state: chỉ tìm worksheet, không ghi lại gì
+    restarted = make_sync(client, [orders], state_path)
+    assert restarted.sync() == 0
+    assert client.calls == {"get": 2}
+
+    # State của spreadsheet khác bị bỏ qua: ghi lại toàn bộ
+    other = make_sync(FakeSheetsClient(), [orders], state_path, "other")
+    assert other.sync() == len(stats_rows(aggregates_of(orders)))
+
+
+def test_scheduler_runs_on_interval(clock):
+    runs = []
+    scheduler = SyncScheduler(lambda: runs.append(clock()), 1, clock=clock)
+    assert scheduler.tick()
+    assert not scheduler.tick()
+
+    clock.advance(3599)
+    assert not scheduler.tick()
+    clock.advance(1)
+    assert scheduler.tick()
+    assert runs == [0, 3600]
+
+    # Lỗi của tác vụ không làm hỏng lịch
+    scheduler = SyncScheduler(lambda: 1 / 0, 1, clock=clock)
+    assert scheduler.tick()
+    assert isinstance(scheduler.last_error, ZeroDivisionError)
+    assert scheduler.next_run == clock() + 3600
+
+
+def test_scheduled_sync_sends_requests_only_when_due(orders, clock):
+    client = FakeSheetsClient()
+    sync = make_sync(client, [orders], None)
+    scheduler = SyncScheduler(sync.sync, 0.5, clock=clock)
+
+    assert scheduler.tick()
+    first = client.total_calls()
+    assert first == 4  # mở spreadsheet, tìm + tạo worksheet, một batch giá trị
+
+    clock.advance(1000)
+    assert not scheduler.tick()
+    clock.advance(800)
+    assert scheduler.tick()
+    # Tới hạn nhưng dữ liệu không đổi: không request nào
+    assert client.total_calls() == first
+    assert sync.last_rows_written == 0
@@ -0,0 +1,82 @@
+"""
+Kiểm thử snapshot đơn hàng: hai chế độ đọc cùng kiểu dữ liệu, nhiều tiến trình
+cùng nén không giẫm lên nhau
+"""
+
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytest
+from conftest import ROOT
+
+from utils.snapshot import (
+    compact_csv,
+    load_manifest,
+    read_orders,
+    read_snapshot,
+    snapshot_available,
+    snapshot_dir_for,
+)
+
+pytestmark = pytest.mark.skipif(not snapshot_available(), reason="cần pyarrow")
+
+SAMPLE = ROOT / "data" / "orders_sample.csv"
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "orders.csv"
+    shutil.copy(SAMPLE, path)
+    return path
+
+
+def append_copy(path, lines=5):
+    """Ghi nối lại vài dòng đầu (đổi kích thước và mtime của file)"""
+    rows = path.read_bytes().splitlines(keepends=True)[1 : lines + 1]
+    with open(path, "ab") as f:
+        f.write(b"".join(rows))
+
+
+def test_read_modes_return_same_dtypes(csv_path):
+    parquet, _ = read_orders(csv_path, mode="parquet")
+    mmap, _ = read_orders(csv_path, mode="mmap")
+    assert parquet.dtypes.equals(mmap.dtypes)
+    assert parquet["order_id"].dtype == object
+    pd.testing.assert_frame_equal(
+        parquet.sort_values("order_id", ignore_index=True),
+        mmap.sort_values("order_id", ignore_index=True),
+    )
+
+
+def test_recompaction_keeps_version_still_referenced(csv_path):
+    snapshot_dir = snapshot_dir_for(csv_path)
+    first = compact_csv(csv_path)
+    append_copy(csv_path)
+    second = compact_csv(csv_path)
+
+    # Tiến trình đang giữ manifest cũ vẫn đọc được phiên bản đó
+    assert (snapshot_dir / first["data_dir"]).exists()
+    assert len(read_snapshot(snapshot_dir, manifest=first)) == first["rows"]
+
+    append_copy(csv_path)
+    third = compact_csv(csv_path)
+    versions = {path.name for path in snapshot_dir.glob("v-*")}
+    assert versions == {second["data_dir"], third["data_dir"]}
+    assert load_manifest(snapshot_dir) == third
+
+
+def _compact(csv_path):
+    return compact_csv(csv_path)["data_dir"]
+
+
+def test_concurrent_compaction_of_same_signature(csv_path):
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        data_dirs = set(pool.map(_compact, [csv_path] * 8))
+
+    snapshot_dir = snapshot_dir_for(csv_path)
+    assert len(data_dirs) == 1
+    assert [path.name for path in snapshot_dir.glob("v-*")] == list(data_dirs)
+    assert not list(snapshot_dir.glob(".*.tmp"))
+    frame, _ = read_orders(csv_path)
+    assert len(frame) == load_manifest(snapshot_dir)["rows"]
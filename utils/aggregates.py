@@ -0,0 +1,245 @@
+"""
+Order Aggregates
+Bảng tổng hợp đơn hàng theo nhóm (ngày, vùng, trạng thái...), cập nhật dần khi có đơn mới
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Các chiều nhóm được hỗ trợ và cách lấy giá trị từ frame đơn hàng
+KEY_FUNCTIONS = {
+    "day": lambda df: df["order_date"].dt.normalize(),
+    "hour": lambda df: df["order_date"].dt.hour,
+    # 0 = thứ Hai ... 6 = Chủ nhật
+    "weekday": lambda df: df["order_date"].dt.dayofweek,
+    "region": lambda df: df["region"],
+    "status": lambda df: df["status"],
+    "customer_type": lambda df: df["customer_type"],
+    "product_category": lambda df: df["product_category"],
+}
+
+# Tổng cộng dồn: tên chỉ số -> cột nguồn (None = đếm số đơn)
+SUM_MEASURES = {
+    "orders": None,
+    "confirmed_ontime": "is_confirmed_ontime",
+    "delivered_ontime": "is_delivered_ontime",
+    "order_value": "order_value",
+    "confirm_hours": "confirm_hours",
+    "delivery_hours": "delivery_hours",
+}
+MIN_MEASURES = {"order_value_min": "order_value"}
+MAX_MEASURES = {"order_value_max": "order_value"}
+
+_INT_MAX = np.iinfo(np.int64).max
+_INT_MIN = np.iinfo(np.int64).min
+
+
+class AggregateTable:
+    """Tổng hợp có thể gộp (tổng, min, max) theo các chiều nhóm cho trước"""
+
+    def __init__(self, keys):
+        self.keys = tuple(keys)
+        self._index = {}
+        self._key_rows = []
+        self._sums = np.zeros((0, len(SUM_MEASURES)), dtype=np.int64)
+        self._mins = np.zeros((0, len(MIN_MEASURES)), dtype=np.int64)
+        self._maxs = np.zeros((0, len(MAX_MEASURES)), dtype=np.int64)
+        self._frame = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df, keys):
+        """Dựng bảng tổng hợp từ toàn bộ lịch sử đơn hàng"""
+        table = cls(keys)
+        table.append(df)
+        return table
+
+    def __len__(self):
+        return len(self._key_rows)
+
+    def _group(self, batch):
+        """Gom một lô đơn hàng theo các chiều, trả về (danh sách khóa, tổng, min, max)"""
+        values = {"orders": np.ones(len(batch), dtype=np.int64)}
+        for name, column in {**SUM_MEASURES, **MIN_MEASURES, **MAX_MEASURES}.items():
+            if column is not None:
+                values[name] = batch[column].to_numpy(dtype=np.int64)
+        values = pd.DataFrame(values, index=batch.index)
+
+        by = [KEY_FUNCTIONS[key](batch).rename(key) for key in self.keys]
+        grouped = values.groupby(by, observed=True, sort=False).agg(
+            {
+                **{name: "sum" for name in SUM_MEASURES},
+                **{name: "min" for name in MIN_MEASURES},
+                **{name: "max" for name in MAX_MEASURES},
+            }
+        )
+        if len(self.keys) == 1:
+            key_tuples = [(key,) for key in grouped.index.tolist()]
+        else:
+            key_tuples = grouped.index.tolist()
+        return (
+            key_tuples,
+            grouped[list(SUM_MEASURES)].to_numpy(dtype=np.int64),
+            grouped[list(MIN_MEASURES)].to_numpy(dtype=np.int64),
+            grouped[list(MAX_MEASURES)].to_numpy(dtype=np.int64),
+        )
+
+    def _reserve(self, size):
+        """Mở rộng mảng theo cấp số nhân để append có chi phí khấu hao O(1)"""
+        capacity = len(self._sums)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 64)
+        sums = np.zeros((capacity, self._sums.shape[1]), dtype=np.int64)
+        mins = np.full((capacity, self._mins.shape[1]), _INT_MAX, dtype=np.int64)
+        maxs = np.full((capacity, self._maxs.shape[1]), _INT_MIN, dtype=np.int64)
+        used = len(self._key_rows)
+        sums[:used] = self._sums[:used]
+        mins[:used] = self._mins[:used]
+        maxs[:used] = self._maxs[:used]
+        self._sums, self._mins, self._maxs = sums, mins, maxs
+
+    def _merge_groups(self, key_tuples, sums, mins, maxs):
+        """Cộng các nhóm đã gom vào bảng, mỗi khóa chỉ xuất hiện một lần"""
+        with self._lock:
+            rows = np.empty(len(key_tuples), dtype=np.int64)
+            for i, key in enumerate(key_tuples):
+                row = self._index.get(key)
+                if row is None:
+                    row = len(self._key_rows)
+                    self._reserve(row + 1)
+                    self._index[key] = row
+                    self._key_rows.append(key)
+                rows[i] = row
+
+            self._sums[rows] += sums
+            self._mins[rows] = np.minimum(self._mins[rows], mins)
+            self._maxs[rows] = np.maximum(self._maxs[rows], maxs)
+            self._frame = None
+
+    def append(self, batch):
+        """Cộng một lô đơn hàng mới vào bảng, chi phí tỉ lệ với kích thước lô"""
+        if batch is not None and not batch.empty:
+            self._merge_groups(*self._group(batch))
+        return self
+
+    def merge(self, other):
+        """Gộp một bảng tổng hợp khác cùng chiều vào bảng này"""
+        if other.keys != self.keys:
+            raise ValueError("Chỉ gộp được bảng tổng hợp có cùng các chiều nhóm")
+        used = len(other)
+        self._merge_groups(
+            list(other._key_rows),
+            other._sums[:used],
+            other._mins[:used],
+            other._maxs[:used],
+        )
+        return self
+
+    def frame(self, start=None, end=None):
+        """Bảng tổng hợp dạng DataFrame, có thể lọc theo khoảng ngày"""
+        with self._lock:
+            if self._frame is None:
+                used = len(self._key_rows)
+                frame = pd.DataFrame(self._key_rows, columns=list(self.keys))
+                for i, name in enumerate(SUM_MEASURES):
+                    frame[name] = self._sums[:used, i].copy()
+                for i, name in enumerate(MIN_MEASURES):
+                    frame[name] = self._mins[:used, i].copy()
+                for i, name in enumerate(MAX_MEASURES):
+                    frame[name] = self._maxs[:used, i].copy()
+                self._frame = frame
+            frame = self._frame
+
+        if "day" in self.keys and (start is not None or end is not None):
+            mask = np.ones(len(frame), dtype=bool)
+            if start is not None:
+                mask &= frame["day"] >= pd.Timestamp(start).normalize()
+            if end is not None:
+                mask &= frame["day"] <= pd.Timestamp(end).normalize()
+            frame = frame[mask]
+        return frame
+
+    def rollup(self, by, start=None, end=None, where=None):
+        """Gộp bảng về các chiều con (ví dụ chỉ theo ngày), lọc theo where nếu có"""
+        frame = self.frame(start, end)
+        for key, values in (where or {}).items():
+            if isinstance(values, (list, tuple, set)):
+                frame = frame[frame[key].isin(list(values))]
+            else:
+                frame = frame[frame[key] == values]
+
+        aggregations = {
+            **{name: "sum" for name in SUM_MEASURES},
+            **{name: "min" for name in MIN_MEASURES},
+            **{name: "max" for name in MAX_MEASURES},
+        }
+        if not by:
+            return frame.agg(aggregations).to_frame().T.reset_index(drop=True)
+        return frame.groupby(list(by), observed=True).agg(aggregations).reset_index()
+
+
+# Bảng tổng hợp chuẩn cho KPI và timeline: theo ngày × vùng × trạng thái
+ORDER_AGGREGATE_KEYS = ("day", "region", "status")
+
+
+def build_order_aggregates(df):
+    """Dựng bảng tổng hợp ngày × vùng × trạng thái từ frame đơn hàng"""
+    return AggregateTable.from_frame(df, ORDER_AGGREGATE_KEYS)
+
+
+# Các cuboid được vật chất hóa: mỗi biểu đồ đọc từ cuboid nhỏ nhất đủ chiều,
+# kích thước chỉ phụ thuộc số ngày và số tổ hợp chiều, không phụ thuộc số đơn
+CUBE_CUBOIDS = (
+    ORDER_AGGREGATE_KEYS,
+    ("day", "hour", "status"),
+    ("weekday", "hour", "status"),
+    ("region", "status", "customer_type", "product_category"),
+    ("day", "customer_type", "product_category"),
+)
+
+
+class RollupCube:
+    """Tập các bảng tổng hợp (cuboid) theo ngày/giờ/thứ/vùng/trạng thái/
+    loại khách hàng/ngành hàng, truy vấn tự chọn cuboid phù hợp"""
+
+    def __init__(self, cuboids=CUBE_CUBOIDS):
+        self.cuboids = {tuple(keys): AggregateTable(keys) for keys in cuboids}
+
+    @classmethod
+    def from_frame(cls, df, cuboids=CUBE_CUBOIDS):
+        """Dựng cube từ toàn bộ lịch sử đơn hàng"""
+        return cls(cuboids).append(df)
+
+    def append(self, batch):
+        """Cộng một lô đơn hàng mới vào mọi cuboid"""
+        for table in self.cuboids.values():
+            table.append(batch)
+        return self
+
+    def cuboid(self, keys):
+        """Cuboid đúng bộ chiều keys"""
+        return self.cuboids[tuple(keys)]
+
+    def _plan(self, needed):
+        """Cuboid nhỏ nhất chứa đủ các chiều cần dùng"""
+        candidates = [
+            table for keys, table in self.cuboids.items() if needed <= set(keys)
+        ]
+        if not candidates:
+            raise KeyError(f"Không có cuboid nào chứa các chiều: {sorted(needed)}")
+        return min(candidates, key=len)
+
+    def query(self, by=(), start=None, end=None, where=None):
+        """Tổng hợp theo các chiều by, trong khoảng ngày và bộ lọc where"""
+        needed = set(by) | set(where or {})
+        if start is not None or end is not None:
+            needed.add("day")
+        return self._plan(needed).rollup(by, start, end, where)
+
+
+def build_order_cube(df):
+    """Dựng rollup cube từ frame đơn hàng"""
+    return RollupCube.from_frame(df)
@@ -0,0 +1,226 @@
+"""
+Alerts
+Phát hiện cảnh báo theo alert_rules của business_config.json: mỗi rule được
+biên dịch thành mask vector hóa trên frame đơn hàng, thời hạn theo mức ưu tiên /
+hình thức giao được tra bằng chỉ số mảng thay vì duyệt từng dòng
+"""
+
+import numpy as np
+import pandas as pd
+
+from config.config import ALERT_RULES, CONFIRMATION_DEADLINES, DELIVERY_DEADLINES
+from utils.order_schema import STATUS_LABELS
+from utils.rule_engine import PriorityRules, RuleContext, RuleSet
+
+# Thứ tự hiển thị theo mức nghiêm trọng
+SEVERITY_ORDER = ["critical", "high", "medium", "low", "info"]
+SEVERITY_ICONS = {
+    "critical": "🔴",
+    "high": "🟠",
+    "medium": "🟡",
+    "low": "🔵",
+    "info": "ℹ️",
+}
+# Cột đơn hàng đưa vào bảng cảnh báo
+ALERT_COLUMNS = ["order_id", "order_date", "status", "region", "order_value"]
+
+
+def deadline_lookup(deadlines, keys, codes):
+    """Thời hạn (ngày) cho mỗi đơn: keys[code] tra trong deadlines, -1 lấy default"""
+    default = float(deadlines.get("default", np.nan))
+    table = np.array([deadlines.get(key, default) for key in keys] + [default], float)
+    return table[codes]
+
+
+def shipping_deadlines(df, deadlines=None):
+    """Thời hạn giao hàng theo shipping_method ('express' -> express_shipping)"""
+    deadlines = DELIVERY_DEADLINES if deadlines is None else deadlines
+    if "shipping_method" not in df.columns:
+        return np.full(len(df), float(deadlines.get("default", np.nan)))
+    codes, methods = pd.factorize(df["shipping_method"])
+    keys = [
+        f"{method}_shipping" if f"{method}_shipping" in deadlines else method
+        for method in methods
+    ]
+    return deadline_lookup(deadlines, keys, codes)
+
+
+def status_labels(status):
+    """Trạng thái theo nhãn của cấu hình (pending -> Chờ xác nhận), giữ dạng phân loại"""
+    if not isinstance(status.dtype, pd.CategoricalDtype):
+        status = status.astype("category")
+    return status.cat.rename_categories(lambda value: STATUS_LABELS.get(value, value))
+
+
+def order_inputs(df, priorities, priority_codes=None):
+    """Biến không phụ thuộc thời điểm đánh giá của từng đơn: mức ưu tiên, thời hạn
+
+    Chỉ tính một lần cho mỗi đơn (nối thêm theo lô được), dùng lại giữa các lần
+    evaluate
+    """
+    if priority_codes is None:
+        priority_codes, _ = priorities.codes(df)
+    return {
+        "priority_code": priority_codes,
+        "confirmation_deadline": deadline_lookup(
+            CONFIRMATION_DEADLINES, priorities.names, priority_codes
+        ),
+        "delivery_deadline": shipping_deadlines(df),
+    }
+
+
+def order_variables(df, now, inputs):
+    """Biến dẫn xuất dùng trong điều kiện cảnh báo, mỗi biến là một mảng theo đơn"""
+    days_since_order = (
+        np.datetime64(now, "ns") - df["order_date"].to_numpy()
+    ) / np.timedelta64(1, "D")
+    return {
+        "status": status_labels(df["status"]),
+        "days_since_order": days_since_order,
+        # Thời điểm xác nhận = ngày đặt + confirm_hours
+        "days_since_confirmation": days_since_order
+        - df["confirm_hours"].to_numpy() / 24,
+        "confirmation_deadline": inputs["confirmation_deadline"],
+        "delivery_deadline": inputs["delivery_deadline"],
+    }
+
+
+class AlertRule:
+    """Một rule cảnh báo: các điều kiện gộp bằng all"""
+
+    def __init__(self, key, definition):
+        self.key = key
+        self.name = definition.get("name", key)
+        self.description = definition.get("description", "")
+        self.severity = definition.get("severity", "info")
+        self.channels = list(definition.get("notification_channels", []))
+        self.actions = list(definition.get("auto_actions", []))
+        self.conditions = RuleSet(definition.get("conditions", []), "all")
+
+    def missing(self, context):
+        """Các tên trong điều kiện không có trong dữ liệu"""
+        return sorted(name for name in self.conditions.names if not context.has(name))
+
+
+class AlertResult:
+    """Mask cảnh báo của từng rule trên một frame
+
+    skipped: rule không đánh giá được vì dữ liệu thiếu cột (payment_status...)
+    """
+
+    def __init__(self, df, rules, masks, skipped, variables, now):
+        self.df = df
+        self.rules = rules
+        self.masks = masks
+        self.skipped = skipped
+        self.variables = variables
+        self.now = now
+
+    def count(self, key):
+        return int(self.masks[key].sum()) if key in self.masks else 0
+
+    @property
+    def total(self):
+        return sum(self.count(key) for key in self.masks)
+
+    def _ordered(self, channel=None):
+        rules = [
+            rule
+            for rule in self.rules.values()
+            if rule.key in self.masks and (channel is None or channel in rule.channels)
+        ]
+        return sorted(rules, key=lambda rule: _severity_rank(rule.severity))
+
+    def summary(self, channel=None):
+        """Số đơn cảnh báo theo rule, nghiêm trọng nhất trước"""
+        return pd.DataFrame(
+            [
+                {
+                    "rule": rule.key,
+                    "name": rule.name,
+                    "severity": rule.severity,
+                    "orders": self.count(rule.key),
+                    "channels": ", ".join(rule.channels),
+                }
+                for rule in self._ordered(channel)
+            ],
+            columns=["rule", "name", "severity", "orders", "channels"],
+        )
+
+    def table(self, channel=None, limit=None):
+        """Bảng cảnh báo (mỗi dòng một đơn × rule), nghiêm trọng và lâu nhất trước
+
+        Với limit chỉ sắp xếp các đơn của những rule cần lấy, không dựng bảng đầy đủ
+        """
+        days = self.variables["days_since_order"]
+        parts = []
+        remaining = limit
+        for rule in self._ordered(channel):
+            if remaining is not None and remaining <= 0:
+                break
+            positions = np.flatnonzero(self.masks[rule.key])
+            order = np.argsort(-days[positions], kind="stable")
+            positions = positions[order[:remaining] if remaining is not None else order]
+            if remaining is not None:
+                remaining -= len(positions)
+            part = self.df.iloc[positions][ALERT_COLUMNS].reset_index(drop=True)
+            part.insert(0, "severity", rule.severity)
+            part.insert(1, "alert", rule.name)
+            part["days_since_order"] = days[positions].round(1)
+            parts.append(part)
+
+        if not parts:
+            return pd.DataFrame(
+                columns=["severity", "alert", *ALERT_COLUMNS, "days_since_order"]
+            )
+        return pd.concat(parts, ignore_index=True)
+
+
+def _severity_rank(severity):
+    return (
+        SEVERITY_ORDER.index(severity)
+        if severity in SEVERITY_ORDER
+        else len(SEVERITY_ORDER)
+    )
+
+
+class AlertEngine:
+    """Đánh giá toàn bộ alert_rules trên frame đơn hàng trong một lượt vector hóa"""
+
+    def __init__(self, alert_rules, priorities=None):
+        self.rules = {key: AlertRule(key, rule) for key, rule in alert_rules.items()}
+        self.priorities = priorities or PriorityRules.from_config()
+
+    @classmethod
+    def from_config(cls, alert_rules=None):
+        return cls(ALERT_RULES if alert_rules is None else alert_rules)
+
+    def inputs(self, df):
+        """Biến không phụ thuộc thời điểm của từng đơn (xem order_inputs)"""
+        return order_inputs(df, self.priorities)
+
+    def evaluate(self, df, now=None, priority_codes=None, inputs=None):
+        """Mask cảnh báo của mọi rule
+
+        priority_codes: mã mức ưu tiên đã tính sẵn (PriorityRules.codes);
+        inputs: kết quả inputs(df) đã tính sẵn. Cả hai để cache theo dữ liệu
+        thay vì tính lại mỗi lần, chỉ phần phụ thuộc now được tính lại
+        """
+        now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+        if inputs is None:
+            inputs = order_inputs(df, self.priorities, priority_codes)
+        variables = order_variables(df, now, inputs)
+        context = RuleContext(df, variables)
+
+        masks, skipped = {}, {}
+        for rule in self.rules.values():
+            missing = rule.missing(context)
+            if missing:
+                skipped[rule.key] = missing
+            else:
+                masks[rule.key] = rule.conditions.evaluate(context)
+        return AlertResult(df, self.rules, masks, skipped, variables, now)
+
+
+# Engine dùng chung theo cấu hình hiện tại
+ALERT_ENGINE = AlertEngine.from_config()
@@ -0,0 +1,187 @@
+"""
+Column Buffer
+Cột dữ liệu nối thêm được với chi phí khấu hao tỉ lệ kích thước lô: dung lượng
+tăng gấp đôi khi đầy, phần đã ghi không bao giờ bị ghi đè nên frame / view của
+các phiên bản trước vẫn đúng sau khi nối tiếp
+"""
+
+import numpy as np
+import pandas as pd
+
+# Dung lượng tối thiểu khi phải cấp mảng mới
+MIN_CAPACITY = 1024
+
+
+def code_dtype(categories):
+    """Kiểu mã của Categorical với số categories này (như pandas tự chọn)"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def read_only(values):
+    """View chỉ đọc của mảng (mảng gốc vẫn ghi được, ví dụ để nối thêm)"""
+    view = values.view()
+    view.flags.writeable = False
+    return view
+
+
+def read_only_frame(frame):
+    """Frame trên view chỉ đọc của các cột, không sao chép dữ liệu
+
+    Ghi đè tại chỗ (iloc, loc theo dòng, inplace) báo lỗi thay vì sửa dữ liệu
+    dùng chung; gán lại cả cột chỉ đổi frame của người gọi
+    """
+    columns = {}
+    for column in frame.columns:
+        values = frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Categorical.codes đã là view chỉ đọc
+            values = pd.Categorical.from_codes(
+                values.array.codes, dtype=values.dtype, validate=False
+            )
+        elif isinstance(values.dtype, np.dtype):
+            values = read_only(values.to_numpy())
+        columns[column] = values
+    return pd.DataFrame(columns, index=frame.index, copy=False)
+
+
+class GrowableArray:
+    """Mảng một chiều chỉ nối thêm
+
+    Dung lượng ban đầu bằng đúng độ dài mảng nguồn nên lần nối đầu tiên luôn
+    cấp mảng mới: mảng nguồn (có thể chỉ đọc, memory-map, dùng chung) không bị
+    ghi vào và không phải sao chép khi chưa nối gì
+    """
+
+    def __init__(self, values, dtype=None):
+        self._data = np.asarray(values, dtype=dtype)
+        self._size = len(self._data)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    def _reserve(self, size):
+        capacity = len(self._data)
+        if size <= capacity:
+            return
+        data = np.empty(max(size, capacity * 2, MIN_CAPACITY), dtype=self.dtype)
+        data[: self._size] = self._data[: self._size]
+        self._data = data
+
+    def append(self, values):
+        """Nối values vào cuối (ép về kiểu của mảng)"""
+        values = np.asarray(values, dtype=self.dtype)
+        end = self._size + len(values)
+        self._reserve(end)
+        self._data[self._size : end] = values
+        self._size = end
+        return self
+
+    def astype(self, dtype):
+        """Bản sao với kiểu khác (ví dụ mở rộng kiểu mã của cột phân loại)"""
+        return GrowableArray(self.view().astype(dtype))
+
+    def view(self):
+        """Phần đã dùng, không sao chép"""
+        return self._data[: self._size]
+
+
+class FrameBuffer:
+    """Frame nối thêm được: mỗi cột là một GrowableArray
+
+    Cột phân loại giữ mã cùng categories, categories mới của lô được thêm vào
+    cuối nên mã cũ vẫn đúng. frame() dựng DataFrame trên view của các cột
+    """
+
+    def __init__(self, frame):
+        self.columns = list(frame.columns)
+        self._size = len(frame)
+        self._arrays = {}
+        self._dtypes = {}
+        for column in self.columns:
+            values = frame[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                self._dtypes[column] = values.dtype
+                values = values.cat.codes
+            self._arrays[column] = GrowableArray(values.to_numpy())
+
+    def __len__(self):
+        return self._size
+
+    def _codes(self, column, values):
+        """Mã của một cột phân loại trong lô, thêm categories chưa có"""
+        dtype = self._dtypes[column]
+        categories = (
+            values.cat.categories
+            if isinstance(values.dtype, pd.CategoricalDtype)
+            else pd.Index(values.dropna().unique())
+        )
+        missing = categories[~categories.isin(dtype.categories)]
+        if len(missing):
+            dtype = pd.CategoricalDtype(
+                dtype.categories.append(missing), ordered=dtype.ordered
+            )
+            self._dtypes[column] = dtype
+            wider = code_dtype(len(dtype.categories))
+            if wider.itemsize > self._arrays[column].dtype.itemsize:
+                self._arrays[column] = self._arrays[column].astype(wider)
+        return pd.Categorical(values, dtype=dtype).codes
+
+    def append(self, batch):
+        """Nối các dòng của batch (cùng các cột), chi phí tỉ lệ kích thước lô"""
+        if batch is None or not len(batch):
+            return self
+        for column in self.columns:
+            values = batch[column]
+            if column in self._dtypes:
+                values = self._codes(column, values)
+            else:
+                values = values.to_numpy()
+            self._arrays[column].append(values)
+        self._size += len(batch)
+        return self
+
+    def frame(self):
+        """DataFrame của các dòng hiện có, các cột là view chỉ đọc (không sao chép)"""
+        columns = {}
+        for column in self.columns:
+            values = read_only(self._arrays[column].view())
+            dtype = self._dtypes.get(column)
+            if dtype is not None:
+                values = pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+            columns[column] = values
+        return pd.DataFrame(columns, index=pd.RangeIndex(self._size), copy=False)
+
+
+class RowColumns:
+    """Các cột tính riêng cho từng đơn bằng compute(frame) -> {tên: mảng}
+
+    Phiên bản nối thêm tính compute trên lô mới rồi nối vào các cột chung;
+    columns là view của phiên bản này
+    """
+
+    def __init__(self, compute, frame, buffer=None):
+        self.compute = compute
+        if buffer is None:
+            buffer = FrameBuffer(pd.DataFrame(compute(frame), copy=False))
+        self._buffer = buffer
+        self.columns = {
+            name: values.to_numpy() for name, values in buffer.frame().items()
+        }
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def append(self, batch):
+        """Phiên bản mới gồm cả batch, chi phí tỉ lệ kích thước lô"""
+        self._buffer.append(pd.DataFrame(self.compute(batch), copy=False))
+        return RowColumns(self.compute, None, self._buffer)
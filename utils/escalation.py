@@ -0,0 +1,369 @@
+"""
+Escalation
+Leo thang đơn hàng mở quá lâu theo automation_rules.auto_escalation: các đơn
+đang mở nằm trong min-heap theo thời điểm leo thang kế tiếp, mỗi tick chỉ lấy
+các đơn đã tới hạn thay vì quét lại toàn bộ backlog
+"""
+
+import bisect
+import heapq
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from config.config import AUTO_ESCALATION, DATA_PATH, SCHEDULING_ENABLED
+from utils.alerts import ALERT_ENGINE
+from utils.helpers import get_data_version, get_order_priorities
+from utils.notifications import NOTIFIER
+from utils.order_store import ORDER_STORE
+from utils.rule_engine import RuleContext, RuleSet
+from utils.sheets_sync import SyncScheduler
+
+# Nhãn mức ưu tiên dùng trong điều kiện leo thang (theo display_config.priority_colors)
+PRIORITY_LABELS = {
+    "high_priority": "Cao",
+    "medium_priority": "Trung bình",
+    "low_priority": "Thấp",
+}
+# Trạng thái còn mở (chưa giao / chưa hủy)
+OPEN_STATUSES = ("pending", "confirmed")
+# Thuộc tính mặc định của đơn khi chưa có phản hồi / sự cố nào được ghi nhận
+DEFAULT_ATTRIBUTES = {"no_response": True, "critical_issues": 0}
+# Chu kỳ tick của luồng nền (giờ)
+TICK_INTERVAL_HOURS = 1 / 60
+
+_HOUR_NS = 3600 * 10**9
+
+
+def _ns(value):
+    """Thời điểm -> số nano giây (Timestamp không múi giờ, cùng gốc với order_date)"""
+    return pd.Timestamp(value).value
+
+
+@dataclass(frozen=True)
+class EscalationEvent:
+    """Một lần leo thang của một đơn"""
+
+    order_id: str
+    level: int
+    escalate_to: str
+    due_at: pd.Timestamp
+    hours_open: float
+
+    @property
+    def category(self):
+        """Nhóm khi tóm tắt lô lớn (xem utils.notifications.summarize)"""
+        return f"cấp {self.level} → {self.escalate_to}"
+
+    def __str__(self):
+        return (
+            f"⏫ Đơn {self.order_id} mở {self.hours_open:.1f} giờ:"
+            f" leo thang cấp {self.level} tới {self.escalate_to}"
+        )
+
+
+class EscalationLevel:
+    """Một mức leo thang: sau delay_hours, nếu mọi điều kiện thỏa"""
+
+    def __init__(self, number, definition):
+        self.number = number
+        self.delay_ns = int(definition["delay_hours"] * _HOUR_NS)
+        self.escalate_to = definition.get("escalate_to", "")
+        self.conditions = RuleSet(definition.get("conditions", []), "all")
+
+
+class EscalationScheduler:
+    """Min-heap (thời điểm tới hạn, đơn, thế hệ, mức) của các đơn đang mở
+
+    Đóng / mở lại đơn chỉ đổi thế hệ của đơn, entry cũ trong heap bị bỏ qua khi
+    lấy ra (heap được dựng lại khi entry cũ chiếm quá nửa). Mỗi tick tốn
+    O(k log n) với k đơn tới hạn; điều kiện của cả lô được đánh giá vector hóa.
+
+    Chỉ các mức tới hạn sau khi lịch khởi động mới được xếp: đơn đã mở lâu
+    bắt đầu từ mức kế tiếp chưa tới hạn, nên lần khởi động (lại) đầu tiên không
+    gửi dồn mọi mức đã quá hạn của cả backlog
+    """
+
+    def __init__(self, levels=None, notifier=NOTIFIER, clock=pd.Timestamp.now):
+        levels = AUTO_ESCALATION.get("levels", []) if levels is None else levels
+        self.levels = [
+            EscalationLevel(number, definition)
+            for number, definition in enumerate(
+                sorted(levels, key=lambda level: level["delay_hours"]), start=1
+            )
+        ]
+        self.notifier = notifier
+        self.clock = clock
+        self.started_ns = _ns(clock())
+        self._delays = [level.delay_ns for level in self.levels]
+        self._heap = []
+        # order_id -> [thế hệ, thời điểm mở (ns), thuộc tính]
+        self._orders = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._orders)
+
+    def _entry(self, order_id, order, level):
+        return (order[1] + self.levels[level].delay_ns, order_id, order[0], level)
+
+    def _first_level(self, opened_ns):
+        """Mức đầu tiên tới hạn sau khi lịch khởi động (len(levels) nếu không còn)"""
+        return bisect.bisect_right(self._delays, self.started_ns - opened_ns)
+
+    def _first_entry(self, order_id):
+        order = self._orders[order_id]
+        level = self._first_level(order[1])
+        if level < len(self.levels):
+            return self._entry(order_id, order, level)
+        return None
+
+    def open(self, order_id, opened_at, **attributes):
+        """Theo dõi một đơn mở tại opened_at (mở lại nếu đã có: tính lại từ đầu)
+
+        Các mức đã tới hạn trước khi lịch khởi động được bỏ qua
+        """
+        with self._lock:
+            self._open(order_id, _ns(opened_at), attributes)
+            entry = self._first_entry(order_id)
+            if entry is not None:
+                heapq.heappush(self._heap, entry)
+
+    def _open(self, order_id, opened_ns, attributes):
+        self._generation += 1
+        self._orders[order_id] = [
+            self._generation,
+            opened_ns,
+            {**DEFAULT_ATTRIBUTES, **attributes},
+        ]
+
+    def open_many(self, order_ids, opened_at, attributes=None):
+        """Mở nhiều đơn một lần, heap được dựng lại bằng heapify O(n)
+
+        attributes: dict tên -> mảng giá trị cùng độ dài với order_ids
+        """
+        opened = np.asarray(opened_at, dtype="datetime64[ns]").astype(np.int64)
+        attributes = attributes or {}
+        names = list(attributes)
+        columns = [np.asarray(attributes[name]).tolist() for name in names]
+        with self._lock:
+            for i, order_id in enumerate(order_ids):
+                values = {name: column[i] for name, column in zip(names, columns)}
+                self._open(order_id, int(opened[i]), values)
+            entries = [self._first_entry(order_id) for order_id in order_ids]
+            self._heap = [entry for entry in self._heap if self._live(entry)] + [
+                entry for entry in entries if entry is not None
+            ]
+            heapq.heapify(self._heap)
+
+    def update(self, order_id, **attributes):
+        """Cập nhật thuộc tính dùng trong điều kiện (no_response, critical_issues...)"""
+        with self._lock:
+            order = self._orders.get(order_id)
+            if order is not None:
+                order[2].update(attributes)
+
+    def acknowledge(self, order_id):
+        """Đã có phản hồi cho đơn: các mức cần no_response sẽ không leo thang"""
+        self.update(order_id, no_response=False)
+
+    def close(self, order_id):
+        """Ngừng theo dõi đơn (đã giao / hủy)"""
+        with self._lock:
+            self._orders.pop(order_id, None)
+            self._compact()
+
+    def close_many(self, order_ids):
+        with self._lock:
+            for order_id in order_ids:
+                self._orders.pop(order_id, None)
+            self._compact()
+
+    def _live(self, entry):
+        order = self._orders.get(entry[1])
+        return order is not None and order[0] == entry[2]
+
+    def _compact(self):
+        # Entry của đơn đã đóng chiếm quá nửa heap: dựng lại để bộ nhớ không phình
+        if len(self._heap) > 2 * len(self._orders) + 1024:
+            self._heap = [entry for entry in self._heap if self._live(entry)]
+            heapq.heapify(self._heap)
+
+    def next_due(self):
+        """Thời điểm tới hạn sớm nhất (None nếu không còn mức nào chờ)"""
+        with self._lock:
+            while self._heap and not self._live(self._heap[0]):
+                heapq.heappop(self._heap)
+            return pd.Timestamp(self._heap[0][0]) if self._heap else None
+
+    def _pop_due(self, now_ns):
+        due = []
+        while self._heap and self._heap[0][0] <= now_ns:
+            entry = heapq.heappop(self._heap)
+            if self._live(entry):
+                due.append(entry)
+        return due
+
+    def _push_all(self, entries):
+        # Nhiều entry so với kích thước heap: heapify O(n) rẻ hơn từng heappush
+        if len(entries) > len(self._heap) // 8:
+            self._heap.extend(entries)
+            heapq.heapify(self._heap)
+        else:
+            for entry in entries:
+                heapq.heappush(self._heap, entry)
+
+    def _escalate(self, due, now_ns):
+        """Đánh giá điều kiện của một lô entry tới hạn, xếp lịch mức kế tiếp"""
+        orders = [self._orders[entry[1]] for entry in due]
+        batch_levels = np.fromiter((entry[3] for entry in due), np.int64, len(due))
+        opened = np.fromiter((order[1] for order in orders), np.int64, len(due))
+        hours_open = (now_ns - opened) / _HOUR_NS
+        present = np.unique(batch_levels)
+
+        # Chỉ dựng các cột mà điều kiện của những mức có trong lô cần đến
+        names = set().union(*(self.levels[i].conditions.names for i in present))
+        columns = {
+            name: [order[2].get(name) for order in orders]
+            for name in names
+            if name != "hours_open"
+        }
+        if "hours_open" in names:
+            columns["hours_open"] = hours_open
+        context = RuleContext(pd.DataFrame(columns, index=pd.RangeIndex(len(due))))
+
+        fired = np.zeros(len(due), dtype=bool)
+        for index in present:
+            at_level = batch_levels == index
+            fired |= at_level & self.levels[index].conditions.evaluate(context)
+
+        positions = np.flatnonzero(fired)
+        due_at = pd.to_datetime(
+            np.fromiter((due[i][0] for i in positions), np.int64, len(positions))
+        ).tolist()
+        events = [
+            EscalationEvent(
+                due[i][1],
+                self.levels[due[i][3]].number,
+                self.levels[due[i][3]].escalate_to,
+                due_at[n],
+                float(hours_open[i]),
+            )
+            for n, i in enumerate(positions)
+        ]
+
+        # Mức kế tiếp được xét khi tới hạn dù mức này có leo thang hay không
+        last = len(self.levels) - 1
+        self._push_all(
+            [
+                self._entry(entry[1], order, entry[3] + 1)
+                for entry, order in zip(due, orders)
+                if entry[3] < last
+            ]
+        )
+        return events
+
+    def tick(self, now=None):
+        """Leo thang các đơn đã tới hạn; trả về danh sách EscalationEvent đã gửi
+
+        Đơn đã quá nhiều mức kể từ khi lịch khởi động (ví dụ tick bị trễ) được
+        leo thang hết trong tick này
+        """
+        now_ns = _ns(self.clock() if now is None else now)
+        events = []
+        with self._lock:
+            due = self._pop_due(now_ns)
+            while due:
+                events += self._escalate(due, now_ns)
+                due = self._pop_due(now_ns)
+
+        if self.notifier is not None:
+            self.notifier.dispatch(events)
+        return events
+
+    def sync_orders(self, df, priority_codes=None, priority_names=None):
+        """Đồng bộ với frame đơn hàng: mở đơn mới còn mở, đóng đơn đã giao / hủy
+
+        priority_codes: mã mức ưu tiên theo từng dòng của chính df
+        """
+        if priority_codes is not None and len(priority_codes) != len(df):
+            raise ValueError(
+                f"priority_codes có {len(priority_codes):,} dòng, df có {len(df):,} dòng"
+            )
+        open_mask = df["status"].isin(OPEN_STATUSES).to_numpy()
+        open_ids = df["order_id"].to_numpy()[open_mask]
+        with self._lock:
+            tracked = set(self._orders)
+        current = set(open_ids.tolist())
+        self.close_many(tracked - current)
+
+        new = np.fromiter(
+            (order_id not in tracked for order_id in open_ids), bool, len(open_ids)
+        )
+        if not new.any():
+            return 0
+        attributes = {}
+        if priority_codes is not None:
+            labels = np.array(
+                [PRIORITY_LABELS.get(name, name) for name in priority_names] + [None],
+                dtype=object,
+            )
+            attributes["priority"] = labels[np.asarray(priority_codes)[open_mask][new]]
+        self.open_many(
+            open_ids[new].tolist(),
+            df["order_date"].to_numpy()[open_mask][new],
+            attributes,
+        )
+        return int(new.sum())
+
+
+def sync_from_store(escalation, file_path=DATA_PATH):
+    """Đồng bộ lịch với dữ liệu hiện tại của file đơn hàng
+
+    Mức ưu tiên cache có thể thuộc phiên bản khác frame vừa đọc (lô mới được
+    nối giữa hai lần đọc): khi đó tính lại trên chính frame
+    """
+    df = ORDER_STORE.get(file_path)
+    priority_codes = get_order_priorities(file_path)
+    if len(priority_codes) != len(df):
+        priority_codes, _ = ALERT_ENGINE.priorities.codes(df)
+    return escalation.sync_orders(df, priority_codes, ALERT_ENGINE.priorities.names)
+
+
+_SCHEDULER = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_escalation_scheduler():
+    """Lịch leo thang dùng chung, theo dõi các đơn mở của DATA_PATH
+
+    Mỗi tick của luồng nền đồng bộ lại khi dữ liệu đổi phiên bản rồi leo thang
+    các đơn tới hạn
+    """
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            escalation = EscalationScheduler()
+            synced = {"version": None}
+
+            def job():
+                version = get_data_version(DATA_PATH)
+                if version != synced["version"]:
+                    sync_from_store(escalation)
+                    synced["version"] = version
+                escalation.tick()
+
+            _SCHEDULER = (escalation, SyncScheduler(job, TICK_INTERVAL_HOURS))
+        return _SCHEDULER
+
+
+def start_auto_escalation():
+    """Bật leo thang tự động khi cấu hình cho phép (scheduling + auto_escalation)"""
+    if not (AUTO_ESCALATION.get("enabled") and SCHEDULING_ENABLED):
+        return None
+    escalation, scheduler = get_escalation_scheduler()
+    scheduler.start()
+    return escalation
@@ -0,0 +1,337 @@
+"""
+Fake Google Sheets
+Client Google Sheets giả lập trong bộ nhớ, cùng giao diện con của gspread
+mà dự án dùng; đếm số request để kiểm tra batch / cache mà không cần mạng
+"""
+
+from collections import Counter
+from datetime import datetime, timezone
+from itertools import count
+
+from utils.sheets_batch import a1_to_grid_range, quote_title
+
+try:
+    from gspread.exceptions import WorksheetNotFound
+except ImportError:  # gspread là thư viện tùy chọn khi chỉ chạy giả lập
+
+    class WorksheetNotFound(Exception):
+        """Không có worksheet với tên đã cho (như gspread.exceptions)"""
+
+
+def _split_range(a1):
+    """ "'Tên'!A1:D3" -> ("Tên", "A1:D3"); "'Tên'" -> ("Tên", None) là cả sheet"""
+    if "!" not in a1:
+        if a1.startswith("'") and a1.endswith("'"):
+            return a1[1:-1].replace("''", "'"), None
+        return None, a1
+    title, cells = a1.rsplit("!", 1)
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+    return title, cells
+
+
+class FakeWorksheet:
+    """Worksheet trong bộ nhớ: danh sách các dòng giá trị chuỗi"""
+
+    def __init__(self, spreadsheet, sheet_id, title, rows=1000, cols=26):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.cells = []
+        self.formats = []
+
+    # --- thao tác nội bộ, không tính là request ---
+
+    def _set(self, row, col, value):
+        while len(self.cells) < row:
+            self.cells.append([])
+        line = self.cells[row - 1]
+        while len(line) < col:
+            line.append("")
+        line[col - 1] = "" if value is None else str(value)
+        self.row_count = max(self.row_count, row)
+        self.col_count = max(self.col_count, col)
+
+    def _write(self, cells, values):
+        grid = a1_to_grid_range(cells, self.id)
+        first_row = grid.get("startRowIndex", 0) + 1
+        first_col = grid.get("startColumnIndex", 0) + 1
+        for r, row in enumerate(values):
+            for c, value in enumerate(row):
+                self._set(first_row + r, first_col + c, value)
+        self.spreadsheet._touch()
+
+    def _read(self, cells=None):
+        rows = [list(row) for row in self.cells]
+        if cells:
+            grid = a1_to_grid_range(cells, self.id)
+            r0 = grid.get("startRowIndex", 0)
+            r1 = grid.get("endRowIndex", len(rows))
+            c0 = grid.get("startColumnIndex", 0)
+            c1 = grid.get("endColumnIndex")
+            rows = [row[c0:c1] for row in rows[r0:r1]]
+        # Sheets API bỏ các ô trống ở cuối dòng và các dòng trống ở cuối
+        rows = [self._rstrip(row) for row in rows]
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    @staticmethod
+    def _rstrip(row):
+        row = list(row)
+        while row and row[-1] == "":
+            row.pop()
+        return row
+
+    def _last_row(self):
+        return len(self._read())
+
+    def _table_end(self, table_range=None):
+        """Dòng cuối của bảng values.append tìm thấy trong table_range
+
+        Bảng là khối dòng liên tiếp có dữ liệu, bắt đầu ở dòng có dữ liệu đầu
+        tiên từ đầu vùng; không có dữ liệu thì ghi vào ngay đầu vùng
+        """
+        if table_range is None:
+            return self._last_row()
+        first = a1_to_grid_range(table_range, self.id).get("startRowIndex", 0)
+        rows = self._read()
+        row = first
+        while row < len(rows) and not rows[row]:
+            row += 1
+        if row >= len(rows):
+            return first
+        while row < len(rows) and rows[row]:
+            row += 1
+        return row
+
+    def _clear(self):
+        self.cells = []
+        self.spreadsheet._touch()
+
+    # --- API giống gspread, mỗi lời gọi tính một request ---
+
+    def get_all_values(self):
+        self.spreadsheet._count("values.get")
+        width = max((len(row) for row in self.cells), default=0)
+        return [row + [""] * (width - len(row)) for row in self._read()]
+
+    def get_values(self, cells=None):
+        self.spreadsheet._count("values.get")
+        return self._read(cells)
+
+    def row_values(self, row):
+        self.spreadsheet._count("values.get")
+        rows = self._read()
+        return rows[row - 1] if row <= len(rows) else []
+
+    def update(self, cells, values):
+        self.spreadsheet._count("values.update")
+        self._write(cells, values)
+
+    def update_cell(self, row, col, value):
+        self.spreadsheet._count("values.update")
+        self._set(row, col, value)
+        self.spreadsheet._touch()
+
+    def append_row(self, values, value_input_option="RAW"):
+        return self.append_rows([values], value_input_option)
+
+    def append_rows(self, values, value_input_option="RAW", table_range=None):
+        self.spreadsheet._count("values.append")
+        self.spreadsheet.client.value_input_options[value_input_option] += 1
+        start = self._table_end(table_range) + 1
+        for r, row in enumerate(values):
+            for c, value in enumerate(row):
+                self._set(start + r, c + 1, value)
+        self.spreadsheet._touch()
+        end = start + len(values) - 1
+        return {
+            "updates": {"updatedRange": f"{quote_title(self.title)}!A{start}:A{end}"}
+        }
+
+    def clear(self):
+        self.spreadsheet._count("values.clear")
+        self._clear()
+
+    def format(self, cells, cell_format):
+        self.spreadsheet._count("batchUpdate")
+        self.formats.append((cells, cell_format))
+
+
+class FakeSpreadsheet:
+    """Spreadsheet trong bộ nhớ"""
+
+    def __init__(self, client, spreadsheet_id, title):
+        self.client = client
+        self.id = spreadsheet_id
+        self.title = title
+        self._sheet_ids = count(1)
+        self._worksheets = []
+        self.modified_time = datetime.now(timezone.utc)
+
+    def _count(self, method):
+        self.client._request(method)
+
+    def _touch(self):
+        self.modified_time = datetime.now(timezone.utc)
+
+    def _by_title(self, title):
+        for worksheet in self._worksheets:
+            if worksheet.title == title:
+                return worksheet
+        raise WorksheetNotFound(title)
+
+    def _by_id(self, sheet_id):
+        for worksheet in self._worksheets:
+            if worksheet.id == sheet_id:
+                return worksheet
+        raise WorksheetNotFound(sheet_id)
+
+    def _opened(self):
+        """Như gspread: lastUpdateTime được đọc một lần khi mở spreadsheet"""
+        self._opened_update_time = self._format_time(self.modified_time)
+        return self
+
+    @staticmethod
+    def _format_time(value):
+        return value.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    @property
+    def lastUpdateTime(self):
+        """Thời điểm sửa đổi cuối lúc mở spreadsheet (không cập nhật sau đó)"""
+        return self._opened_update_time
+
+    def get_lastUpdateTime(self):
+        """Thời điểm sửa đổi cuối hiện tại (Drive API files.get modifiedTime)"""
+        self._count("drive.files.get")
+        return self._format_time(self.modified_time)
+
+    def fetch_sheet_metadata(self, params=None):
+        self._count("get")
+        return {
+            "properties": {"title": self.title},
+            "sheets": [
+                {
+                    "properties": {
+                        "sheetId": ws.id,
+                        "title": ws.title,
+                        "gridProperties": {
+                            "rowCount": ws.row_count,
+                            "columnCount": ws.col_count,
+                        },
+                    }
+                }
+                for ws in self._worksheets
+            ],
+        }
+
+    def worksheets(self):
+        self._count("get")
+        return list(self._worksheets)
+
+    def worksheet(self, title):
+        self._count("get")
+        return self._by_title(title)
+
+    def add_worksheet(self, title, rows, cols):
+        self._count("batchUpdate")
+        worksheet = FakeWorksheet(self, next(self._sheet_ids), title, rows, cols)
+        self._worksheets.append(worksheet)
+        return worksheet
+
+    def share(self, email, perm_type="user", role="writer"):
+        self._count("drive.permissions.create")
+
+    def batch_update(self, body):
+        self._count("batchUpdate")
+        for request in body.get("requests", []):
+            if "updateCells" in request:
+                self._by_id(request["updateCells"]["range"]["sheetId"])._clear()
+            elif "updateSheetProperties" in request:
+                properties = request["updateSheetProperties"]["properties"]
+                worksheet = self._by_id(properties["sheetId"])
+                grid = properties.get("gridProperties", {})
+                worksheet.row_count = grid.get("rowCount", worksheet.row_count)
+                worksheet.col_count = grid.get("columnCount", worksheet.col_count)
+            elif "repeatCell" in request:
+                grid = request["repeatCell"]["range"]
+                self._by_id(grid["sheetId"]).formats.append(
+                    (grid, request["repeatCell"]["cell"]["userEnteredFormat"])
+                )
+        return {"replies": [{} for _ in body.get("requests", [])]}
+
+    def values_batch_update(self, body):
+        self._count("values.batchUpdate")
+        self.client.value_input_options[body["valueInputOption"]] += 1
+        for entry in body.get("data", []):
+            title, cells = _split_range(entry["range"])
+            self._by_title(title)._write(cells, entry["values"])
+        return {"totalUpdatedRows": sum(len(e["values"]) for e in body["data"])}
+
+    def values_get(self, a1, params=None):
+        self._count("values.get")
+        title, cells = _split_range(a1)
+        return {"range": a1, "values": self._by_title(title)._read(cells)}
+
+    def values_batch_get(self, ranges, params=None):
+        self._count("values.batchGet")
+        value_ranges = []
+        for a1 in ranges:
+            title, cells = _split_range(a1)
+            value_ranges.append(
+                {"range": a1, "values": self._by_title(title)._read(cells)}
+            )
+        return {"valueRanges": value_ranges}
+
+    def values_append(self, a1, params, body):
+        self._count("values.append")
+        self.client.value_input_options[params.get("valueInputOption")] += 1
+        title, _ = _split_range(a1)
+        worksheet = self._by_title(title)
+        start = worksheet._last_row() + 1
+        for r, row in enumerate(body["values"]):
+            for c, value in enumerate(row):
+                worksheet._set(start + r, c + 1, value)
+        self._touch()
+        end = start + len(body["values"]) - 1
+        return {"updates": {"updatedRange": f"{quote_title(title)}!A{start}:A{end}"}}
+
+
+class FakeSheetsClient:
+    """Client giả lập thay cho gspread.authorize(...); calls đếm request theo loại,
+    value_input_options đếm các lệnh ghi giá trị theo valueInputOption
+
+    scheduler: cho mỗi request đi qua RequestScheduler (utils.rate_limit) như
+    client thật, để chạy thử cả giới hạn tốc độ
+    """
+
+    def __init__(self, scheduler=None):
+        self.calls = Counter()
+        self.value_input_options = Counter()
+        self.scheduler = scheduler
+        self._spreadsheets = {}
+        self._ids = count(1)
+
+    def _request(self, method):
+        if self.scheduler is not None:
+            self.scheduler.execute(lambda: None)
+        self.calls[method] += 1
+
+    def open_by_key(self, key):
+        self._request("get")
+        if key not in self._spreadsheets:
+            self._spreadsheets[key] = FakeSpreadsheet(self, key, f"Spreadsheet {key}")
+        return self._spreadsheets[key]._opened()
+
+    def create(self, title):
+        self._request("create")
+        key = f"fake-{next(self._ids)}"
+        self._spreadsheets[key] = FakeSpreadsheet(self, key, title)
+        return self._spreadsheets[key]._opened()
+
+    def total_calls(self):
+        """Tổng số request đã gọi"""
+        return sum(self.calls.values())
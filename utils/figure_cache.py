@@ -0,0 +1,126 @@
+"""
+Figure Cache
+Cache JSON biểu đồ Plotly dùng chung giữa các phiên Streamlit, khóa theo
+(biểu đồ, phiên bản dữ liệu, tham số lọc), loại bỏ LRU theo giới hạn bộ nhớ
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+import plotly.io
+
+from config.config import FIGURE_CACHE_MAX_MB
+
+
+def _freeze(value):
+    """Chuyển tham số lọc thành khóa hashable, ổn định giữa các lần chạy"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        items = [_freeze(item) for item in value]
+        return tuple(sorted(items, key=repr) if isinstance(value, set) else items)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+class FigureCache:
+    """Cache LRU JSON của các figure đã dựng (chuỗi bất biến, dùng chung an toàn)"""
+
+    def __init__(self, max_bytes, max_entries=256):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # Khóa riêng cho từng figure đang dựng: N người xem cùng lúc chỉ dựng một lần
+        self._building = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        figure_json = self._entries.get(key)
+        if figure_json is None:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return figure_json
+
+    def _store(self, key, figure_json):
+        size = len(figure_json)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = figure_json
+        self._bytes += size
+        while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def get_or_build(self, chart_id, version, params, builder):
+        """JSON của figure đã cache, hoặc gọi builder() một lần rồi lưu lại
+
+        Trả về (JSON, figure vừa dựng hoặc None nếu lấy từ cache)
+        """
+        key = (chart_id, version, _freeze(params))
+        with self._lock:
+            figure_json = self._lookup(key)
+            if figure_json is not None:
+                return figure_json, None
+            building = self._building.setdefault(key, threading.Lock())
+
+        with building:
+            with self._lock:
+                figure_json = self._lookup(key)
+                if figure_json is not None:
+                    return figure_json, None
+                self.misses += 1
+            try:
+                figure = builder()
+                figure_json = plotly.io.to_json(figure, validate=False)
+                with self._lock:
+                    self._store(key, figure_json)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+        return figure_json, figure
+
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Số liệu sử dụng cache"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Cache dùng chung cho cả tiến trình Streamlit
+FIGURE_CACHE = FigureCache(max_bytes=FIGURE_CACHE_MAX_MB * 1024 * 1024)
+
+
+def cached_figure(chart_id, version, params, builder):
+    """Lấy figure từ cache dùng chung; không cache khi không có phiên bản dữ liệu
+
+    Mỗi lần gọi nhận một figure riêng dựng lại từ JSON đã cache (không phải
+    chạy lại builder), nên phiên này sửa figure không ảnh hưởng phiên khác
+    """
+    if version is None:
+        return builder()
+    figure_json, figure = FIGURE_CACHE.get_or_build(chart_id, version, params, builder)
+    if figure is not None:
+        return figure
+    return plotly.io.from_json(figure_json)
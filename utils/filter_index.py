@@ -0,0 +1,265 @@
+"""
+Filter Index
+Chỉ mục lọc đơn hàng: order_date đã sắp xếp (tìm khoảng bằng tìm kiếm nhị phân)
+và chỉ mục đảo / bitmap theo trạng thái và vùng
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.column_buffer import FrameBuffer, GrowableArray
+
+# Các chiều có chỉ mục đảo
+INDEXED_COLUMNS = ("status", "region")
+# Các cột có khóa sắp xếp tính sẵn (order_date chính là thứ tự dòng)
+SORT_COLUMNS = ("order_date", "order_id", "order_value")
+# Các cột của bảng chi tiết: chỉ mục chỉ giữ phép chiếu này của dữ liệu
+DETAIL_COLUMNS = (
+    "order_id",
+    "order_date",
+    "status",
+    "region",
+    "order_value",
+    "is_confirmed_ontime",
+    "is_delivered_ontime",
+)
+
+
+def _as_values(values):
+    """None = không lọc; một giá trị đơn lẻ được coi như danh sách một phần tử"""
+    if values is None:
+        return None
+    if isinstance(values, (list, tuple, set, np.ndarray, pd.Index)):
+        return list(values)
+    return [values]
+
+
+class OrderFilterIndex:
+    """Lọc đơn hàng theo khoảng ngày, trạng thái, vùng mà không duyệt toàn bộ frame
+
+    append(batch) trả về chỉ mục mới gồm cả các đơn của lô với chi phí tỉ lệ
+    kích thước lô: các mảng được nối thêm (GrowableArray) và dùng chung giữa
+    các phiên bản, mỗi phiên bản chỉ giữ view của phần đã có nên không đổi
+    """
+
+    def __init__(self, df):
+        # Snapshot đã sắp theo ngày nên thường không phải sắp lại
+        if not df["order_date"].is_monotonic_increasing:
+            df = df.sort_values("order_date", kind="stable")
+        frame = df.reset_index(drop=True)
+        dates = frame["order_date"].to_numpy(dtype="datetime64[ns]")
+
+        position_dtype = np.int32 if len(frame) < 2**31 else np.int64
+        postings = {}
+        bitmaps = {}
+        for column in INDEXED_COLUMNS:
+            codes, uniques = pd.factorize(frame[column], sort=False)
+            # Sắp ổn định theo mã: mỗi nhóm là danh sách vị trí tăng dần
+            order = np.argsort(codes, kind="stable").astype(position_dtype)
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            postings[column] = {
+                value: GrowableArray(order[bounds[i] : bounds[i + 1]])
+                for i, value in enumerate(uniques.tolist())
+            }
+            bitmaps[column] = {
+                value: GrowableArray(codes == i)
+                for i, value in enumerate(uniques.tolist())
+            }
+
+        self._buffers = {
+            "position_dtype": position_dtype,
+            "frame": FrameBuffer(frame),
+            "dates": GrowableArray(dates),
+            "postings": postings,
+            "bitmaps": bitmaps,
+        }
+        self._ranks = _rank_columns(frame)
+        self._view()
+
+    def _view(self):
+        """Gắn view của phần dữ liệu hiện có vào phiên bản này"""
+        buffers = self._buffers
+        self.frame = buffers["frame"].frame()
+        self._dates = buffers["dates"].view()
+        self._postings = {
+            column: {value: array.view() for value, array in arrays.items()}
+            for column, arrays in buffers["postings"].items()
+        }
+        self._bitmaps = {
+            column: {value: array.view() for value, array in arrays.items()}
+            for column, arrays in buffers["bitmaps"].items()
+        }
+
+    def append(self, batch):
+        """Chỉ mục mới gồm cả batch; None nếu lô có đơn đặt trước đơn cuối (dựng lại)"""
+        if batch is None or batch.empty:
+            return self
+        if not batch["order_date"].is_monotonic_increasing:
+            batch = batch.sort_values("order_date", kind="stable")
+        dates = batch["order_date"].to_numpy(dtype="datetime64[ns]")
+        if len(self._dates) and dates[0] < self._dates[-1]:
+            return None
+        size = len(self.frame)
+        if size + len(batch) >= 2**31:
+            return None
+
+        buffers = self._buffers
+        buffers["frame"].append(batch.reset_index(drop=True)[list(self.frame.columns)])
+        buffers["dates"].append(dates)
+        for column in INDEXED_COLUMNS:
+            codes, uniques = pd.factorize(batch[column], sort=False)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            postings = buffers["postings"][column]
+            bitmaps = buffers["bitmaps"][column]
+            for i, value in enumerate(uniques.tolist()):
+                if value not in postings:
+                    postings[value] = GrowableArray(
+                        np.empty(0, dtype=buffers["position_dtype"])
+                    )
+                    bitmaps[value] = GrowableArray(np.zeros(size, dtype=bool))
+                postings[value].append(order[bounds[i] : bounds[i + 1]] + size)
+            # Bitmap của mọi giá trị dài thêm đúng kích thước lô
+            batch_codes = {value: i for i, value in enumerate(uniques.tolist())}
+            for value, bitmap in bitmaps.items():
+                i = batch_codes.get(value)
+                if i is None:
+                    bitmap.append(np.zeros(len(batch), dtype=bool))
+                else:
+                    bitmap.append(codes == i)
+
+        appended = object.__new__(OrderFilterIndex)
+        appended._buffers = buffers
+        appended._ranks = self._ranks
+        appended._view()
+        # Hạng chỉ tính cho phần đầu; phần chưa có hạng được sắp theo giá trị khi
+        # cần, tính lại khi vượt 1/8 dữ liệu (chi phí khấu hao O(log n) mỗi đơn)
+        if appended._unranked() * 8 > len(appended):
+            appended._ranks = _rank_columns(appended.frame)
+        return appended
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _unranked(self):
+        """Số dòng cuối chưa có hạng (được nối sau lần tính hạng gần nhất)"""
+        if not self._ranks:
+            return 0
+        return len(self.frame) - len(next(iter(self._ranks.values())))
+
+    def values(self, column):
+        """Các giá trị có trong dữ liệu của một chiều đã đánh chỉ mục"""
+        return list(self._postings[column])
+
+    def date_bounds(self):
+        """Ngày đặt hàng sớm nhất và muộn nhất"""
+        if not len(self.frame):
+            return None, None
+        return pd.Timestamp(self._dates[0]), pd.Timestamp(self._dates[-1])
+
+    def _date_slice(self, start=None, end=None):
+        """Khoảng vị trí [lo, hi) của các đơn trong [start, end] (tính cả ngày end)"""
+        lo, hi = 0, len(self._dates)
+        if start is not None:
+            start = pd.Timestamp(start).normalize().to_datetime64()
+            lo = int(np.searchsorted(self._dates, start, side="left"))
+        if end is not None:
+            end = (pd.Timestamp(end).normalize() + pd.Timedelta(days=1)).to_datetime64()
+            hi = int(np.searchsorted(self._dates, end, side="left"))
+        return lo, max(lo, hi)
+
+    def _candidates(self, column, values, lo, hi):
+        """Vị trí trong [lo, hi) khớp một trong các giá trị, tăng dần"""
+        parts = []
+        for value in values:
+            posting = self._postings[column].get(value)
+            if posting is None:
+                continue
+            a, b = np.searchsorted(posting, [lo, hi])
+            parts.append(posting[a:b])
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts))
+
+    def query(self, start=None, end=None, **filters):
+        """Vị trí các đơn thỏa mọi bộ lọc (theo thứ tự ngày đặt hàng)
+
+        filters: status=..., region=... (một giá trị hoặc danh sách, None = tất cả)
+        """
+        lo, hi = self._date_slice(start, end)
+        active = {
+            column: _as_values(values)
+            for column, values in filters.items()
+            if _as_values(values) is not None
+        }
+        unknown = set(active) - set(INDEXED_COLUMNS)
+        if unknown:
+            raise KeyError(f"Không có chỉ mục cho cột: {', '.join(sorted(unknown))}")
+        if not active:
+            return np.arange(lo, hi)
+
+        # Bắt đầu từ danh sách ngắn nhất, kiểm tra các chiều còn lại bằng bitmap
+        candidates = {
+            column: self._candidates(column, values, lo, hi)
+            for column, values in active.items()
+        }
+        driver = min(candidates, key=lambda column: len(candidates[column]))
+        positions = candidates[driver]
+        for column, values in active.items():
+            if column == driver or not len(positions):
+                continue
+            bitmaps = self._bitmaps[column]
+            keep = np.zeros(len(positions), dtype=bool)
+            for value in values:
+                if value in bitmaps:
+                    keep |= bitmaps[value][positions]
+            positions = positions[keep]
+        return positions
+
+    def sort(self, positions, column="order_date", descending=False):
+        """Sắp các vị trí đã lọc theo khóa sắp xếp tính sẵn"""
+        if column == "order_date":
+            ordered = positions
+        else:
+            ranks = self._ranks[column]
+            ranked = positions < len(ranks)
+            ordered = positions[ranked]
+            ordered = ordered[np.argsort(ranks[ordered], kind="stable")]
+            if not ranked.all():
+                # Đơn nối thêm chưa có hạng: sắp theo giá trị rồi chèn vào sau
+                # các đơn cùng giá trị đã có hạng
+                values = self.frame[column].to_numpy()
+                extra = positions[~ranked]
+                extra = extra[np.argsort(values[extra], kind="stable")]
+                at = np.searchsorted(values[ordered], values[extra], side="right")
+                ordered = np.insert(ordered, at, extra)
+        return ordered[::-1] if descending else ordered
+
+    def rows(self, positions, columns=None):
+        """Lấy ra đúng các dòng tại positions (chỉ các cột cần hiển thị)"""
+        frame = self.frame if columns is None else self.frame[list(columns)]
+        return frame.take(positions).reset_index(drop=True)
+
+
+def _rank_columns(frame):
+    """Hạng của từng dòng theo mỗi cột sắp xếp
+
+    Sắp một tập đã lọc chỉ còn là sắp các số nguyên, không phải so sánh chuỗi /
+    giá trị gốc
+    """
+    position_dtype = np.int32 if len(frame) < 2**31 else np.int64
+    ranks = {}
+    for column in SORT_COLUMNS:
+        if column == "order_date" or column not in frame.columns:
+            continue
+        order = np.argsort(frame[column].to_numpy(), kind="stable")
+        ranks[column] = np.empty(len(order), dtype=position_dtype)
+        ranks[column][order] = np.arange(len(order), dtype=position_dtype)
+    return ranks
+
+
+def build_filter_index(df):
+    """Dựng chỉ mục lọc từ frame đơn hàng"""
+    return OrderFilterIndex(df)
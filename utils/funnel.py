@@ -0,0 +1,116 @@
+"""
+Funnel
+Phễu chuyển đổi theo các bước của status_flow.sequence: số đơn tới mỗi bước
+(một lượt bincount trên mã trạng thái) và trung vị thời gian giữa các bước có
+thời điểm (suy ra từ confirm_hours / delivery_hours hoặc sự kiện đổi trạng thái)
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.order_state import NOT_REACHED, StatusFlow
+
+FUNNEL_COLUMNS = [
+    "stage",
+    "orders",
+    "conversion",
+    "share",
+    "median_hours",
+    "from_stage",
+]
+
+
+def _percent(part, whole):
+    return part / whole * 100 if whole > 0 else np.nan
+
+
+def _reached(flow, states, stage_seconds):
+    """Số đơn đã tới từng bước của sequence
+
+    Đơn đang ở bước k đã qua mọi bước trước đó, đơn trả hàng đã qua cả luồng;
+    đơn hủy tính ở bước đầu và các bước đã biết thời điểm
+    """
+    steps = len(flow.sequence)
+    counts = np.bincount(states, minlength=len(flow.states))
+    reached = counts[:steps][::-1].cumsum()[::-1] + counts[flow.returned]
+    cancelled = states == flow.cancelled
+    reached[0] += counts[flow.cancelled]
+    if cancelled.any():
+        for code, seconds in stage_seconds.items():
+            if 0 < code < steps:
+                reached[code] += np.count_nonzero(seconds[cancelled] != NOT_REACHED)
+    return reached
+
+
+def funnel_table(flow, states, stage_seconds, reached=None):
+    """Bảng phễu từ mã trạng thái và thời điểm tới các bước của từng đơn
+
+    stage_seconds: {mã bước: số giây từ lúc tạo đơn (NOT_REACHED nếu chưa biết)};
+    bước đầu là lúc tạo đơn. Bước không có thời điểm (bị gộp trong dữ liệu) có
+    median_hours rỗng; thời gian của mỗi đơn tính từ bước gần nhất trước đó đã
+    biết thời điểm (from_stage: bước nguồn phổ biến nhất).
+    reached: số đơn tới mỗi bước nếu đã có sẵn (bộ đếm của kho trạng thái)
+    """
+    steps = len(flow.sequence)
+    if reached is None:
+        reached = _reached(flow, states, stage_seconds)
+    reached = np.asarray(reached[:steps], dtype=np.int64)
+
+    medians = np.full(steps, np.nan)
+    sources = [None] * steps
+    # Thời điểm và mã của bước gần nhất đã biết của từng đơn (bước đầu: lúc tạo)
+    latest = np.zeros(len(states), dtype=np.int32)
+    latest_code = np.zeros(len(states), dtype=np.int32)
+    for code in range(1, steps):
+        seconds = stage_seconds.get(code)
+        if seconds is None:
+            continue
+        known = seconds != NOT_REACHED
+        if not known.any():
+            continue
+        medians[code] = float(np.median((seconds - latest)[known])) / 3600
+        sources[code] = flow.sequence[np.bincount(latest_code[known]).argmax()]
+        np.copyto(latest, seconds, where=known)
+        latest_code[known] = code
+
+    first = reached[0] if steps else 0
+    return pd.DataFrame(
+        {
+            "stage": flow.sequence,
+            "orders": reached,
+            "conversion": [np.nan]
+            + [_percent(reached[i], reached[i - 1]) for i in range(1, steps)],
+            "share": [_percent(count, first) for count in reached],
+            "median_hours": medians,
+            "from_stage": sources,
+        },
+        columns=FUNNEL_COLUMNS,
+    )
+
+
+def compute_funnel(df, rows=None, flow=None):
+    """Phễu của frame đơn hàng (hoặc chỉ các dòng rows: mask / vị trí)
+
+    Chỉ đọc ba cột status, confirm_hours, delivery_hours; lọc theo rows trên mảng
+    cột nên không sao chép frame
+    """
+    flow = flow or StatusFlow()
+    states = flow.states_of(df["status"])
+    confirm = df["confirm_hours"].to_numpy()
+    delivery = df["delivery_hours"].to_numpy()
+    if rows is not None:
+        states, confirm, delivery = states[rows], confirm[rows], delivery[rows]
+    return funnel_table(flow, states, flow.stage_seconds(states, confirm, delivery))
+
+
+def funnel_from_states(states, rows=None):
+    """Phễu từ kho trạng thái (gồm cả các sự kiện đổi trạng thái đã áp dụng)
+
+    Toàn bộ lịch sử: số đơn đọc thẳng từ bộ đếm reached, chỉ trung vị thời gian
+    phải duyệt mảng thời điểm
+    """
+    flow = states.flow
+    codes, seconds = states.columns(rows)
+    stage_seconds = {code: seconds[:, code] for code in range(1, len(flow.sequence))}
+    reached = states.reached if rows is None else None
+    return funnel_table(flow, codes, stage_seconds, reached)
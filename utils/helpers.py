@@ -7,47 +7,169 @@ import pandas as pd
 import plotly.express as px
 import streamlit as st
 
+from utils.aggregates import ORDER_AGGREGATE_KEYS, build_order_cube
+from utils.alerts import ALERT_ENGINE
+from utils.column_buffer import RowColumns
+from utils.figure_cache import cached_figure
+from utils.filter_index import DETAIL_COLUMNS, build_filter_index
+from utils.kpi_engine import compute_kpis, kpis_from_aggregates
+from utils.order_state import build_order_states
+from utils.order_store import ORDER_STORE
+from utils.sla import classify_orders
 
-def load_data(file_path):
-    """Tải dữ liệu từ file CSV"""
+
+def _warn_invalid_rows(file_path):
+    """Cảnh báo các dòng dữ liệu bị bỏ qua khi tải"""
+    invalid_rows = ORDER_STORE.invalid_rows(file_path)
+    if invalid_rows:
+        # Bảng lỗi trong snapshot chỉ giữ phần đầu, tổng số lấy từ manifest
+        bad_lines = ORDER_STORE.issues(file_path)["line"].unique()
+        preview = ", ".join(str(line) for line in bad_lines[:10])
+        if invalid_rows > 10:
+            preview += ", ..."
+        st.warning(
+            f"⚠️ Bỏ qua {invalid_rows:,} dòng dữ liệu không hợp lệ (dòng {preview})"
+        )
+
+
+def load_data(file_path, columns=None, start=None, end=None):
+    """Tải dữ liệu đơn hàng (chỉ các cột và khoảng ngày cần dùng)"""
     try:
-        df = pd.read_csv(file_path)
-        df["order_date"] = pd.to_datetime(df["order_date"])
+        df = ORDER_STORE.get(file_path, columns, start, end)
+        _warn_invalid_rows(file_path)
         return df
     except Exception as e:
         st.error(f"Lỗi tải dữ liệu: {e}")
         return None
 
 
-def calculate_kpis(df):
-    """Tính toán các KPIs chính"""
-    if df is None or df.empty:
-        return {}
+def _load_derived(file_path, getter):
+    """Tải một cấu trúc dẫn xuất từ dữ liệu đơn hàng, báo lỗi như load_data"""
+    try:
+        derived = getter(file_path)
+        _warn_invalid_rows(file_path)
+        return derived
+    except Exception as e:
+        st.error(f"Lỗi tải dữ liệu: {e}")
+        return None
+
+
+def load_order_cube(file_path):
+    """Tải rollup cube của dữ liệu đơn hàng (cho các trang chỉ cần số tổng hợp)"""
+    return _load_derived(file_path, get_order_cube)
+
+
+def load_filter_index(file_path):
+    """Tải chỉ mục lọc đơn hàng (cho bảng chi tiết)"""
+    return _load_derived(file_path, get_filter_index)
+
+
+def load_order_alerts(file_path):
+    """Tải kết quả đánh giá alert_rules trên toàn bộ đơn hàng"""
+    return _load_derived(file_path, get_order_alerts)
+
+
+def load_sla_levels(file_path):
+    """Tải phân loại mức trễ hạn SLA của các đơn hàng"""
+    return _load_derived(file_path, get_sla_levels)
 
-    total_orders = len(df)
-    confirmed_ontime = df["is_confirmed_ontime"].sum()
-    delivered_ontime = df["is_delivered_ontime"].sum()
-    cancelled_orders = len(df[df["status"] == "cancelled"])
-    pending_orders = len(df[df["status"] == "pending"])
 
-    # Tính tỷ lệ phần trăm
-    confirmation_rate = (
-        (confirmed_ontime / total_orders * 100) if total_orders > 0 else 0
+def load_order_states(file_path):
+    """Tải kho trạng thái đơn hàng (bộ đếm theo trạng thái, phễu)"""
+    return _load_derived(file_path, get_order_states)
+
+
+def get_data_version(file_path):
+    """Phiên bản dữ liệu hiện tại của file đơn hàng"""
+    return ORDER_STORE.version(file_path)
+
+
+def get_data_date_range(file_path):
+    """Ngày đặt hàng sớm nhất và muộn nhất, không cần tải toàn bộ dữ liệu"""
+    return ORDER_STORE.date_range(file_path)
+
+
+def get_order_cube(file_path):
+    """Rollup cube đơn hàng, dựng một lần cho mỗi phiên bản dữ liệu"""
+    return ORDER_STORE.derived(file_path, "cube", build_order_cube)
+
+
+def get_filter_index(file_path):
+    """Chỉ mục lọc theo ngày / trạng thái / vùng, dựng một lần cho mỗi phiên bản"""
+    return ORDER_STORE.derived(
+        file_path, "filter_index", build_filter_index, columns=DETAIL_COLUMNS
     )
-    delivery_rate = (delivered_ontime / total_orders * 100) if total_orders > 0 else 0
-    cancellation_rate = (
-        (cancelled_orders / total_orders * 100) if total_orders > 0 else 0
+
+
+def get_order_states(file_path):
+    """Trạng thái hiện tại của từng đơn theo status_flow, dựng một lần cho mỗi phiên bản
+
+    Đơn mới được nạp theo luồng được cộng thêm qua append, không dựng lại
+    """
+    return ORDER_STORE.derived(file_path, "order_states", build_order_states)
+
+
+def get_order_aggregates(file_path):
+    """Bảng tổng hợp ngày × vùng × trạng thái (một cuboid của rollup cube)"""
+    return get_order_cube(file_path).cuboid(ORDER_AGGREGATE_KEYS)
+
+
+def get_order_inputs(file_path):
+    """Mức ưu tiên và thời hạn của từng đơn (ALERT_ENGINE.inputs), tính một lần cho mỗi đơn
+
+    Đơn mới được nạp theo luồng được tính riêng rồi nối thêm qua append
+    """
+    return ORDER_STORE.derived(
+        file_path, "order_inputs", lambda df: RowColumns(ALERT_ENGINE.inputs, df)
     )
 
-    return {
-        "total_orders": total_orders,
-        "confirmation_rate": confirmation_rate,
-        "delivery_rate": delivery_rate,
-        "cancelled_orders": cancelled_orders,
-        "pending_orders": pending_orders,
-        "cancellation_rate": cancellation_rate,
-        "avg_order_value": df["order_value"].mean() if not df.empty else 0,
-    }
+
+def get_order_priorities(file_path):
+    """Mã mức ưu tiên của từng đơn theo priority_rules"""
+    return get_order_inputs(file_path)["priority_code"]
+
+
+def get_order_alerts(file_path, now=None):
+    """Cảnh báo theo alert_rules tại thời điểm now (mặc định: hiện tại)
+
+    Chỉ phần phụ thuộc thời gian được tính lại mỗi lần gọi, mức ưu tiên và thời
+    hạn lấy từ cache
+    """
+    inputs = get_order_inputs(file_path)
+    df = ORDER_STORE.get(file_path)
+    # Dữ liệu có thể vừa được nối thêm giữa hai lần đọc: khi đó tính lại trên df
+    columns = inputs.columns if len(inputs) == len(df) else None
+    return ALERT_ENGINE.evaluate(df, now, inputs=columns)
+
+
+def get_sla_levels(file_path):
+    """Mức trễ hạn (warning_levels) của từng đơn, phân loại một lần cho mỗi đơn
+
+    Đơn mới được nạp theo luồng được phân loại riêng rồi nối thêm qua append
+    """
+    # Lấy mức ưu tiên trước: builder của derived không được gọi lồng derived
+    priority_codes = get_order_priorities(file_path)
+    priorities = ALERT_ENGINE.priorities
+
+    def build(df):
+        codes = priority_codes if len(priority_codes) == len(df) else None
+        return classify_orders(df, codes, priorities.names, priorities=priorities)
+
+    return ORDER_STORE.derived(file_path, "sla_levels", build)
+
+
+def calculate_kpis(df, aggregates=None, start=None, end=None, states=None):
+    """Tính toán các KPIs chính (từ bảng tổng hợp nếu có, xem utils.kpi_engine)
+
+    states: kho trạng thái đơn hàng; khi không lọc theo ngày, số đơn theo trạng
+    thái được đọc thẳng từ bộ đếm của kho
+    """
+    status_counts = None
+    if states is not None and start is None and end is None:
+        status_counts = states.order_status_counts()
+    if aggregates is not None:
+        return kpis_from_aggregates(aggregates, start, end, status_counts=status_counts)
+    return compute_kpis(df, status_counts=status_counts)
 
 
 def create_kpi_card(title, value, delta=None, format_type="number"):
@@ -60,20 +182,53 @@ def create_kpi_card(title, value, delta=None, format_type="number"):
         return f"{value:,.0f}"
 
 
-def create_trend_chart(df, date_col, value_col, title):
-    """Tạo biểu đồ xu hướng theo thời gian"""
-    daily_data = df.groupby(df[date_col].dt.date)[value_col].sum().reset_index()
+def create_trend_chart(df, date_col, value_col, title, version=None, filters=None):
+    """Tạo biểu đồ xu hướng theo thời gian
 
-    fig = px.line(daily_data, x=date_col, y=value_col, title=title, markers=True)
+    version: phiên bản dữ liệu để cache (get_data_version); filters: tham số lọc
+    đã tạo ra df từ dữ liệu đó, là một phần của khóa cache
+    """
 
-    fig.update_layout(xaxis_title="Ngày", yaxis_title="Số lượng", hovermode="x")
+    def build():
+        daily_data = df.groupby(df[date_col].dt.date)[value_col].sum().reset_index()
 
-    return fig
+        fig = px.line(daily_data, x=date_col, y=value_col, title=title, markers=True)
 
+        fig.update_layout(xaxis_title="Ngày", yaxis_title="Số lượng", hovermode="x")
 
-def create_status_pie_chart(df):
-    """Tạo biểu đồ tròn trạng thái đơn hàng"""
-    status_counts = df["status"].value_counts()
+        return fig
+
+    params = {
+        "date_col": date_col,
+        "value_col": value_col,
+        "title": title,
+        "filters": filters,
+    }
+    return cached_figure("trend", version, params, build)
+
+
+def create_status_pie_chart(
+    df, cube=None, start=None, end=None, version=None, filters=None
+):
+    """Tạo biểu đồ tròn trạng thái đơn hàng (version, filters: như create_trend_chart)"""
+    params = {"start": start, "end": end, "filters": filters}
+    return cached_figure(
+        "status_pie",
+        version,
+        params,
+        lambda: _status_pie_chart(df, cube, start, end),
+    )
+
+
+def _status_pie_chart(df, cube=None, start=None, end=None):
+    if cube is not None:
+        status_counts = (
+            cube.query(["status"], start, end)
+            .set_index("status")["orders"]
+            .sort_values(ascending=False)
+        )
+    else:
+        status_counts = df["status"].value_counts()
 
     fig = px.pie(
         values=status_counts.values,
@@ -84,20 +239,44 @@ def create_status_pie_chart(df):
     return fig
 
 
-def create_region_bar_chart(df):
-    """Tạo biểu đồ cột theo vùng"""
-    region_data = (
-        df.groupby("region")
-        .agg(
+def create_region_bar_chart(
+    df, cube=None, start=None, end=None, version=None, filters=None
+):
+    """Tạo biểu đồ cột theo vùng (version, filters: như create_trend_chart)"""
+    params = {"start": start, "end": end, "filters": filters}
+    return cached_figure(
+        "region_bar",
+        version,
+        params,
+        lambda: _region_bar_chart(df, cube, start, end),
+    )
+
+
+def _region_bar_chart(df, cube=None, start=None, end=None):
+    if cube is not None:
+        regions = cube.query(["region"], start, end)
+        region_data = pd.DataFrame(
             {
-                "order_id": "count",
-                "order_value": "sum",
-                "is_confirmed_ontime": "mean",
-                "is_delivered_ontime": "mean",
+                "region": regions["region"],
+                "order_id": regions["orders"],
+                "order_value": regions["order_value"],
+                "is_confirmed_ontime": regions["confirmed_ontime"] / regions["orders"],
+                "is_delivered_ontime": regions["delivered_ontime"] / regions["orders"],
             }
         )
-        .reset_index()
-    )
+    else:
+        region_data = (
+            df.groupby("region", observed=True)
+            .agg(
+                {
+                    "order_id": "count",
+                    "order_value": "sum",
+                    "is_confirmed_ontime": "mean",
+                    "is_delivered_ontime": "mean",
+                }
+            )
+            .reset_index()
+        )
 
     region_data.columns = [
         "Vùng",
@@ -0,0 +1,325 @@
+"""
+Ingest
+Nạp đơn hàng mới theo luồng: đọc tiếp phần được ghi thêm vào file nguồn
+(CSV hoặc NDJSON), kiểm tra schema từng micro-batch rồi ghi nối vào file đơn
+hàng; ORDER_STORE chỉ parse phần mới và cộng dồn vào dữ liệu đang giữ
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config.config import DATA_PATH, INGEST_INTERVAL_SECONDS, INGEST_SOURCE
+from utils.order_schema import (
+    DATE_FORMAT,
+    ORDER_COLUMNS,
+    apply_order_schema,
+    read_orders_csv,
+)
+from utils.order_store import ORDER_STORE
+from utils.sheets_sync import SyncScheduler
+
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+# Đọc tối đa chừng này byte mỗi lần để một micro-batch không quá lớn
+MAX_BATCH_BYTES = 8 * 1024 * 1024
+DEFAULT_STATE_PATH = Path(__file__).parent.parent / "data" / "ingest.state.json"
+
+
+class LineTail:
+    """Đọc tiếp các dòng hoàn chỉnh được ghi thêm vào cuối file
+
+    Dòng cuối chưa có ký tự xuống dòng (đang ghi dở) được để lại cho lần đọc
+    sau. File bị cắt ngắn (xoay vòng / ghi lại) thì đọc lại từ đầu
+    """
+
+    def __init__(self, path, offset=0, max_bytes=MAX_BATCH_BYTES):
+        self.path = Path(path)
+        self.offset = offset
+        self.max_bytes = max_bytes
+        self.truncated = False
+
+    def read(self):
+        """Các dòng mới (bytes, kết thúc bằng xuống dòng), rỗng nếu chưa có gì"""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return b""
+        self.truncated = size < self.offset
+        if self.truncated:
+            self.offset = 0
+        if size == self.offset:
+            return b""
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(min(size - self.offset, self.max_bytes))
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return b""
+        self.offset += end
+        return data[:end]
+
+
+def read_header(path):
+    """Dòng tiêu đề (kèm xuống dòng) của file CSV"""
+    with open(path, "rb") as f:
+        return f.readline()
+
+
+def parse_csv_lines(data, header):
+    """Parse các dòng CSV (không có tiêu đề) theo schema, trả về (frame, lỗi)"""
+    return read_orders_csv(io.BytesIO(header + data))
+
+
+def parse_ndjson_lines(data):
+    """Parse các dòng NDJSON (mỗi dòng một đơn) theo schema, trả về (frame, lỗi)
+
+    Dòng không phải JSON hợp lệ được ghi vào bảng lỗi với cột "_json"
+    """
+    records, issues = [], []
+    for number, line in enumerate(data.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            issues.append({"line": number, "column": "_json", "value": line[:200]})
+
+    raw = pd.DataFrame.from_records(records, columns=ORDER_COLUMNS)
+    # Mã đơn / ngày dạng số trong JSON được đưa về chuỗi như khi đọc CSV
+    for column in ("order_id", "order_date"):
+        raw[column] = raw[column].map(str, na_action="ignore")
+    frame, schema_issues = apply_order_schema(raw)
+    if issues:
+        schema_issues = pd.concat(
+            [schema_issues, pd.DataFrame(issues)], ignore_index=True
+        )
+    return frame, schema_issues
+
+
+def orders_to_csv(frame):
+    """Các dòng CSV (không tiêu đề) của frame đơn hàng, đúng định dạng file dữ liệu"""
+    return (
+        frame[ORDER_COLUMNS]
+        .to_csv(index=False, header=False, date_format=DATE_FORMAT, lineterminator="\n")
+        .encode("utf-8")
+    )
+
+
+class OrderIngestor:
+    """Đọc micro-batch từ file nguồn và ghi nối các đơn hợp lệ vào file đơn hàng
+
+    Luồng chỉ thêm đơn mới: đơn có order_id đã có trong file đơn hàng (hoặc
+    lặp lại trong lô) bị bỏ qua và đếm trong stats["duplicates"], để số dòng
+    dữ liệu luôn bằng số đơn của kho trạng thái (đổi trạng thái đi qua
+    OrderStateStore.apply).
+
+    Vị trí đã đọc được lưu ở state_path (None: chỉ giữ trong bộ nhớ). Trước khi
+    ghi một lô, state ghi lại lô đang ghi (vị trí, kích thước file đơn hàng,
+    độ dài, sha256) nên khởi động lại sau khi dừng giữa chừng không nạp trùng
+    cũng không mất lô. stats đếm batches, orders, invalid_rows, duplicates
+    """
+
+    def __init__(
+        self,
+        source_path,
+        data_path=DATA_PATH,
+        store=ORDER_STORE,
+        state_path=DEFAULT_STATE_PATH,
+    ):
+        self.source_path = Path(source_path)
+        self.data_path = Path(data_path)
+        self.store = store
+        self.state_path = Path(state_path) if state_path else None
+        self.ndjson = self.source_path.suffix.lower() in NDJSON_SUFFIXES
+        self.tail = LineTail(self.source_path, self._load_offset())
+        self.stats = Counter()
+        self.last_issues = None
+        self._header = None
+        self._order_ids = None
+        self._lock = threading.Lock()
+
+    def _load_offset(self):
+        if self.state_path is None:
+            return 0
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return 0
+        if state.get("source") != str(self.source_path.resolve()):
+            return 0
+        offset = state.get("offset", 0)
+        if state.get("pending"):
+            offset = self._recover(state["pending"], offset)
+            self._save_state(offset)
+        return offset
+
+    def _recover(self, pending, offset):
+        """Vị trí đọc sau khi dừng giữa lúc ghi file đơn hàng và lúc lưu vị trí
+
+        File đơn hàng có đủ lô đang ghi thì lấy vị trí sau lô; chỉ có một phần
+        thì cắt bỏ phần đó và đọc lại lô từ vị trí cũ (file đơn hàng chỉ được
+        ghi bởi một bộ nạp)
+        """
+        start, length = pending["data_size"], pending["bytes"]
+        try:
+            size = os.path.getsize(self.data_path)
+        except FileNotFoundError:
+            return offset
+        if size >= start + length:
+            with open(self.data_path, "rb") as f:
+                f.seek(start)
+                written = f.read(length)
+            if hashlib.sha256(written).hexdigest() == pending["sha256"]:
+                return pending["offset"]
+        if size > start:
+            with open(self.data_path, "r+b") as f:
+                f.truncate(start)
+        return offset
+
+    def _save_state(self, offset, pending=None):
+        if self.state_path is None:
+            return
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        state = {"source": str(self.source_path.resolve()), "offset": offset}
+        if pending is not None:
+            state["pending"] = pending
+        tmp = self.state_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.state_path)
+
+    def _parse(self, data):
+        if self.ndjson:
+            return parse_ndjson_lines(data)
+        if self.tail.offset - len(data) == 0:
+            # Lô đầu tiên của file CSV bắt đầu bằng dòng tiêu đề
+            self._header, _, data = data.partition(b"\n")
+            self._header += b"\n"
+        elif self._header is None:
+            self._header = read_header(self.source_path)
+        return parse_csv_lines(data, self._header)
+
+    def _known_ids(self):
+        """Mã đơn đã có trong file đơn hàng (đọc một lần, cập nhật theo lô đã ghi)"""
+        if self._order_ids is None:
+            try:
+                ids = pd.read_csv(self.data_path, usecols=["order_id"], dtype=str)
+                self._order_ids = set(ids["order_id"].dropna())
+            except FileNotFoundError:
+                self._order_ids = set()
+        return self._order_ids
+
+    def _drop_duplicates(self, frame):
+        """Bỏ các đơn có order_id đã có hoặc lặp lại trong lô; trả về (frame, số đơn bỏ)"""
+        known = self._known_ids()
+        order_ids = frame["order_id"].to_numpy()
+        # Tra từng mã của lô trong tập (chi phí theo kích thước lô, không theo lịch sử)
+        new = ~pd.Index(order_ids).duplicated() & np.fromiter(
+            (order_id not in known for order_id in order_ids), bool, len(order_ids)
+        )
+        if new.all():
+            return frame, 0
+        return frame[new].reset_index(drop=True), int((~new).sum())
+
+    def _payload(self, frame):
+        """(kích thước file đơn hàng, bytes sẽ ghi nối), thêm xuống dòng nếu file thiếu"""
+        data = orders_to_csv(frame)
+        try:
+            with open(self.data_path, "rb") as f:
+                size = f.seek(0, os.SEEK_END)
+                if size:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        data = b"\n" + data
+        except FileNotFoundError:
+            size = 0
+        return size, data
+
+    def _append(self, data):
+        """Ghi nối bytes vào file đơn hàng"""
+        with open(self.data_path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def poll(self):
+        """Nạp một micro-batch; trả về số đơn đã ghi (0 nếu không có dữ liệu mới)"""
+        with self._lock:
+            offset = self.tail.offset
+            data = self.tail.read()
+            if not data:
+                return 0
+            frame, issues = self._parse(data)
+            frame, duplicates = self._drop_duplicates(frame)
+            if len(frame):
+                size, payload = self._payload(frame)
+                # Ghi lại lô trước khi ghi file đơn hàng để khôi phục nếu dừng giữa chừng
+                self._save_state(
+                    0 if self.tail.truncated else offset,
+                    {
+                        "offset": self.tail.offset,
+                        "data_size": size,
+                        "bytes": len(payload),
+                        "sha256": hashlib.sha256(payload).hexdigest(),
+                    },
+                )
+                self._append(payload)
+                self._known_ids().update(frame["order_id"])
+            self._save_state(self.tail.offset)
+
+            self.stats["batches"] += 1
+            self.stats["duplicates"] += duplicates
+            self.stats["orders"] += len(frame)
+            self.stats["invalid_rows"] += issues["line"].nunique() if len(issues) else 0
+            self.last_issues = issues
+        if len(frame) and self.store is not None:
+            # Store thấy file lớn lên và chỉ parse phần vừa ghi, tăng phiên bản dữ liệu
+            self.store.version(self.data_path)
+        return len(frame)
+
+    def drain(self):
+        """Nạp hết dữ liệu đang có trong file nguồn; trả về tổng số đơn"""
+        total = 0
+        while True:
+            # Lô toàn dòng lỗi trả về 0 đơn nhưng vẫn có thể còn dữ liệu phía sau
+            batches = self.stats["batches"]
+            total += self.poll()
+            if self.stats["batches"] == batches:
+                return total
+
+
+_INGEST = None
+_INGEST_LOCK = threading.Lock()
+
+
+def get_order_ingestor(source_path=INGEST_SOURCE):
+    """Bộ nạp đơn dùng chung (ghi vào DATA_PATH) và lịch chạy nền của nó"""
+    global _INGEST
+    with _INGEST_LOCK:
+        if _INGEST is None:
+            ingestor = OrderIngestor(source_path)
+            _INGEST = (
+                ingestor,
+                SyncScheduler(ingestor.drain, INGEST_INTERVAL_SECONDS / 3600),
+            )
+        return _INGEST
+
+
+def start_order_ingest():
+    """Bật nạp đơn theo luồng khi đã cấu hình data_processing.ingest_source"""
+    if not INGEST_SOURCE:
+        return None
+    ingestor, scheduler = get_order_ingestor()
+    scheduler.start()
+    return ingestor
@@ -0,0 +1,228 @@
+"""
+KPI Engine
+Tính toàn bộ KPI tổng quan trong một lượt duyệt cột dữ liệu
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from config.config import KPI_METRICS
+from utils.order_schema import ORDER_STATUSES
+
+
+@dataclass
+class KPIResult:
+    """Kết quả KPI; hỗ trợ truy cập kiểu dict (kpis["total_orders"])"""
+
+    total_orders: int = 0
+    status_counts: dict = field(default_factory=dict)
+    confirmed_ontime: int = 0
+    delivered_ontime: int = 0
+    delivered_orders: int = 0
+    delivered_ontime_of_delivered: int = 0
+    cancelled_orders: int = 0
+    pending_orders: int = 0
+    confirmation_rate: float = 0.0
+    delivery_rate: float = 0.0
+    cancellation_rate: float = 0.0
+    total_value: float = 0.0
+    avg_order_value: float = 0.0
+    max_order_value: float = 0.0
+    min_order_value: float = 0.0
+    avg_processing_days: float = None
+    # Giá trị các chỉ số khai báo trong business_config.json kpi_metrics
+    metrics: dict = field(default_factory=dict)
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+def _percent(part, whole):
+    return part / whole * 100 if whole > 0 else 0.0
+
+
+def _status_codes(status):
+    """Mã trạng thái theo ORDER_STATUSES (-1 nếu không xác định)"""
+    if isinstance(status.dtype, pd.CategoricalDtype):
+        if list(status.cat.categories) == ORDER_STATUSES:
+            return status.cat.codes.to_numpy()
+    return pd.Categorical(status, categories=ORDER_STATUSES).codes
+
+
+def metric_level(value, definition):
+    """Xếp loại chỉ số theo ngưỡng cấu hình, lần lượt target → warning → critical
+
+    good: đạt target; off_target: chưa đạt target nhưng chưa chạm
+    warning_threshold; warning: đã chạm warning_threshold; critical: đã chạm
+    critical_threshold
+    """
+    if value is None:
+        return None
+    target = definition["target"]
+    warning = definition.get("warning_threshold", target)
+    critical = definition["critical_threshold"]
+    # Chỉ số "càng thấp càng tốt" có target nhỏ hơn ngưỡng critical
+    if definition.get("invert_good_bad") or target < critical:
+        value, target, warning, critical = -value, -target, -warning, -critical
+    if value >= target:
+        return "good"
+    if value > warning:
+        return "off_target"
+    if value > critical:
+        return "warning"
+    return "critical"
+
+
+def _status_counts(row_counts, status_counts=None):
+    """Số đơn theo trạng thái: lấy từ kho trạng thái nếu cùng tổng số đơn
+
+    Tổng khác nhau (dữ liệu có mã đơn lặp lại mà kho coi là đổi trạng thái) thì
+    dùng số đếm trên dòng để mọi KPI có cùng mẫu số total_orders
+    """
+    if status_counts is None or sum(status_counts.values()) != sum(row_counts.values()):
+        return row_counts
+    return dict(status_counts)
+
+
+def compute_kpis(df, metric_definitions=None, status_counts=None):
+    """Tính mọi KPI tổng quan, mỗi cột chỉ được duyệt một lần
+
+    status_counts: số đơn theo trạng thái lấy từ nơi khác (kho trạng thái),
+    chỉ dùng khi cùng tổng số đơn với dữ liệu; các chỉ số về đơn đã giao vẫn
+    tính trên dòng dữ liệu
+    """
+    metric_definitions = (
+        KPI_METRICS if metric_definitions is None else metric_definitions
+    )
+    if df is None or df.empty:
+        return KPIResult(
+            status_counts={status: 0 for status in ORDER_STATUSES},
+            metrics={key: None for key in metric_definitions},
+        )
+
+    total = len(df)
+
+    codes = _status_codes(df["status"])
+    counts = np.bincount(codes[codes >= 0], minlength=len(ORDER_STATUSES))
+    row_counts = dict(zip(ORDER_STATUSES, counts.tolist()))
+    status_counts = _status_counts(row_counts, status_counts)
+    delivered = codes == ORDER_STATUSES.index("delivered")
+
+    confirmed_ontime = df["is_confirmed_ontime"].to_numpy(dtype=bool)
+    delivered_ontime = df["is_delivered_ontime"].to_numpy(dtype=bool)
+    confirmed_ontime_count = int(np.count_nonzero(confirmed_ontime))
+    delivered_ontime_count = int(np.count_nonzero(delivered_ontime))
+    delivered_ontime_of_delivered = int(np.count_nonzero(delivered_ontime & delivered))
+
+    values = df["order_value"].to_numpy()
+    total_value = float(values.sum())
+
+    avg_processing_days = None
+    if "confirm_hours" in df.columns and "delivery_hours" in df.columns:
+        completed = row_counts["delivered"]
+        if completed:
+            confirm = df["confirm_hours"].to_numpy(dtype=np.int64)[delivered]
+            delivery = df["delivery_hours"].to_numpy(dtype=np.int64)[delivered]
+            hours = float(confirm.sum() + delivery.sum())
+            avg_processing_days = hours / 24 / completed
+
+    result = KPIResult(
+        total_orders=total,
+        status_counts=status_counts,
+        confirmed_ontime=confirmed_ontime_count,
+        delivered_ontime=delivered_ontime_count,
+        delivered_orders=row_counts["delivered"],
+        delivered_ontime_of_delivered=delivered_ontime_of_delivered,
+        cancelled_orders=status_counts["cancelled"],
+        pending_orders=status_counts["pending"],
+        confirmation_rate=_percent(confirmed_ontime_count, total),
+        delivery_rate=_percent(delivered_ontime_count, total),
+        cancellation_rate=_percent(status_counts["cancelled"], total),
+        total_value=total_value,
+        avg_order_value=total_value / total,
+        max_order_value=float(values.max()),
+        min_order_value=float(values.min()),
+        avg_processing_days=avg_processing_days,
+    )
+    result.metrics = _configured_metrics(result, metric_definitions)
+    return result
+
+
+def kpis_from_aggregates(
+    aggregates, start=None, end=None, metric_definitions=None, status_counts=None
+):
+    """Tính KPI từ bảng tổng hợp ngày × vùng × trạng thái, không duyệt lại đơn hàng
+
+    status_counts: như compute_kpis
+    """
+    metric_definitions = (
+        KPI_METRICS if metric_definitions is None else metric_definitions
+    )
+    groups = aggregates.frame(start, end)
+    total = int(groups["orders"].sum())
+    if total == 0:
+        return compute_kpis(None, metric_definitions)
+
+    by_status = groups.groupby("status", observed=True)[
+        ["orders", "delivered_ontime", "confirm_hours", "delivery_hours"]
+    ].sum()
+    row_counts = {
+        status: int(by_status["orders"].get(status, 0)) for status in ORDER_STATUSES
+    }
+    status_counts = _status_counts(row_counts, status_counts)
+    delivered = row_counts["delivered"]
+
+    confirmed_ontime = int(groups["confirmed_ontime"].sum())
+    delivered_ontime = int(groups["delivered_ontime"].sum())
+    total_value = float(groups["order_value"].sum())
+
+    avg_processing_days = None
+    if delivered:
+        hours = by_status.loc["delivered", ["confirm_hours", "delivery_hours"]].sum()
+        avg_processing_days = float(hours) / 24 / delivered
+
+    result = KPIResult(
+        total_orders=total,
+        status_counts=status_counts,
+        confirmed_ontime=confirmed_ontime,
+        delivered_ontime=delivered_ontime,
+        delivered_orders=delivered,
+        delivered_ontime_of_delivered=(
+            int(by_status.loc["delivered", "delivered_ontime"]) if delivered else 0
+        ),
+        cancelled_orders=status_counts["cancelled"],
+        pending_orders=status_counts["pending"],
+        confirmation_rate=_percent(confirmed_ontime, total),
+        delivery_rate=_percent(delivered_ontime, total),
+        cancellation_rate=_percent(status_counts["cancelled"], total),
+        total_value=total_value,
+        avg_order_value=total_value / total,
+        max_order_value=float(groups["order_value_max"].max()),
+        min_order_value=float(groups["order_value_min"].min()),
+        avg_processing_days=avg_processing_days,
+    )
+    result.metrics = _configured_metrics(result, metric_definitions)
+    return result
+
+
+def _configured_metrics(result, metric_definitions):
+    """Giá trị các chỉ số trong kpi_metrics (None nếu dữ liệu chưa có)"""
+    available = {
+        "on_time_confirmation": result.confirmation_rate,
+        "on_time_delivery": (
+            _percent(result.delivered_ontime_of_delivered, result.delivered_orders)
+            if result.delivered_orders
+            else None
+        ),
+        "avg_processing_time": result.avg_processing_days,
+        "cancellation_rate": result.cancellation_rate,
+        # Dữ liệu đơn hàng chưa có điểm đánh giá của khách hàng
+        "customer_satisfaction": None,
+        "revenue_per_order": result.avg_order_value,
+    }
+    return {key: available.get(key) for key in metric_definitions}
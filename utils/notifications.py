@@ -0,0 +1,165 @@
+"""
+Notifications
+Kênh gửi thông báo (dashboard, email, Slack) theo cấu hình notifications của
+system_config.json; mỗi lần gửi nhận cả lô sự kiện để gom thành một thông báo
+"""
+
+import json
+import smtplib
+import threading
+import urllib.request
+from collections import Counter, deque
+from email.message import EmailMessage
+
+from config.config import (
+    EMAIL_ADDRESS,
+    EMAIL_ENABLED,
+    EMAIL_PASSWORD,
+    EMAIL_RECIPIENTS,
+    SLACK_ENABLED,
+    SLACK_WEBHOOK_URL,
+    SMTP_PORT,
+    SMTP_SERVER,
+)
+
+# Số sự kiện tối đa giữ lại cho dashboard
+DASHBOARD_FEED_SIZE = 500
+# Số sự kiện tối đa liệt kê trong một email / tin nhắn, phần còn lại được tóm tắt
+MAX_LISTED_EVENTS = 20
+
+
+def summarize(events, limit=MAX_LISTED_EVENTS):
+    """Các dòng nội dung của một lô: limit sự kiện đầu, phần còn lại đếm theo nhóm
+
+    Nhóm của sự kiện lấy từ thuộc tính category (nếu có)
+    """
+    lines = [str(event) for event in events[:limit]]
+    rest = events[limit:]
+    if rest:
+        groups = Counter(getattr(event, "category", "khác") for event in rest)
+        detail = ", ".join(f"{name}: {count}" for name, count in groups.most_common())
+        lines.append(f"… và {len(rest):,} thông báo khác ({detail})")
+    return lines
+
+
+class DashboardFeed:
+    """Các sự kiện gần nhất để hiển thị trên dashboard (giữ trong bộ nhớ)"""
+
+    def __init__(self, size=DASHBOARD_FEED_SIZE):
+        self._events = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def send(self, events):
+        with self._lock:
+            self._events.extend(events)
+
+    def recent(self, limit=None):
+        """Sự kiện mới nhất trước"""
+        with self._lock:
+            events = list(self._events)
+        events.reverse()
+        return events[:limit] if limit is not None else events
+
+    def __len__(self):
+        return len(self._events)
+
+
+class EmailChannel:
+    """Gửi một email tóm tắt cho mỗi lô sự kiện qua SMTP (STARTTLS)"""
+
+    def __init__(
+        self,
+        server,
+        port,
+        sender,
+        password,
+        recipients,
+        timeout=30,
+        max_listed=MAX_LISTED_EVENTS,
+    ):
+        self.server = server
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.recipients = list(recipients)
+        self.timeout = timeout
+        self.max_listed = max_listed
+
+    def send(self, events):
+        message = EmailMessage()
+        message["Subject"] = f"[Fulfillment Dashboard] {len(events)} thông báo mới"
+        message["From"] = self.sender
+        message["To"] = ", ".join(self.recipients)
+        message.set_content("\n".join(summarize(events, self.max_listed)))
+        with smtplib.SMTP(self.server, self.port, timeout=self.timeout) as smtp:
+            smtp.starttls()
+            smtp.login(self.sender, self.password)
+            smtp.send_message(message)
+
+
+class SlackChannel:
+    """Gửi một tin nhắn cho mỗi lô sự kiện qua Slack incoming webhook"""
+
+    def __init__(self, webhook_url, timeout=10, max_listed=MAX_LISTED_EVENTS):
+        self.webhook_url = webhook_url
+        self.timeout = timeout
+        self.max_listed = max_listed
+
+    def send(self, events):
+        payload = json.dumps({"text": "\n".join(summarize(events, self.max_listed))})
+        request = urllib.request.Request(
+            self.webhook_url,
+            data=payload.encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class Notifier:
+    """Phân phối sự kiện tới các kênh theo tên
+
+    Mỗi lô là một email / tin nhắn: kênh email và Slack chỉ liệt kê
+    MAX_LISTED_EVENTS sự kiện đầu và tóm tắt phần còn lại, dashboard giữ đủ.
+    Lỗi của một kênh (mạng, SMTP) không chặn các kênh khác: được đếm trong
+    stats và giữ ở errors[kênh]
+    """
+
+    def __init__(self, channels):
+        self.channels = dict(channels)
+        self.stats = Counter()
+        self.errors = {}
+
+    def dispatch(self, events, channels=None):
+        """Gửi events tới các kênh được chọn (mặc định: mọi kênh đã cấu hình)"""
+        if not events:
+            return
+        names = self.channels if channels is None else channels
+        for name in names:
+            channel = self.channels.get(name)
+            if channel is None:
+                continue
+            try:
+                channel.send(events)
+                self.stats[name] += len(events)
+                self.errors.pop(name, None)
+            except Exception as e:
+                self.stats[f"{name}_failures"] += 1
+                self.errors[name] = e
+
+
+def build_channels(feed):
+    """Các kênh bật trong cấu hình; dashboard luôn có"""
+    channels = {"dashboard": feed}
+    if EMAIL_ENABLED and EMAIL_ADDRESS and EMAIL_RECIPIENTS:
+        channels["email"] = EmailChannel(
+            SMTP_SERVER, SMTP_PORT, EMAIL_ADDRESS, EMAIL_PASSWORD, EMAIL_RECIPIENTS
+        )
+    if SLACK_ENABLED and SLACK_WEBHOOK_URL:
+        channels["slack"] = SlackChannel(SLACK_WEBHOOK_URL)
+    return channels
+
+
+# Dùng chung trong tiến trình: dashboard đọc DASHBOARD_FEED
+DASHBOARD_FEED = DashboardFeed()
+NOTIFIER = Notifier(build_channels(DASHBOARD_FEED))
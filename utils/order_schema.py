@@ -0,0 +1,141 @@
+"""
+Order Schema
+Khai báo kiểu dữ liệu cho bảng đơn hàng và kiểm tra dữ liệu khi tải
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Thứ tự trạng thái theo luồng xử lý, dùng làm categories cố định
+ORDER_STATUSES = ["pending", "confirmed", "delivered", "cancelled"]
+# Nhãn trạng thái dùng trong business_config.json (status_flow, alert_rules);
+# "confirmed" gộp các bước Đang xử lý / Chờ xuất kho / Đang giao của luồng chuẩn
+STATUS_LABELS = {
+    "pending": "Chờ xác nhận",
+    "confirmed": "Đang xử lý",
+    "delivered": "Đã giao",
+    "cancelled": "Đã hủy",
+}
+
+ORDER_SCHEMA = {
+    "order_id": "object",
+    "order_date": "datetime64[ns]",
+    "status": pd.CategoricalDtype(ORDER_STATUSES),
+    "region": "category",
+    "order_value": "int64",
+    "confirm_hours": "int32",
+    "delivery_hours": "int32",
+    "is_confirmed_ontime": "bool",
+    "is_delivered_ontime": "bool",
+    "customer_type": "category",
+    "product_category": "category",
+}
+
+ORDER_COLUMNS = list(ORDER_SCHEMA)
+
+_BOOL_VALUES = {"true": True, "false": False, "1": True, "0": False}
+
+
+def _convert_column(series, dtype):
+    """Ép kiểu một cột, trả về (cột đã ép kiểu, mask các dòng không hợp lệ)"""
+    if isinstance(dtype, pd.CategoricalDtype):
+        values = series.astype("category")
+        invalid = values.isna() | ~values.isin(dtype.categories)
+        # astype không đổi thứ tự với categories cùng tập giá trị nên dùng set_categories
+        return values.cat.set_categories(dtype.categories), invalid
+
+    if dtype == "category":
+        values = series.astype("category")
+        return values, values.isna()
+
+    if dtype == "datetime64[ns]":
+        values = pd.to_datetime(series, format=DATE_FORMAT, errors="coerce")
+        return values, values.isna()
+
+    if dtype == "bool":
+        if series.dtype == bool:
+            return series, pd.Series(False, index=series.index)
+        values = series.astype(str).str.strip().str.lower().map(_BOOL_VALUES)
+        return values.eq(True), values.isna()
+
+    if dtype in ("int32", "int64"):
+        if pd.api.types.is_integer_dtype(series.dtype):
+            return series.astype(dtype), pd.Series(False, index=series.index)
+        values = pd.to_numeric(series, errors="coerce")
+        invalid = values.isna() | (values % 1 != 0)
+        return values.where(~invalid, 0).astype(dtype), invalid
+
+    invalid = series.isna()
+    return series.astype(dtype), invalid
+
+
+def apply_order_schema(df):
+    """Ép frame theo ORDER_SCHEMA, trả về (frame hợp lệ, bảng các dòng lỗi)"""
+    missing = [column for column in ORDER_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Thiếu cột dữ liệu: {', '.join(missing)}")
+
+    columns = {}
+    invalid_rows = np.zeros(len(df), dtype=bool)
+    issues = []
+
+    for column, dtype in ORDER_SCHEMA.items():
+        values, invalid = _convert_column(df[column], dtype)
+        columns[column] = values
+        invalid = invalid.to_numpy()
+        if invalid.any():
+            invalid_rows |= invalid
+            positions = np.flatnonzero(invalid)
+            issues.append(
+                pd.DataFrame(
+                    {
+                        # Dòng trong file CSV (dòng 1 là header)
+                        "line": positions + 2,
+                        "column": column,
+                        "value": df[column].iloc[positions].astype(str).to_numpy(),
+                    }
+                )
+            )
+
+    frame = pd.DataFrame(columns)
+    if invalid_rows.any():
+        frame = frame[~invalid_rows].reset_index(drop=True)
+        # Bỏ các category chỉ xuất hiện ở dòng lỗi
+        for column, dtype in ORDER_SCHEMA.items():
+            if dtype == "category":
+                frame[column] = frame[column].cat.remove_unused_categories()
+
+    if issues:
+        issues = pd.concat(issues, ignore_index=True).sort_values("line")
+    else:
+        issues = pd.DataFrame(columns=["line", "column", "value"])
+
+    return frame, issues.reset_index(drop=True)
+
+
+def read_orders_csv(file_path, size=None):
+    """Đọc file CSV đơn hàng theo schema, trả về (frame, bảng các dòng lỗi)
+
+    size: chỉ đọc đúng chừng này byte đầu file (phần ứng với một chữ ký
+    mtime / kích thước), các dòng được ghi nối sau đó không bị đọc lẫn vào
+    """
+    if size is not None:
+        with open(file_path, "rb") as f:
+            file_path = io.BytesIO(f.read(size))
+    raw = pd.read_csv(
+        file_path,
+        usecols=ORDER_COLUMNS,
+        dtype={
+            "order_id": str,
+            "order_date": str,
+            "status": "category",
+            "region": "category",
+            "customer_type": "category",
+            "product_category": "category",
+        },
+    )
+    return apply_order_schema(raw)
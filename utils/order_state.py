@@ -0,0 +1,334 @@
+"""
+Order State
+Trạng thái hiện tại của từng đơn theo status_flow: chỉ mục băm order_id -> dòng
+và các mảng cột (trạng thái, thời điểm tới từng bước); sự kiện đổi trạng thái
+được kiểm tra theo luồng và cập nhật bộ đếm theo trạng thái trong O(1)
+"""
+
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from config.config import STATUS_FLOW
+from utils.order_schema import ORDER_STATUSES, STATUS_LABELS
+
+RETURNED_LABEL = "Đã trả hàng"
+# Thời điểm chưa biết / chưa tới bước (số giây kể từ lúc tạo đơn)
+NOT_REACHED = -1
+
+_SECOND_NS = 10**9
+_INT32_MAX = np.iinfo(np.int32).max
+
+
+class InvalidTransition(ValueError):
+    """Chuyển trạng thái không được status_flow cho phép"""
+
+
+class StatusFlow:
+    """Các trạng thái của luồng và ma trận chuyển hợp lệ
+
+    Trạng thái gồm các bước của sequence, rồi Đã hủy và Đã trả hàng. Được đi
+    tiếp tới bước bất kỳ phía sau (dữ liệu gộp nhiều bước vào "confirmed"),
+    hủy từ cancel_allowed_from, trả hàng từ return_allowed_from
+    """
+
+    def __init__(self, flow=None):
+        flow = STATUS_FLOW if flow is None else flow
+        default = [STATUS_LABELS[s] for s in ("pending", "confirmed", "delivered")]
+        self.sequence = list(flow.get("sequence", default))
+        self.states = self.sequence + [STATUS_LABELS["cancelled"], RETURNED_LABEL]
+        self.cancelled = len(self.sequence)
+        self.returned = self.cancelled + 1
+
+        self._codes = {label: code for code, label in enumerate(self.states)}
+        for status, label in STATUS_LABELS.items():
+            if label in self._codes:
+                self._codes[status] = self._codes[label]
+
+        size = len(self.states)
+        steps = len(self.sequence)
+        self.allowed = np.zeros((size, size), dtype=bool)
+        for code in range(steps):
+            self.allowed[code, code + 1 : steps] = True
+        for label in flow.get("cancel_allowed_from", []):
+            self.allowed[self.code(label), self.cancelled] = True
+        for label in flow.get("return_allowed_from", []):
+            self.allowed[self.code(label), self.returned] = True
+
+        # Các bước được tính là đã đi qua khi chuyển old -> new (cho phễu)
+        self.passes = [
+            [
+                list(range(old + 1, new + 1)) if old < new < steps else [new]
+                for new in range(size)
+            ]
+            for old in range(size)
+        ]
+
+        # Trạng thái -> mã ORDER_STATUSES (KPI): các bước giữa xác nhận và giao
+        # là "confirmed", đơn trả hàng vẫn tính là đã giao
+        confirmed = self.code("confirmed")
+        delivered = self.code("delivered")
+        self.order_status = np.array(
+            [
+                ORDER_STATUSES.index(
+                    "pending"
+                    if code < confirmed
+                    else "confirmed" if code < delivered else "delivered"
+                )
+                for code in range(steps)
+            ]
+            + [ORDER_STATUSES.index("cancelled"), ORDER_STATUSES.index("delivered")],
+            dtype=np.int64,
+        )
+        # Mã ORDER_STATUSES trong dữ liệu -> trạng thái của luồng
+        self.from_order_status = np.array(
+            [self.code(status) for status in ORDER_STATUSES], dtype=np.int8
+        )
+
+    def code(self, status):
+        """Mã trạng thái từ nhãn của luồng hoặc trạng thái trong dữ liệu"""
+        try:
+            return self._codes[status]
+        except KeyError:
+            raise InvalidTransition(f"Trạng thái không hợp lệ: {status}") from None
+
+    def states_of(self, status):
+        """Mã trạng thái của luồng cho cột status (ORDER_STATUSES) của dữ liệu"""
+        if not (
+            isinstance(status.dtype, pd.CategoricalDtype)
+            and list(status.cat.categories) == ORDER_STATUSES
+        ):
+            status = status.astype(pd.CategoricalDtype(ORDER_STATUSES))
+        codes = status.cat.codes.to_numpy()
+        if (codes < 0).any():
+            raise InvalidTransition("Có đơn với trạng thái không hợp lệ")
+        return self.from_order_status[codes]
+
+    def stage_seconds(self, states, confirm_hours, delivery_hours):
+        """Số giây từ lúc tạo đơn tới các bước suy ra được từ dữ liệu
+
+        Xác nhận sau confirm_hours, giao sau thêm delivery_hours (NOT_REACHED nếu
+        đơn chưa tới); các bước bị gộp và thời điểm hủy không có trong dữ liệu.
+        Trả về {mã bước: mảng int32}
+        """
+        confirm = np.asarray(confirm_hours, dtype=np.int64) * 3600
+        delivery = np.asarray(delivery_hours, dtype=np.int64) * 3600
+        confirmed, delivered = self.code("confirmed"), self.code("delivered")
+        open_or_done = states < self.cancelled
+        return {
+            confirmed: np.where(
+                open_or_done & (states >= confirmed), confirm, NOT_REACHED
+            ).astype(np.int32),
+            delivered: np.where(
+                open_or_done & (states >= delivered), confirm + delivery, NOT_REACHED
+            ).astype(np.int32),
+        }
+
+
+class OrderStateStore:
+    """Trạng thái hiện tại và thời điểm tới từng bước của mọi đơn
+
+    counts[trạng thái]: số đơn đang ở trạng thái đó; reached[trạng thái]: số đơn
+    đã từng tới (phễu). revision tăng sau mỗi thay đổi để cache biểu đồ biết
+    """
+
+    def __init__(self, flow=None):
+        self.flow = flow or StatusFlow()
+        size = len(self.flow.states)
+        self._index = {}
+        self._order_ids = []
+        self._state = np.zeros(0, dtype=np.int8)
+        self._created = np.zeros(0, dtype=np.int64)
+        # Số giây từ lúc tạo đơn tới lúc vào mỗi trạng thái (NOT_REACHED nếu chưa biết)
+        self._stage_seconds = np.zeros((0, size), dtype=np.int32)
+        self.counts = np.zeros(size, dtype=np.int64)
+        self.reached = np.zeros(size, dtype=np.int64)
+        self.rejected = Counter()
+        self.revision = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df, flow=None):
+        """Dựng từ frame đơn hàng (trạng thái hiện tại của từng dòng)"""
+        return cls(flow).append(df)
+
+    def __len__(self):
+        return len(self._order_ids)
+
+    def __contains__(self, order_id):
+        return order_id in self._index
+
+    def _reserve(self, size):
+        """Mở rộng mảng theo cấp số nhân để thêm đơn có chi phí khấu hao O(1)"""
+        capacity = len(self._state)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 1024)
+        used = len(self._order_ids)
+        state = np.zeros(capacity, dtype=np.int8)
+        created = np.zeros(capacity, dtype=np.int64)
+        stage_seconds = np.full(
+            (capacity, self._stage_seconds.shape[1]), NOT_REACHED, dtype=np.int32
+        )
+        state[:used] = self._state[:used]
+        created[:used] = self._created[:used]
+        stage_seconds[:used] = self._stage_seconds[:used]
+        self._state, self._created, self._stage_seconds = state, created, stage_seconds
+
+    def _initial_states(self, batch):
+        """Trạng thái và ma trận thời điểm tới các bước của một lô dòng dữ liệu"""
+        flow = self.flow
+        states = flow.states_of(batch["status"])
+        seconds = np.full((len(batch), len(flow.states)), NOT_REACHED, dtype=np.int32)
+        seconds[:, 0] = 0
+        timed = flow.stage_seconds(
+            states,
+            batch["confirm_hours"].to_numpy(),
+            batch["delivery_hours"].to_numpy(),
+        )
+        for code, values in timed.items():
+            seconds[:, code] = values
+        return states, seconds
+
+    def append(self, batch):
+        """Thêm một lô đơn hàng, chi phí tỉ lệ với kích thước lô
+
+        Mã đơn đã có (hoặc lặp lại trong lô) được coi là sự kiện đổi trạng thái;
+        chuyển không hợp lệ bị bỏ qua và đếm trong rejected
+        """
+        if batch is None or batch.empty:
+            return self
+        states, seconds = self._initial_states(batch)
+        order_ids = batch["order_id"].to_numpy()
+        created = batch["order_date"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+        with self._lock:
+            index = self._index
+            new = ~pd.Index(order_ids).duplicated()
+            if index:
+                new &= np.fromiter(
+                    (order_id not in index for order_id in order_ids),
+                    bool,
+                    len(order_ids),
+                )
+            rows = np.flatnonzero(new)
+            start = len(self._order_ids)
+            end = start + len(rows)
+            self._reserve(end)
+            new_ids = order_ids[rows].tolist()
+            index.update(zip(new_ids, range(start, end)))
+            self._order_ids.extend(new_ids)
+            self._state[start:end] = states[rows]
+            self._created[start:end] = created[rows]
+            self._stage_seconds[start:end] = seconds[rows]
+
+            size = len(self.flow.states)
+            by_state = np.bincount(states[rows], minlength=size)
+            self.counts += by_state
+            # Đơn mới tới các bước trước trạng thái hiện tại (đơn hủy: bước đầu)
+            for code, count in enumerate(by_state.tolist()):
+                if count:
+                    self.reached[[0, *self.flow.passes[0][code]]] += count
+
+            for i in np.flatnonzero(~new).tolist():
+                position = index[order_ids[i]]
+                state = int(states[i])
+                if state == self._state[position]:
+                    continue
+                if not self.flow.allowed[self._state[position], state]:
+                    self._reject(self._state[position], state)
+                    continue
+                self._move(position, state, int(seconds[i, state]))
+            self.revision += 1
+        return self
+
+    def _reject(self, old, new):
+        self.rejected[(self.flow.states[old], self.flow.states[new])] += 1
+
+    def _move(self, position, new, seconds):
+        old = self._state[position]
+        self.counts[old] -= 1
+        self.counts[new] += 1
+        self.reached[self.flow.passes[old][new]] += 1
+        self._state[position] = new
+        self._stage_seconds[position, new] = seconds
+
+    def apply(self, order_id, status, at=None):
+        """Chuyển đơn sang trạng thái status (nhãn luồng hoặc trạng thái dữ liệu)
+
+        Trả về False nếu đơn đã ở trạng thái đó; chuyển không hợp lệ ném
+        InvalidTransition, đơn không tồn tại ném KeyError
+        """
+        new = self.flow.code(status)
+        at = pd.Timestamp.now() if at is None else pd.Timestamp(at)
+        with self._lock:
+            position = self._index[order_id]
+            old = self._state[position]
+            if old == new:
+                return False
+            if not self.flow.allowed[old, new]:
+                self._reject(old, new)
+                raise InvalidTransition(
+                    f"Đơn {order_id}: không thể chuyển"
+                    f" {self.flow.states[old]} → {self.flow.states[new]}"
+                )
+            seconds = (at.value - self._created[position]) // _SECOND_NS
+            self._move(position, new, int(np.clip(seconds, 0, _INT32_MAX)))
+            self.revision += 1
+        return True
+
+    def apply_events(self, events):
+        """Áp dụng lần lượt các sự kiện (order_id, status, at); trả về số lần đã chuyển
+
+        Sự kiện không hợp lệ được bỏ qua (đếm trong rejected, đơn lạ: "unknown_order")
+        """
+        applied = 0
+        for order_id, status, at in events:
+            try:
+                applied += self.apply(order_id, status, at)
+            except InvalidTransition:
+                continue
+            except KeyError:
+                self.rejected["unknown_order"] += 1
+        return applied
+
+    def status(self, order_id):
+        """Nhãn trạng thái hiện tại của đơn"""
+        return self.flow.states[self._state[self._index[order_id]]]
+
+    def stage_times(self, order_id):
+        """Thời điểm đơn vào từng trạng thái đã biết"""
+        position = self._index[order_id]
+        created = pd.Timestamp(self._created[position])
+        return {
+            label: created + pd.Timedelta(seconds=int(seconds))
+            for label, seconds in zip(self.flow.states, self._stage_seconds[position])
+            if seconds != NOT_REACHED
+        }
+
+    def status_counts(self):
+        """Số đơn theo trạng thái của luồng, đọc từ bộ đếm"""
+        return dict(zip(self.flow.states, self.counts.tolist()))
+
+    def order_status_counts(self):
+        """Số đơn theo ORDER_STATUSES (cho KPI), đọc từ bộ đếm"""
+        counts = np.bincount(
+            self.flow.order_status, weights=self.counts, minlength=len(ORDER_STATUSES)
+        )
+        return dict(zip(ORDER_STATUSES, counts.astype(np.int64).tolist()))
+
+    def columns(self, rows=None):
+        """Mảng trạng thái và thời điểm tới các bước (chỉ các dòng rows nếu có)"""
+        used = len(self._order_ids)
+        states = self._state[:used]
+        seconds = self._stage_seconds[:used]
+        if rows is not None:
+            states, seconds = states[rows], seconds[rows]
+        return states, seconds
+
+
+def build_order_states(df):
+    """Dựng kho trạng thái từ frame đơn hàng"""
+    return OrderStateStore.from_frame(df)
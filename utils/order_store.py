@@ -0,0 +1,277 @@
+"""
+Order Store
+Kho dữ liệu đơn hàng dùng chung cho toàn bộ tiến trình Streamlit
+"""
+
+import io
+import os
+import threading
+from functools import partial
+
+import pandas as pd
+
+from config.config import SNAPSHOT_READ_MODE
+from utils.column_buffer import FrameBuffer, read_only_frame
+from utils.order_schema import read_orders_csv
+from utils.snapshot import project_orders, read_orders, read_orders_date_range
+
+
+def _invalid_rows(issues):
+    """Số dòng bị loại; bảng lỗi có thể đã bị cắt bớt (attrs["invalid_rows"])"""
+    if "invalid_rows" in issues.attrs:
+        return issues.attrs["invalid_rows"]
+    return int(issues["line"].nunique()) if len(issues) else 0
+
+
+class OrderStore:
+    """Cache frame đơn hàng theo (đường dẫn, mtime, kích thước) file nguồn
+
+    File CSV chỉ được ghi nối thêm (utils.ingest) thì không tải lại: chỉ parse
+    các dòng mới rồi nối vào các frame và cấu trúc dẫn xuất đang giữ, chi phí
+    tỉ lệ với số đơn mới
+    """
+
+    def __init__(self, reader=read_orders, date_range_reader=read_orders_date_range):
+        # reader(path, columns, start, end, signature=(mtime_ns, kích thước))
+        # -> (frame, bảng các dòng lỗi), chỉ gồm phần file ứng với chữ ký
+        self._reader = reader
+        self._date_range_reader = date_range_reader
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._entries = {}
+        self._sources = {}
+        self._version = 0
+
+    def _signature(self, path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _header(self, path):
+        """Dòng tiêu đề của file nguồn CSV (b"" nếu không phải CSV / file rỗng)"""
+        if not str(path).lower().endswith(".csv"):
+            return b""
+        with open(path, "rb") as f:
+            return f.readline()
+
+    def _source(self, path):
+        """Thông tin file nguồn; khi file đổi thì tăng version và bỏ cache cũ"""
+        signature = self._signature(path)
+        source = self._sources.get(path)
+        if source is not None and source["signature"] == signature:
+            return source
+
+        with self._lock:
+            source = self._sources.get(path)
+            if source is not None and source["signature"] != signature:
+                caught_up = self._catch_up(path, source, signature)
+                if caught_up is not None:
+                    return caught_up
+            if source is None or source["signature"] != signature:
+                # Tiêu đề đọc trước chữ ký: nếu file bị ghi lại ở giữa thì hai
+                # giá trị lệch nhau và lần nối sau sẽ tải lại toàn bộ
+                header = self._header(path)
+                signature = self._signature(path)
+                self._version += 1
+                source = {
+                    "signature": signature,
+                    "version": self._version,
+                    "header": header,
+                }
+                self._sources[path] = source
+                self._entries = {
+                    key: entry for key, entry in self._entries.items() if key[0] != path
+                }
+        return source
+
+    def _read_appended(self, path, source, size):
+        """Các dòng hoàn chỉnh được ghi thêm sau lần đọc trước
+
+        Trả về (dòng tiêu đề, bytes mới, vị trí đã đọc tới) hoặc None nếu file
+        không phải chỉ được ghi nối thêm (bị cắt ngắn, ghi lại, đổi tiêu đề)
+        """
+        offset = source["signature"][1]
+        if size <= offset or offset == 0:
+            # Không lớn thêm mà mtime đổi: file đã bị ghi lại
+            return None
+        with open(path, "rb") as f:
+            header = f.readline()
+            # Tiêu đề khác lúc tải toàn bộ: file đã bị ghi lại, không phải nối thêm
+            if header != source.get("header") or f.tell() > offset:
+                return None
+            f.seek(offset - 1)
+            if f.read(1) != b"\n":
+                # Dòng cuối lần trước chưa kết thúc: không ghép được, tải lại
+                return None
+            data = f.read(size - offset)
+        data = data[: data.rfind(b"\n") + 1]
+        return header, data, offset + len(data)
+
+    def _catch_up(self, path, source, signature):
+        """Cộng các dòng mới vào cache thay vì tải lại toàn bộ (gọi khi giữ _lock)
+
+        Trả về source mới, source cũ nếu chưa có dòng hoàn chỉnh nào, hoặc None
+        nếu phải tải lại
+        """
+        if not str(path).lower().endswith(".csv"):
+            return None
+        appended = self._read_appended(path, source, signature[1])
+        if appended is None:
+            return None
+        header, data, offset = appended
+        if not data:
+            return source
+
+        batch, issues = read_orders_csv(io.BytesIO(header + data))
+        lines = data.count(b"\n")
+        if len(issues):
+            if "lines" not in source:
+                # Số dòng dữ liệu trước đó, đếm một lần để đánh số dòng lỗi
+                with open(path, "rb") as f:
+                    source["lines"] = f.read(source["signature"][1]).count(b"\n") - 1
+            issues = issues.assign(line=issues["line"] + source["lines"])
+
+        self._version += 1
+        new_source = {
+            "signature": (signature[0], offset),
+            "version": self._version,
+            "header": header,
+        }
+        if "lines" in source:
+            new_source["lines"] = source["lines"] + lines
+        if "date_range" in source and len(batch):
+            low, high = source["date_range"]
+            batch_low, batch_high = batch["order_date"].min(), batch["order_date"].max()
+            new_source["date_range"] = (
+                batch_low if low is None else min(low, batch_low),
+                batch_high if high is None else max(high, batch_high),
+            )
+        elif "date_range" in source:
+            new_source["date_range"] = source["date_range"]
+        # Cấu trúc có append được cộng thêm lô mới; append trả về None (không
+        # nối được) hoặc không có append thì dựng lại khi có phiên cần đến
+        new_source["derived"] = {}
+        for name, derived in source.get("derived", {}).items():
+            appended = derived.append(batch) if hasattr(derived, "append") else None
+            if appended is not None:
+                new_source["derived"][name] = appended
+
+        entries = {}
+        for key, entry in self._entries.items():
+            if key[0] != path:
+                entries[key] = entry
+            elif entry["signature"] == source["signature"]:
+                # Lần nối đầu chuyển frame sang cột nối thêm được, các lần sau
+                # chỉ ghi phần mới; frame cũ là view nên không bị thay đổi
+                buffer = entry.get("buffer") or FrameBuffer(entry["frame"])
+                buffer.append(project_orders(batch, *key[1:]))
+                entries[key] = {
+                    "signature": new_source["signature"],
+                    "frame": buffer.frame(),
+                    "buffer": buffer,
+                    "issues": (
+                        pd.concat([entry["issues"], issues], ignore_index=True)
+                        if len(issues)
+                        else entry["issues"]
+                    ),
+                    "invalid_rows": entry["invalid_rows"] + _invalid_rows(issues),
+                }
+        self._entries = entries
+        self._sources[path] = new_source
+        return new_source
+
+    def _entry(self, file_path, columns=None, start=None, end=None):
+        """Lấy entry của một phép chiếu (cột, khoảng ngày), parse lại nếu file đổi"""
+        path = os.path.abspath(file_path)
+        source = self._source(path)
+        columns = tuple(columns) if columns is not None else None
+        key = (path, columns, start, end)
+        entry = self._entries.get(key)
+        if entry is not None and entry["signature"] == source["signature"]:
+            return entry
+
+        with self._lock:
+            # Phiên khác có thể đã tải xong trong lúc chờ khóa
+            entry = self._entries.get(key)
+            if entry is None or entry["signature"] != source["signature"]:
+                # Chỉ đọc phần file ứng với chữ ký: dòng ghi thêm sau đó được
+                # _catch_up nối vào, không bị tính hai lần
+                frame, issues = self._reader(
+                    path, columns, start, end, signature=source["signature"]
+                )
+                entry = {
+                    "signature": source["signature"],
+                    "frame": read_only_frame(frame),
+                    "issues": issues,
+                    "invalid_rows": _invalid_rows(issues),
+                }
+                self._entries[key] = entry
+        return entry
+
+    def get(self, file_path, columns=None, start=None, end=None):
+        """Trả về frame đơn hàng dùng chung, phiên gọi không sửa được bản gốc
+
+        Bản sao nông trên các cột chỉ đọc: thêm / gán lại cột chỉ đổi frame của
+        phiên, ghi tại chỗ báo lỗi (cần sửa thì .copy() trước)
+        """
+        return self._entry(file_path, columns, start, end)["frame"].copy(deep=False)
+
+    def version(self, file_path):
+        """Phiên bản dữ liệu hiện tại, tăng mỗi lần file nguồn được tải lại / ghi thêm"""
+        return self._source(os.path.abspath(file_path))["version"]
+
+    def _any_entry(self, file_path):
+        """Một entry bất kỳ của phiên bản hiện tại (mọi phép chiếu có chung bảng lỗi)"""
+        path = os.path.abspath(file_path)
+        source = self._source(path)
+        for key, entry in list(self._entries.items()):
+            if key[0] == path and entry["signature"] == source["signature"]:
+                return entry
+        return self._entry(file_path, columns=())
+
+    def issues(self, file_path):
+        """Các dòng bị loại khi kiểm tra schema (có thể chỉ là phần đầu của bảng lỗi)"""
+        return self._any_entry(file_path)["issues"].copy()
+
+    def invalid_rows(self, file_path):
+        """Tổng số dòng bị loại khi kiểm tra schema, kể cả phần không lưu trong issues"""
+        return self._any_entry(file_path)["invalid_rows"]
+
+    def date_range(self, file_path):
+        """Ngày đặt hàng sớm nhất và muộn nhất của dữ liệu"""
+        path = os.path.abspath(file_path)
+        source = self._source(path)
+        if "date_range" not in source:
+            source["date_range"] = self._date_range_reader(path)
+        return source["date_range"]
+
+    def derived(self, file_path, name, builder, columns=None):
+        """Cấu trúc dẫn xuất (bảng tổng hợp, chỉ mục...) dựng một lần cho mỗi phiên bản
+
+        columns: chỉ đọc các cột này (phép chiếu) để dựng. Cấu trúc có
+        append(batch) được nối thêm các đơn mới khi file chỉ được ghi nối
+        (append trả về phiên bản mới, hoặc None nếu phải dựng lại)
+        """
+        path = os.path.abspath(file_path)
+        derived = self._source(path).setdefault("derived", {})
+        if name not in derived:
+            with self._build_lock:
+                if name not in derived:
+                    derived[name] = builder(self.get(path, columns))
+        return derived[name]
+
+    def invalidate(self, file_path=None):
+        """Xóa cache của một file (hoặc toàn bộ) để buộc tải lại"""
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+                self._sources.clear()
+            else:
+                path = os.path.abspath(file_path)
+                self._sources.pop(path, None)
+                self._entries = {
+                    key: entry for key, entry in self._entries.items() if key[0] != path
+                }
+
+
+# Store dùng chung cho mọi phiên trong tiến trình
+ORDER_STORE = OrderStore(reader=partial(read_orders, mode=SNAPSHOT_READ_MODE))
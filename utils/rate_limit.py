@@ -0,0 +1,240 @@
+"""
+Rate Limit
+Giới hạn tốc độ gọi Google API theo security_config.api_rate_limiting:
+token bucket dùng chung, thử lại với backoff khi gặp 429/5xx và gộp các
+request đọc trùng nhau đang chạy đồng thời
+"""
+
+import copy
+import random
+import threading
+import time
+from collections import Counter
+
+try:
+    from requests.adapters import HTTPAdapter
+except ImportError:  # requests đi kèm gspread / google-auth (tùy chọn)
+    HTTPAdapter = object
+
+from config.config import API_RATE_LIMITING
+
+# Mã HTTP nên thử lại: hết quota và lỗi tạm thời phía máy chủ
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# 429: request bị từ chối trước khi xử lý nên gửi lại luôn an toàn
+QUOTA_STATUS = 429
+# Chỉ các method này được thử lại khi lỗi 5xx / mất kết nối: một POST
+# (values.append, batchUpdate) có thể đã được ghi dù phản hồi lỗi
+RETRY_METHODS = frozenset({"GET", "HEAD"})
+
+
+class TokenBucket:
+    """Token bucket: nạp rate token/giây, tối đa burst token
+
+    acquire() giữ chỗ một token rồi ngủ ngoài khóa nếu cần chờ, nên các luồng
+    được phục vụ theo thứ tự gọi và tổng tốc độ không vượt quá rate
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Lấy một token; trả về số giây đã phải chờ"""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _status_of(error):
+    """Mã HTTP trong lỗi (gspread.APIError, requests.HTTPError), None nếu không có"""
+    return getattr(getattr(error, "response", None), "status_code", None)
+
+
+class RequestScheduler:
+    """Mọi request Google API đi qua đây: chờ token, thử lại, gộp đọc trùng
+
+    stats đếm: calls (request thực gửi), retries, coalesced (đọc được gộp),
+    failures (hết lượt thử) và wait_seconds (thời gian chờ token + backoff)
+    """
+
+    def __init__(
+        self,
+        bucket=None,
+        max_retries=5,
+        base_delay=1.0,
+        max_delay=64.0,
+        sleep=time.sleep,
+    ):
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.stats = Counter()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return min(self.max_delay, float(retry_after))
+            except ValueError:
+                pass
+        # Exponential backoff có jitter theo khuyến nghị của Google API
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _send(self, send, retry_errors=True):
+        attempt = 0
+        while True:
+            if self.bucket is not None:
+                self._count("wait_seconds", self.bucket.acquire())
+            self._count("calls")
+            try:
+                response = send()
+            except Exception as e:
+                status = _status_of(e)
+                retryable = status == QUOTA_STATUS or (
+                    retry_errors
+                    and (
+                        status in RETRY_STATUSES
+                        or (status is None and isinstance(e, OSError))
+                    )
+                )
+                if not retryable or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                status = getattr(response, "status_code", None)
+                if status != QUOTA_STATUS and not (
+                    retry_errors and status in RETRY_STATUSES
+                ):
+                    return response
+                if attempt >= self.max_retries:
+                    # Trả response lỗi để thư viện gọi tự báo lỗi như bình thường
+                    self._count("failures")
+                    return response
+                headers = getattr(response, "headers", None) or {}
+                delay = self._backoff(attempt, headers.get("Retry-After"))
+
+            attempt += 1
+            self._count("retries")
+            self._count("wait_seconds", delay)
+            self.sleep(delay)
+
+    def execute(self, send, coalesce_key=None, retry_errors=True, share=None):
+        """Gửi request qua send(); cùng coalesce_key đang chạy thì dùng chung kết quả
+
+        retry_errors=False: chỉ thử lại khi 429 (request không idempotent);
+        share(result): bản kết quả trả cho các lời gọi được gộp
+        """
+        if coalesce_key is None:
+            return self._send(send, retry_errors)
+
+        with self._lock:
+            entry = self._in_flight.get(coalesce_key)
+            leader = entry is None
+            if leader:
+                entry = self._in_flight[coalesce_key] = _InFlight()
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            entry.done.wait()
+            if entry.error is not None:
+                raise entry.error
+            return entry.result if share is None else share(entry.result)
+
+        try:
+            entry.result = self._send(send, retry_errors)
+            return entry.result
+        except Exception as e:
+            entry.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[coalesce_key]
+            entry.done.set()
+
+
+class ThrottledAdapter(HTTPAdapter):
+    """HTTPAdapter gửi mỗi request qua scheduler
+
+    Nằm dưới Session.request nên lần gửi lại của google-auth sau khi làm mới
+    token (401) là một request mới, không lồng trong request đang chờ; GET
+    cùng URL và token đang chạy đồng thời được gộp làm một
+    """
+
+    def __init__(self, scheduler, **kwargs):
+        self.scheduler = scheduler
+        super().__init__(**kwargs)
+
+    def send(self, request, stream=False, **kwargs):
+        method = request.method.upper()
+        key = None
+        if method == "GET" and not stream:
+            key = (request.url, request.headers.get("Authorization"))
+
+        def send():
+            response = super(ThrottledAdapter, self).send(
+                request, stream=stream, **kwargs
+            )
+            if key is not None:
+                # Đọc hết nội dung để các lời gọi được gộp dùng chung
+                response.content
+            return response
+
+        return self.scheduler.execute(
+            send,
+            coalesce_key=key,
+            retry_errors=method in RETRY_METHODS,
+            share=copy.copy,
+        )
+
+
+def throttle_session(session, scheduler, **adapter_kwargs):
+    """Cho mọi request https của một requests.Session đi qua scheduler
+
+    adapter_kwargs: tham số của HTTPAdapter (pool_connections, pool_maxsize...)
+    """
+    session.mount("https://", ThrottledAdapter(scheduler, **adapter_kwargs))
+    return session
+
+
+def build_scheduler(settings):
+    """RequestScheduler theo cấu hình api_rate_limiting"""
+    bucket = None
+    if settings["enabled"]:
+        bucket = TokenBucket(
+            rate=settings["requests_per_minute"] / 60, burst=settings["burst_limit"]
+        )
+    return RequestScheduler(bucket)
+
+
+# Dùng chung cho mọi lời gọi Sheets / Drive trong tiến trình
+API_SCHEDULER = build_scheduler(API_RATE_LIMITING)
@@ -0,0 +1,323 @@
+"""
+Rule Engine
+Biên dịch điều kiện dạng chuỗi trong business_config.json ("total_amount >= 1000000",
+"customer_type == 'VIP'", "region in ['Hà Nội', 'TP.HCM']", ...) một lần thành
+predicate vector hóa trên cột của frame đơn hàng, không eval theo từng dòng
+"""
+
+import ast
+import operator
+
+import numpy as np
+import pandas as pd
+
+from config.config import COLUMN_ALIASES, PRIORITY_RULES
+
+_COMPARISONS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+# Hằng viết kiểu JSON trong cấu hình: inventory_available == true
+_LITERAL_NAMES = {"true": True, "false": False, "True": True, "False": False}
+# Điều kiện luôn đúng (mức ưu tiên mặc định)
+DEFAULT_CONDITION = "default"
+
+
+class RuleSyntaxError(ValueError):
+    """Điều kiện không thuộc cú pháp rule được hỗ trợ"""
+
+
+class RuleContext:
+    """Cột và biến dùng để đánh giá rule trên một frame
+
+    variables: các giá trị tính sẵn không có trong frame (days_since_order,
+    confirmation_deadline, ...), là Series / mảng cùng độ dài hoặc số vô hướng.
+    Mã hóa của cột chuỗi được cache để nhiều rule trên cùng cột chỉ so sánh số nguyên
+    """
+
+    def __init__(self, df, variables=None, aliases=None):
+        self.df = df
+        self.length = len(df)
+        self.variables = variables or {}
+        self.aliases = COLUMN_ALIASES if aliases is None else aliases
+        self.missing = set()
+        self._codes = {}
+
+    def _source(self, name):
+        if name in self.variables:
+            return self.variables[name]
+        column = self.aliases.get(name, name)
+        if column in self.df.columns:
+            return self.df[column]
+        return None
+
+    def has(self, name):
+        """Tên có trong biến hoặc cột của frame không"""
+        return self._source(name) is not None
+
+    def value(self, name):
+        """Mảng numpy hoặc số vô hướng của một tên; None (và ghi nhận) nếu không có"""
+        source = self._source(name)
+        if source is None:
+            self.missing.add(name)
+            return None
+        if isinstance(source, pd.Series):
+            if isinstance(source.dtype, pd.CategoricalDtype):
+                return source.astype(source.cat.categories.dtype).to_numpy()
+            return source.to_numpy()
+        return source
+
+    def codes(self, name):
+        """(mã nguyên, các giá trị) của cột phân loại / chuỗi, None nếu không có cột"""
+        if name not in self._codes:
+            source = self._source(name)
+            if source is None:
+                self.missing.add(name)
+                self._codes[name] = None
+            elif isinstance(source, pd.Series) and isinstance(
+                source.dtype, pd.CategoricalDtype
+            ):
+                self._codes[name] = (source.cat.codes.to_numpy(), source.cat.categories)
+            else:
+                codes, uniques = pd.factorize(np.asarray(source))
+                self._codes[name] = (codes, pd.Index(uniques))
+        return self._codes[name]
+
+    def full(self, value):
+        return np.full(self.length, bool(value))
+
+
+class Condition:
+    """Một điều kiện đã biên dịch; evaluate(context) trả về mảng bool"""
+
+    def __init__(self, text, evaluate, names):
+        self.text = text
+        self._evaluate = evaluate
+        self.names = frozenset(names)
+
+    def evaluate(self, context):
+        result = self._evaluate(context)
+        if np.ndim(result) == 0:
+            return context.full(result)
+        return np.asarray(result, dtype=bool)
+
+    def __repr__(self):
+        return f"Condition({self.text!r})"
+
+
+def _literal(node, text):
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name) and node.id in _LITERAL_NAMES:
+        return _LITERAL_NAMES[node.id]
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return -_literal(node.operand, text)
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return [_literal(item, text) for item in node.elts]
+    raise RuleSyntaxError(f"Không hỗ trợ giá trị trong điều kiện: {text}")
+
+
+def _is_name(node):
+    return isinstance(node, ast.Name) and node.id not in _LITERAL_NAMES
+
+
+def _compile_membership(name, values, negate):
+    """cột in [...]: so sánh mã của cột với tập mã của các giá trị"""
+
+    def evaluate(context):
+        encoded = context.codes(name)
+        if encoded is None:
+            return False
+        codes, uniques = encoded
+        wanted = uniques.get_indexer(pd.Index(values, dtype=object))
+        mask = np.isin(codes, wanted[wanted >= 0])
+        return ~mask if negate else mask
+
+    return evaluate
+
+
+def _compile_compare(left, op, right, text):
+    """Một phép so sánh giữa hai vế (tên hoặc hằng)"""
+    names = [node.id for node in (left, right) if _is_name(node)]
+
+    if isinstance(op, (ast.In, ast.NotIn)):
+        if not _is_name(left) or _is_name(right):
+            raise RuleSyntaxError(f"'in' cần dạng <cột> in [giá trị]: {text}")
+        values = _literal(right, text)
+        if not isinstance(values, list):
+            values = [values]
+        return _compile_membership(left.id, values, isinstance(op, ast.NotIn)), names
+
+    if type(op) not in _COMPARISONS:
+        raise RuleSyntaxError(f"Không hỗ trợ phép so sánh trong điều kiện: {text}")
+    compare = _COMPARISONS[type(op)]
+
+    # cột == 'chuỗi': so sánh trên mã phân loại thay vì từng chuỗi
+    for column, constant in ((left, right), (right, left)):
+        if _is_name(column) and not _is_name(constant):
+            value = _literal(constant, text)
+            if isinstance(value, str) and type(op) in (ast.Eq, ast.NotEq):
+                return (
+                    _compile_membership(column.id, [value], isinstance(op, ast.NotEq)),
+                    names,
+                )
+
+    def operand(node):
+        if _is_name(node):
+            return lambda context: context.value(node.id)
+        value = _literal(node, text)
+        return lambda context: value
+
+    left_value, right_value = operand(left), operand(right)
+
+    def evaluate(context):
+        a, b = left_value(context), right_value(context)
+        if a is None or b is None:
+            # Thiếu dữ liệu: điều kiện không thỏa
+            return False
+        return compare(a, b)
+
+    return evaluate, names
+
+
+def _compile_node(node, text):
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile_node(value, text) for value in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+
+        def evaluate(context):
+            result = parts[0][0](context)
+            for part, _ in parts[1:]:
+                result = combine(result, part(context))
+            return result
+
+        return evaluate, [name for _, names in parts for name in names]
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        inner, names = _compile_node(node.operand, text)
+        return (lambda context: np.logical_not(inner(context))), names
+
+    if isinstance(node, ast.Compare):
+        # a < b < c được hiểu là (a < b) and (b < c)
+        operands = [node.left, *node.comparators]
+        parts = [
+            _compile_compare(operands[i], op, operands[i + 1], text)
+            for i, op in enumerate(node.ops)
+        ]
+
+        def evaluate(context):
+            result = parts[0][0](context)
+            for part, _ in parts[1:]:
+                result = np.logical_and(result, part(context))
+            return result
+
+        return evaluate, [name for _, names in parts for name in names]
+
+    if _is_name(node):
+        # Tên cột boolean đứng một mình: is_confirmed_ontime
+        name = node.id
+
+        def evaluate(context):
+            value = context.value(name)
+            return False if value is None else value
+
+        return evaluate, [name]
+
+    raise RuleSyntaxError(f"Không hỗ trợ cú pháp trong điều kiện: {text}")
+
+
+def compile_condition(text):
+    """Biên dịch một điều kiện chuỗi thành Condition"""
+    text = text.strip()
+    if text == DEFAULT_CONDITION:
+        return Condition(text, lambda context: True, ())
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError as e:
+        raise RuleSyntaxError(f"Điều kiện không hợp lệ: {text}") from e
+    evaluate, names = _compile_node(tree.body, text)
+    return Condition(text, evaluate, names)
+
+
+class RuleSet:
+    """Danh sách điều kiện gộp bằng any (mặc định) hoặc all"""
+
+    def __init__(self, conditions, combine="any"):
+        self.conditions = [
+            c if isinstance(c, Condition) else compile_condition(c) for c in conditions
+        ]
+        self.combine = combine
+
+    @property
+    def names(self):
+        return frozenset().union(*(c.names for c in self.conditions))
+
+    def evaluate(self, context):
+        if not self.conditions:
+            return context.full(self.combine == "all")
+        reduce = np.logical_and if self.combine == "all" else np.logical_or
+        result = self.conditions[0].evaluate(context)
+        for condition in self.conditions[1:]:
+            result = reduce(result, condition.evaluate(context))
+        return result
+
+
+class PriorityRules:
+    """Gán mức ưu tiên cho mọi đơn trong một lượt theo priority_rules
+
+    Các mức được xét theo thứ tự cấu hình, đơn nhận mức đầu tiên có điều kiện
+    khớp (các điều kiện trong một mức gộp bằng any); mức có 'default' nhận
+    các đơn còn lại
+    """
+
+    def __init__(self, levels, aliases=None):
+        self.levels = []
+        self.default = None
+        self.settings = {}
+        for name, settings in levels.items():
+            conditions = list(settings.get("conditions", []))
+            if DEFAULT_CONDITION in conditions:
+                self.default = name
+                conditions.remove(DEFAULT_CONDITION)
+            if conditions:
+                self.levels.append((name, RuleSet(conditions, "any")))
+            self.settings[name] = settings
+        self.names = list(levels)
+        self.aliases = aliases
+
+    @classmethod
+    def from_config(cls, priority_rules=None):
+        return cls(PRIORITY_RULES if priority_rules is None else priority_rules)
+
+    def codes(self, df, variables=None):
+        """Mã mức ưu tiên (vị trí trong self.names, -1 nếu không khớp mức nào)"""
+        context = RuleContext(df, variables, self.aliases)
+        default = self.names.index(self.default) if self.default else -1
+        if not self.levels:
+            return np.full(len(df), default, dtype=np.int8), context
+        masks = [rules.evaluate(context) for _, rules in self.levels]
+        choices = [self.names.index(name) for name, _ in self.levels]
+        codes = np.select(masks, choices, default=default).astype(np.int8)
+        return codes, context
+
+    def assign(self, df, variables=None):
+        """Series phân loại mức ưu tiên theo index của df"""
+        codes, _ = self.codes(df, variables)
+        return pd.Series(
+            pd.Categorical.from_codes(codes, categories=self.names),
+            index=df.index,
+            name="priority",
+        )
+
+    def setting(self, key, codes, default=np.nan):
+        """Giá trị cấu hình theo mức (ví dụ processing_time_multiplier) cho mỗi đơn"""
+        table = np.array(
+            [self.settings[name].get(key, default) for name in self.names] + [default],
+            dtype=float,
+        )
+        # Mã -1 (không khớp mức nào) lấy phần tử cuối là default
+        return table[codes]
@@ -0,0 +1,205 @@
+"""
+Sheets Batch Writer
+Gom các lệnh ghi giá trị và định dạng Google Sheets thành ít request nhất,
+chia nhỏ theo giới hạn quota
+"""
+
+import re
+
+# Google khuyến nghị payload mỗi request dưới ~2MB; giới hạn theo số ô cho an toàn
+MAX_CELLS_PER_REQUEST = 40_000
+# Số request con tối đa trong một lần spreadsheets.batchUpdate
+MAX_REQUESTS_PER_BATCH = 500
+
+_A1_CELL = re.compile(r"^([A-Za-z]*)(\d*)$")
+
+
+def column_letter(index):
+    """Số thứ tự cột (1-based) -> chữ cái (1 -> A, 27 -> AA)"""
+    letters = ""
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def column_index(letters):
+    """Chữ cái cột -> số thứ tự (1-based)"""
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + ord(char) - 64
+    return index
+
+
+def rowcol_to_a1(row, col):
+    """(dòng, cột) 1-based -> ô A1"""
+    return f"{column_letter(col)}{row}"
+
+
+def a1_range(start_row, start_col, end_row, end_col):
+    """Vùng A1 từ tọa độ 1-based (tính cả ô cuối)"""
+    return f"{rowcol_to_a1(start_row, start_col)}:{rowcol_to_a1(end_row, end_col)}"
+
+
+def quote_title(title):
+    """Tên worksheet đặt trong dấu nháy để dùng trong vùng A1"""
+    return "'" + title.replace("'", "''") + "'"
+
+
+def a1_to_grid_range(a1, sheet_id):
+    """Vùng A1 ('A1:D1', 'A:A', 'A4') -> GridRange của Sheets API (0-based, mở cuối)"""
+    grid = {"sheetId": sheet_id}
+    start, _, end = a1.partition(":")
+    end = end or start
+    # Chỉ số đầu là 0-based, chỉ số cuối mở nên bằng chính số 1-based
+    for prefix, part, offset in (("start", start, -1), ("end", end, 0)):
+        match = _A1_CELL.match(part)
+        if not match:
+            raise ValueError(f"Vùng A1 không hợp lệ: {a1}")
+        letters, digits = match.groups()
+        if letters:
+            grid[f"{prefix}ColumnIndex"] = column_index(letters) + offset
+        if digits:
+            grid[f"{prefix}RowIndex"] = int(digits) + offset
+    return grid
+
+
+def _pad(rows):
+    """Các dòng cùng độ rộng để ghi thành một vùng chữ nhật"""
+    width = max((len(row) for row in rows), default=0)
+    return [list(row) + [""] * (width - len(row)) for row in rows], width
+
+
+class SheetBatchWriter:
+    """Hàng đợi lệnh ghi cho một spreadsheet, gửi đi bằng batch khi flush()
+
+    Mỗi lần flush gửi một spreadsheets.batchUpdate cho định dạng / xóa dữ liệu
+    và một values.batchUpdate cho giá trị (nhiều hơn chỉ khi vượt giới hạn).
+    Giá trị được ghi RAW (chuỗi bắt đầu bằng "=" không thành công thức); chỉ
+    lệnh ghi nào cần công thức mới truyền value_input_option="USER_ENTERED"
+    """
+
+    def __init__(
+        self,
+        spreadsheet,
+        max_cells=MAX_CELLS_PER_REQUEST,
+        max_requests=MAX_REQUESTS_PER_BATCH,
+        value_input_option="RAW",
+    ):
+        self.spreadsheet = spreadsheet
+        self.max_cells = max_cells
+        self.max_requests = max_requests
+        self.value_input_option = value_input_option
+        self._values = []
+        self._requests = []
+
+    def clear(self, worksheet):
+        """Xóa giá trị (giữ định dạng) của toàn bộ worksheet"""
+        self._requests.append(
+            {
+                "updateCells": {
+                    "range": {"sheetId": worksheet.id},
+                    "fields": "userEnteredValue",
+                }
+            }
+        )
+        return self
+
+    def write_rows(
+        self, worksheet, rows, start_row=1, start_col=1, value_input_option=None
+    ):
+        """Ghi một khối dòng bắt đầu từ (start_row, start_col)
+
+        value_input_option: ghi đè cách Sheets hiểu giá trị cho riêng khối này
+        """
+        option = value_input_option or self.value_input_option
+        rows, width = _pad(rows)
+        if not rows or not width:
+            return self
+
+        # Chia khối lớn theo số ô để mỗi request nằm trong giới hạn
+        rows_per_chunk = max(1, self.max_cells // width)
+        for offset in range(0, len(rows), rows_per_chunk):
+            chunk = rows[offset : offset + rows_per_chunk]
+            first = start_row + offset
+            cells = a1_range(
+                first, start_col, first + len(chunk) - 1, start_col + width - 1
+            )
+            self._values.append(
+                (
+                    option,
+                    {
+                        "range": f"{quote_title(worksheet.title)}!{cells}",
+                        "values": chunk,
+                    },
+                )
+            )
+        return self
+
+    def resize(self, worksheet, rows=None, cols=None):
+        """Đổi kích thước lưới worksheet (trước khi ghi ra ngoài lưới hiện tại)"""
+        grid, fields = {}, []
+        if rows is not None:
+            grid["rowCount"] = rows
+            fields.append("gridProperties.rowCount")
+        if cols is not None:
+            grid["columnCount"] = cols
+            fields.append("gridProperties.columnCount")
+        self._requests.append(
+            {
+                "updateSheetProperties": {
+                    "properties": {"sheetId": worksheet.id, "gridProperties": grid},
+                    "fields": ",".join(fields),
+                }
+            }
+        )
+        return self
+
+    def format(self, worksheet, a1, cell_format):
+        """Định dạng một vùng (cùng tham số với worksheet.format của gspread)"""
+        fields = ",".join(cell_format)
+        self._requests.append(
+            {
+                "repeatCell": {
+                    "range": a1_to_grid_range(a1, worksheet.id),
+                    "cell": {"userEnteredFormat": cell_format},
+                    "fields": f"userEnteredFormat({fields})",
+                }
+            }
+        )
+        return self
+
+    def _value_batches(self):
+        """(value_input_option, các vùng) theo giới hạn số ô; mỗi request một option"""
+        options = dict.fromkeys(option for option, _ in self._values)
+        for option in options:
+            batch, cells = [], 0
+            for entry_option, entry in self._values:
+                if entry_option != option:
+                    continue
+                size = sum(len(row) for row in entry["values"])
+                if batch and cells + size > self.max_cells:
+                    yield option, batch
+                    batch, cells = [], 0
+                batch.append(entry)
+                cells += size
+            if batch:
+                yield option, batch
+
+    def flush(self):
+        """Gửi toàn bộ lệnh đang chờ, trả về số request đã gọi"""
+        calls = 0
+        # Xóa / định dạng trước để giá trị mới không bị xóa theo
+        for i in range(0, len(self._requests), self.max_requests):
+            self.spreadsheet.batch_update(
+                {"requests": self._requests[i : i + self.max_requests]}
+            )
+            calls += 1
+        for option, batch in self._value_batches():
+            self.spreadsheet.values_batch_update(
+                {"valueInputOption": option, "data": batch}
+            )
+            calls += 1
+        self._requests = []
+        self._values = []
+        return calls
@@ -0,0 +1,179 @@
+"""
+Sheets Cache
+Cache cục bộ cho các worksheet ít thay đổi ("Quy tắc SLA", "Cấu hình hệ thống"):
+hết hạn theo TTL, nhưng chỉ tải lại khi modifiedTime trên Drive đã đổi;
+làm mới ở luồng nền để dashboard không phải chờ mạng
+"""
+
+import re
+import threading
+import time
+
+from utils.sheets_batch import quote_title
+from utils.sheets_config import CONFIG_WORKSHEET, ConfigCellIndex, parse_config_rows
+
+SLA_WORKSHEET = "Quy tắc SLA"
+CACHED_WORKSHEETS = (SLA_WORKSHEET, CONFIG_WORKSHEET)
+# Số dòng tiêu đề phía trên bảng quy tắc SLA
+HEADER_ROWS = 4
+
+_DURATION = re.compile(r"(\d+(?:[.,]\d+)?)\s*(phút|giờ|ngày)", re.IGNORECASE)
+_MINUTES_PER_UNIT = {"phút": 1, "giờ": 60, "ngày": 1440}
+
+
+def parse_duration_minutes(text):
+    """'30 phút' -> 30, '2 giờ' -> 120; None nếu không đọc được"""
+    match = _DURATION.search(text or "")
+    if not match:
+        return None
+    amount = float(match.group(1).replace(",", "."))
+    return amount * _MINUTES_PER_UNIT[match.group(2).lower()]
+
+
+def parse_sla_rules(rows):
+    """Các dòng 'Đơn ...' của worksheet Quy tắc SLA"""
+    rules = []
+    for row in rows[HEADER_ROWS:]:
+        if row and row[0] and "Đơn" in row[0]:
+            row = list(row) + [""] * (7 - len(row))
+            rules.append(
+                {
+                    "loai_don": row[0],
+                    "thoi_gian_xac_nhan": row[1],
+                    "thoi_gian_giao_hang": row[2],
+                    "muc_do_uu_tien": row[3],
+                    "ghi_chu": row[4],
+                    "trang_thai": row[5],
+                    "nguoi_phu_trach": row[6],
+                }
+            )
+    return rules
+
+
+class SheetCache:
+    """Giá trị các worksheet trong bộ nhớ, làm mới theo TTL + revision Drive
+
+    get(..., wait=False) không bao giờ gọi mạng ở luồng gọi: trả về bản đang có
+    (có thể cũ hoặc None) và đưa việc làm mới sang luồng nền;
+    wait=True chờ lần làm mới (thường chỉ là 1 request kiểm tra revision)
+    """
+
+    def __init__(
+        self, session, titles=CACHED_WORKSHEETS, ttl=300, clock=time.monotonic
+    ):
+        self.session = session
+        self.titles = tuple(titles)
+        self.ttl = ttl
+        self.clock = clock
+        self._values = {}
+        self._config_index = None
+        self._revision = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._refreshing = None
+        self.fetches = 0
+        self.last_error = None
+        self.updated_at = None
+
+    def _stale(self):
+        return self._checked_at is None or self.clock() - self._checked_at >= self.ttl
+
+    def refresh(self):
+        """Làm mới đồng bộ: 1 request Drive, thêm 1 batchGet nếu sheet đã đổi"""
+        try:
+            spreadsheet = self.session.spreadsheet
+            # Thuộc tính lastUpdateTime của gspread chỉ là giá trị lúc mở spreadsheet
+            revision = spreadsheet.get_lastUpdateTime()
+            if revision != self._revision or not self._values:
+                ranges = [quote_title(title) for title in self.titles]
+                response = spreadsheet.values_batch_get(ranges)
+                values = {
+                    title: value_range.get("values", [])
+                    for title, value_range in zip(self.titles, response["valueRanges"])
+                }
+                with self._lock:
+                    self._values = values
+                    self._config_index = None
+                    self._revision = revision
+                    self.updated_at = time.time()
+                self.fetches += 1
+            self.last_error = None
+        except Exception as e:
+            # Giữ bản cũ; thử lại sau một chu kỳ TTL thay vì gọi lại liên tục
+            self.last_error = e
+        finally:
+            with self._lock:
+                self._checked_at = self.clock()
+                self._refreshing = None
+
+    def refresh_async(self):
+        """Chạy refresh ở luồng nền (mỗi lúc tối đa một luồng)"""
+        with self._lock:
+            if self._refreshing is None:
+                self._refreshing = threading.Thread(
+                    target=self.refresh, name="sheet-cache-refresh", daemon=True
+                )
+                self._refreshing.start()
+            return self._refreshing
+
+    def get(self, title, wait=True):
+        """Các dòng của worksheet (None nếu chưa có và wait=False)"""
+        if self._stale():
+            worker = self.refresh_async()
+            if wait:
+                worker.join()
+        with self._lock:
+            return self._values.get(title)
+
+    def invalidate(self):
+        """Buộc lần get sau kiểm tra lại revision (ví dụ sau khi tự ghi vào sheet)"""
+        with self._lock:
+            self._checked_at = None
+
+    def update_cells(self, title, cells):
+        """Ghi các ô {(dòng, cột): giá trị} vừa gửi lên Sheets vào bản cache
+
+        Giữ cache và chỉ mục khớp với sheet mà không phải tải lại ngay
+        """
+        with self._lock:
+            rows = self._values.get(title)
+            if rows is None:
+                return
+            for (row, col), value in cells.items():
+                while len(rows) < row:
+                    rows.append([])
+                line = rows[row - 1]
+                while len(line) < col:
+                    line.append("")
+                line[col - 1] = value
+            if title == CONFIG_WORKSHEET:
+                self._config_index = None
+
+    def config_index(self, wait=True):
+        """Chỉ mục cài đặt -> ô, dựng lại chỉ khi dữ liệu cache đổi"""
+        self.get(CONFIG_WORKSHEET, wait)
+        with self._lock:
+            if self._config_index is None:
+                rows = self._values.get(CONFIG_WORKSHEET) or []
+                self._config_index = ConfigCellIndex(rows)
+            return self._config_index
+
+    def sla_rules(self, wait=True):
+        """Quy tắc SLA đã phân tích (list rỗng nếu chưa có dữ liệu)"""
+        return parse_sla_rules(self.get(SLA_WORKSHEET, wait) or [])
+
+    def config_settings(self, wait=True):
+        """Cấu hình hệ thống đã phân tích, xem parse_config_rows"""
+        return parse_config_rows(self.get(CONFIG_WORKSHEET, wait) or [])
+
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_sheet_cache(session, ttl=300):
+    """Cache dùng chung trong tiến trình cho mỗi phiên Sheets"""
+    with _CACHES_LOCK:
+        if session not in _CACHES:
+            _CACHES[session] = SheetCache(session, ttl=ttl)
+        return _CACHES[session]
@@ -0,0 +1,208 @@
+"""
+Sheets Config
+Bố cục worksheet "Cấu hình hệ thống" và chỉ mục cài đặt -> ô để cập nhật
+nhiều giá trị trong một request
+"""
+
+from datetime import datetime
+
+CONFIG_WORKSHEET = "Cấu hình hệ thống"
+# Số dòng tiêu đề phía trên bảng cấu hình
+CONFIG_HEADER_ROWS = 4
+# Cột GIÁ TRỊ (C) và ô "Cập nhật lần cuối" (B2)
+VALUE_COLUMN = 3
+UPDATED_AT_CELL = (2, 2)
+
+
+def _on_off(enabled):
+    return "✅ Bật" if enabled else "❌ Tắt"
+
+
+def config_sheet_header():
+    """4 dòng tiêu đề của worksheet cấu hình"""
+    return [
+        ["🏗️ DASHBOARD FULFILLMENT - CẤU HÌNH HỆ THỐNG", "", ""],
+        ["📅 Cập nhật lần cuối:", datetime.now().strftime("%d/%m/%Y %H:%M:%S"), ""],
+        ["", "", ""],
+        ["PHẦN", "CÀI ĐẶT", "GIÁ TRỊ", "MÔ TẢ"],
+    ]
+
+
+def config_sheet_rows(config):
+    """Các dòng PHẦN / CÀI ĐẶT / GIÁ TRỊ / MÔ TẢ sinh từ system_config.json"""
+    system = config["system"]
+    data = config["data_processing"]
+    email = config["notifications"]["email"]
+    slack = config["notifications"]["slack"]
+    scheduling = config["scheduling"]
+    sheets = config["google_sheets"]
+    return [
+        ["🌐 HỆ THỐNG", "URL chính", system["one_url"], "Địa chỉ hệ thống ONE"],
+        ["", "URL đơn hàng", system["orders_url"], "Đường dẫn trang đơn hàng"],
+        [
+            "",
+            "Thời gian chờ đăng nhập",
+            f"{system['login_timeout']} giây",
+            "Thời gian chờ tối đa để đăng nhập",
+        ],
+        [
+            "",
+            "Thời gian tải trang",
+            f"{system['page_load_timeout']} giây",
+            "Thời gian chờ tối đa để tải trang",
+        ],
+        [
+            "",
+            "Tối ưu JavaScript",
+            _on_off(system["use_javascript_optimization"]),
+            "Sử dụng tối ưu hóa JavaScript",
+        ],
+        [
+            "",
+            "Thời gian phiên",
+            f"{system['session_timeout']} giây",
+            "Thời gian phiên làm việc",
+        ],
+        ["", "", ""],
+        [
+            "📊 XỬ LÝ DỮ LIỆU",
+            "Số dòng test tối đa",
+            str(data["max_rows_for_testing"]),
+            "Giới hạn dữ liệu khi test",
+        ],
+        ["", "Chế độ nhanh", _on_off(data["enable_fast_mode"]), "Xử lý dữ liệu nhanh"],
+        [
+            "",
+            "Định dạng xuất",
+            ", ".join(data["export_formats"]),
+            "Các định dạng file xuất",
+        ],
+        ["", "", ""],
+        [
+            "📧 THÔNG BÁO EMAIL",
+            "Trạng thái",
+            _on_off(email["enabled"]),
+            "Gửi thông báo qua email",
+        ],
+        ["", "SMTP Server", email["smtp_server"], "Máy chủ gửi email"],
+        ["", "SMTP Port", str(email["smtp_port"]), "Cổng SMTP"],
+        [
+            "",
+            "Người nhận",
+            ", ".join(email["recipients"]),
+            "Danh sách email nhận thông báo",
+        ],
+        ["", "", ""],
+        [
+            "💬 THÔNG BÁO SLACK",
+            "Trạng thái",
+            _on_off(slack["enabled"]),
+            "Gửi thông báo qua Slack",
+        ],
+        ["", "", ""],
+        [
+            "⏰ TỰ ĐỘNG HÓA",
+            "Trạng thái",
+            _on_off(scheduling["enabled"]),
+            "Chạy tự động theo lịch",
+        ],
+        [
+            "",
+            "Chu kỳ",
+            f"{scheduling['interval_hours']} giờ",
+            "Khoảng thời gian giữa các lần chạy",
+        ],
+        ["", "", ""],
+        [
+            "📊 GOOGLE SHEETS",
+            "Trạng thái",
+            _on_off(sheets["enabled"]),
+            "Đồng bộ với Google Sheets",
+        ],
+        ["", "Spreadsheet ID", sheets["spreadsheet_id"], "ID của bảng tính Google"],
+        [
+            "",
+            "Tự động đồng bộ",
+            _on_off(sheets["auto_sync"]),
+            "Tự động cập nhật dữ liệu",
+        ],
+    ]
+
+
+def _settings(rows, first_row):
+    """Duyệt (số dòng, phần, cài đặt, giá trị); cột PHẦN được kéo xuống các dòng sau"""
+    section = ""
+    for number, row in enumerate(rows, start=first_row):
+        if len(row) < 2 or not row[1]:
+            continue
+        if row[0]:
+            section = row[0]
+        yield number, section, row[1], row[2] if len(row) > 2 else ""
+
+
+def config_sheet_values(config):
+    """{(phần, cài đặt): giá trị} mà worksheet cấu hình nên có theo config"""
+    return {
+        (section, setting): value
+        for _, section, setting, value in _settings(config_sheet_rows(config), 1)
+    }
+
+
+def parse_config_rows(rows):
+    """{(phần, cài đặt): (số dòng, giá trị)} từ các dòng đọc về của worksheet
+
+    Số dòng tính từ 1 như trên Sheets
+    """
+    return {
+        (section, setting): (number, value)
+        for number, section, setting, value in _settings(
+            rows[CONFIG_HEADER_ROWS:], CONFIG_HEADER_ROWS + 1
+        )
+    }
+
+
+class ConfigCellIndex:
+    """Chỉ mục cài đặt -> dòng trên worksheet cấu hình
+
+    Tra theo (phần, cài đặt) hoặc chỉ tên cài đặt (lấy dòng đầu tiên trùng tên,
+    giống cách dò tuần tự trước đây)
+    """
+
+    def __init__(self, rows):
+        self.settings = parse_config_rows(rows)
+        self._by_name = {}
+        for (section, setting), (number, _) in sorted(
+            self.settings.items(), key=lambda item: item[1][0]
+        ):
+            self._by_name.setdefault(setting, (section, setting))
+
+    def __len__(self):
+        return len(self.settings)
+
+    def resolve(self, key):
+        """'Chu kỳ' hoặc ('⏰ TỰ ĐỘNG HÓA', 'Chu kỳ') -> (phần, cài đặt)"""
+        if isinstance(key, tuple):
+            if key in self.settings:
+                return key
+            key = key[1]
+        if key not in self._by_name:
+            raise KeyError(f"Không tìm thấy setting: {key}")
+        return self._by_name[key]
+
+    def row(self, key):
+        """Số dòng của cài đặt"""
+        return self.settings[self.resolve(key)][0]
+
+    def value(self, key):
+        """Giá trị hiện tại theo bản đã đọc"""
+        return self.settings[self.resolve(key)][1]
+
+    def changed(self, updates):
+        """{(phần, cài đặt): (số dòng, giá trị mới)} chỉ gồm các giá trị khác hiện tại"""
+        changes = {}
+        for key, value in updates.items():
+            resolved = self.resolve(key)
+            number, current = self.settings[resolved]
+            if str(value) != current:
+                changes[resolved] = (number, str(value))
+        return changes
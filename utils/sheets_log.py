@@ -0,0 +1,410 @@
+"""
+Sheets Log Writer
+Ghi nhật ký tự động lên Google Sheets theo kiểu chỉ nối thêm (append API),
+đệm trong bộ nhớ + file spool và gửi theo lô từ luồng nền có retry/backoff
+"""
+
+import atexit
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOG_WORKSHEET = "Nhật ký tự động"
+# 4 dòng tiêu đề, dữ liệu ở các cột A:K
+LOG_HEADER_ROWS = 4
+LOG_LAST_COLUMN = "K"
+# Khối bắt đầu từ dòng 7 (sau dòng mẫu và dòng trống 6) mà values.append dò dòng
+# cuối; dò từ A1 thì dòng trống 3 cắt bảng và log ghi đè lên phần tiêu đề
+LOG_TABLE_RANGE = f"A7:{LOG_LAST_COLUMN}"
+# Số dòng đọc thêm phía trước khi lấy log cuối (bù cho các dòng hướng dẫn / trống)
+TAIL_MARGIN = 10
+# Mỗi tiến trình một file spool (theo pid) trong thư mục này
+DEFAULT_SPOOL_DIR = Path(__file__).parent.parent / "data"
+SPOOL_PREFIX = "automation_log."
+SPOOL_SUFFIX = ".spool.jsonl"
+
+
+def build_log_row(activity, status, details="", user="System"):
+    """Một dòng nhật ký theo các cột của worksheet 'Nhật ký tự động'"""
+    succeeded = "thành công" in status.lower()
+    now = datetime.now()
+    return [
+        now.strftime("%d/%m/%Y %H:%M:%S"),
+        activity,
+        status,
+        "0",  # Số đơn xử lý
+        "1" if succeeded else "0",  # Thành công
+        "0" if succeeded else "1",  # Lỗi
+        "< 1s",  # Thời gian xử lý
+        user,
+        details,
+        "",  # Chi tiết
+        f"LOG_{now.strftime('%Y%m%d_%H%M%S')}",  # ID phiên
+    ]
+
+
+def is_log_row(row):
+    """Dòng nhật ký thật (cột thời gian có dạng dd/mm/yyyy)"""
+    return bool(row) and "/" in row[0]
+
+
+def _try_lock(f):
+    """Khóa độc quyền không chờ trên file đang mở; False nếu tiến trình khác giữ"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def default_spool_path():
+    """File spool của tiến trình hiện tại"""
+    return DEFAULT_SPOOL_DIR / f"{SPOOL_PREFIX}{os.getpid()}{SPOOL_SUFFIX}"
+
+
+def appended_last_row(response):
+    """Dòng cuối vừa được values.append ghi vào (từ updates.updatedRange)"""
+    updated = ((response or {}).get("updates") or {}).get("updatedRange", "")
+    match = re.search(r"(\d+)$", updated)
+    return int(match.group(1)) if match else None
+
+
+class SheetsLogWriter:
+    """Hàng đợi nhật ký: write() trả về ngay, luồng nền gửi theo lô
+
+    Mỗi dòng được ghi vào file spool trước khi vào hàng đợi và chỉ bị xóa khỏi
+    spool sau khi Sheets xác nhận, nên dòng chưa gửi vẫn còn sau khi tiến trình
+    bị dừng đột ngột (giao nhận ít nhất một lần).
+
+    Mỗi writer giữ khóa trên file <spool>.lock suốt thời gian chạy, nên không
+    hai writer nào dùng chung một spool; khi khởi động, writer nhận lại spool
+    của các tiến trình đã dừng (khóa đã được hệ điều hành nhả) trong cùng thư mục
+    """
+
+    def __init__(
+        self,
+        worksheet_getter,
+        spool_path=None,
+        batch_size=50,
+        flush_interval=5.0,
+        base_delay=1.0,
+        max_delay=60.0,
+        sleep=time.sleep,
+        on_append=None,
+    ):
+        self.worksheet_getter = worksheet_getter
+        # Nhận phản hồi values.append (ví dụ LogTailReader.observe_append)
+        self.on_append = on_append
+        self.spool_path = Path(spool_path) if spool_path else default_spool_path()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._drained = threading.Condition(self._lock)
+        self._spool_lock = self._lock_spool(self.spool_path)
+        if self._spool_lock is None:
+            raise RuntimeError(
+                f"Spool đang được tiến trình khác dùng: {self.spool_path}"
+            )
+        self._pending = self._load_spool() + self._adopt_orphans()
+        self._closed = False
+        self.sent = 0
+        self.failures = 0
+
+        self._worker = threading.Thread(
+            target=self._run, name="sheets-log-writer", daemon=True
+        )
+        self._worker.start()
+        atexit.register(self.close)
+
+    # --- spool ---
+
+    @staticmethod
+    def _lock_path(spool_path):
+        return spool_path.with_name(spool_path.name + ".lock")
+
+    def _lock_spool(self, spool_path):
+        """Mở và khóa file lock của một spool; None nếu tiến trình khác đang giữ"""
+        spool_path.parent.mkdir(parents=True, exist_ok=True)
+        f = open(self._lock_path(spool_path), "a+b")
+        if _try_lock(f):
+            return f
+        f.close()
+        return None
+
+    @staticmethod
+    def _read_spool(spool_path):
+        try:
+            with open(spool_path, "r", encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _load_spool(self):
+        """Các dòng còn lại từ lần chạy trước"""
+        return self._read_spool(self.spool_path)
+
+    def _adopt_orphans(self):
+        """Nhận các dòng chưa gửi trong spool của tiến trình đã dừng"""
+        rows = []
+        pattern = f"{SPOOL_PREFIX}*{SPOOL_SUFFIX}"
+        for spool_path in sorted(self.spool_path.parent.glob(pattern)):
+            if spool_path == self.spool_path:
+                continue
+            lock = self._lock_spool(spool_path)
+            if lock is None:
+                continue  # Chủ spool còn chạy
+            try:
+                rows += self._read_spool(spool_path)
+                # Chép sang spool của mình trước khi xóa spool cũ
+                self._rewrite_spool(self._load_spool() + rows)
+                spool_path.unlink(missing_ok=True)
+            finally:
+                self._release(lock, spool_path)
+        return rows
+
+    def _release(self, lock, spool_path):
+        """Nhả khóa; xóa file lock khi spool không còn"""
+        if not spool_path.exists():
+            self._lock_path(spool_path).unlink(missing_ok=True)
+        _unlock(lock)
+        lock.close()
+
+    def _append_spool(self, row):
+        self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite_spool(self, rows):
+        """Thay spool bằng các dòng còn chờ (ghi file tạm rồi thay thế nguyên tử)"""
+        tmp = self.spool_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.spool_path)
+
+    # --- API ---
+
+    def write(self, row):
+        """Đưa một dòng vào hàng đợi, không chờ gửi"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Log writer đã đóng")
+            self._append_spool(row)
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.notify()
+
+    def pending(self):
+        """Số dòng chưa được Sheets xác nhận"""
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self, timeout=None):
+        """Chờ gửi hết các dòng đang chờ; trả về False nếu hết thời gian"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._wakeup.notify()
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._drained.wait(remaining)
+            return True
+
+    def close(self, timeout=10.0):
+        """Gửi nốt các dòng còn lại (trong giới hạn thời gian) rồi dừng luồng nền"""
+        if self._closed:
+            return
+        self.flush(timeout)
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._worker.join(timeout)
+        with self._lock:
+            if not self._pending:
+                # Đã gửi hết: không để lại file spool rỗng theo từng pid
+                self.spool_path.unlink(missing_ok=True)
+            self._release(self._spool_lock, self.spool_path)
+
+    # --- luồng nền ---
+
+    def _send(self, rows):
+        # values.append: Sheets tự tìm dòng cuối, không phải tải cả worksheet
+        response = self.worksheet_getter().append_rows(
+            rows, value_input_option="RAW", table_range=LOG_TABLE_RANGE
+        )
+        if self.on_append is not None:
+            self.on_append(response)
+
+    def _run(self):
+        attempt = 0
+        while True:
+            with self._lock:
+                if not self._pending and not self._closed:
+                    self._wakeup.wait(self.flush_interval)
+                if self._closed and (not self._pending or attempt):
+                    return
+                batch = self._pending[: self.batch_size]
+            if not batch:
+                continue
+
+            try:
+                self._send(batch)
+            except Exception:
+                # Giữ nguyên trong hàng đợi và spool, thử lại với backoff lũy thừa
+                self.failures += 1
+                delay = min(self.max_delay, self.base_delay * 2**attempt)
+                attempt += 1
+                self.sleep(delay * random.uniform(0.5, 1.0))
+                continue
+
+            attempt = 0
+            with self._lock:
+                del self._pending[: len(batch)]
+                self.sent += len(batch)
+                self._rewrite_spool(self._pending)
+                if not self._pending:
+                    self._drained.notify_all()
+
+
+class LogTailReader:
+    """Đọc phần cuối worksheet nhật ký bằng vùng nhỏ thay vì tải cả sheet
+
+    Ghi nhớ dòng cuối đã biết (từ lần đọc trước hoặc phản hồi values.append),
+    nên xem log gần nhất chỉ tốn một values.get nhỏ; lần đầu trong tiến trình
+    dò dòng cuối từ kích thước lưới (rowCount) lùi dần, không đọc cả cột A
+    """
+
+    def __init__(
+        self,
+        worksheet_getter,
+        header_rows=LOG_HEADER_ROWS,
+        last_column=LOG_LAST_COLUMN,
+        page_size=500,
+    ):
+        self.worksheet_getter = worksheet_getter
+        self.header_rows = header_rows
+        self.last_column = last_column
+        self.page_size = page_size
+        self.last_row = None
+        self._lock = threading.Lock()
+
+    def observe_append(self, response):
+        """Cập nhật dòng cuối theo phản hồi values.append"""
+        row = appended_last_row(response)
+        if row is not None:
+            self._note(row)
+
+    def _note(self, row):
+        with self._lock:
+            self.last_row = max(self.last_row or 0, row)
+
+    def _fetch(self, worksheet, first, last):
+        return worksheet.get_values(f"A{first}:{self.last_column}{last}")
+
+    def _probe_last_row(self, worksheet):
+        """Dòng cuối có dữ liệu, dò lùi từ cuối lưới với cửa sổ cột A tăng gấp đôi
+
+        Sheets bỏ các dòng trống ở cuối vùng trả về, nên cửa sổ đầu tiên có dữ
+        liệu cho biết ngay dòng cuối; lưới vừa khít dữ liệu chỉ tốn một request
+        """
+        end = max(worksheet.row_count, self.header_rows)
+        size = self.page_size
+        while end > self.header_rows:
+            start = max(self.header_rows + 1, end - size + 1)
+            rows = worksheet.get_values(f"A{start}:A{end}")
+            if rows:
+                return start + len(rows) - 1
+            end = start - 1
+            size *= 2
+        return self.header_rows
+
+    def _last_row(self, worksheet):
+        """Dòng cuối có dữ liệu; chỉ dò khi chưa biết"""
+        if self.last_row is None:
+            self._note(self._probe_last_row(worksheet))
+        return self.last_row
+
+    def _read_forward(self, worksheet, start, end):
+        """Các dòng từ start tới hết dữ liệu (đọc tiếp nếu vùng bị lấp đầy)"""
+        rows = self._fetch(worksheet, start, end)
+        while len(rows) == end - start + 1:
+            # Vùng đầy: có dòng mới ghi sau lần biết cuối, đọc tiếp một trang
+            more = self._fetch(worksheet, end + 1, end + self.page_size)
+            rows += more
+            end += self.page_size
+            if len(more) < self.page_size:
+                break
+        return rows
+
+    def tail(self, limit=10):
+        """limit dòng nhật ký cuối cùng (cũ -> mới)"""
+        worksheet = self.worksheet_getter()
+        first_data = self.header_rows + 1
+        last = self._last_row(worksheet)
+        start = max(first_data, last - limit - TAIL_MARGIN + 1)
+
+        rows = self._read_forward(worksheet, start, max(last, start) + TAIL_MARGIN)
+        if not rows and start > first_data:
+            # Sheet bị xóa bớt dòng: dò lại độ dài rồi đọc lại
+            self.last_row = None
+            return self.tail(limit)
+        with self._lock:
+            self.last_row = start + len(rows) - 1
+
+        logs = [row for row in rows if is_log_row(row)]
+        while len(logs) < limit and start > first_data:
+            # Chưa đủ log (nhiều dòng không phải log): lùi thêm một trang
+            earlier = max(first_data, start - self.page_size)
+            rows = self._fetch(worksheet, earlier, start - 1)
+            logs = [row for row in rows if is_log_row(row)] + logs
+            start = earlier
+        return logs[-limit:]
+
+    def iter_pages(self, page_size=None):
+        """Duyệt toàn bộ nhật ký theo từng trang (mỗi trang một values.get)"""
+        size = page_size or self.page_size
+        worksheet = self.worksheet_getter()
+        last = self._last_row(worksheet)
+        start = self.header_rows + 1
+        while True:
+            end = start + size - 1
+            rows = self._fetch(worksheet, start, end)
+            logs = [row for row in rows if is_log_row(row)]
+            if logs:
+                yield logs
+            if end >= last and len(rows) < size:
+                if rows:
+                    self._note(start + len(rows) - 1)
+                return
+            start = end + 1
@@ -0,0 +1,127 @@
+"""
+Sheets Session
+Phiên Google Sheets dùng lâu dài: xác thực một lần khi cần, tự làm mới token,
+dùng chung pool kết nối HTTP và cache handle của spreadsheet / worksheet
+"""
+
+import os
+import threading
+from pathlib import Path
+
+try:
+    import gspread
+    from google.auth.transport.requests import AuthorizedSession
+    from google.oauth2.service_account import Credentials
+except ImportError:  # gspread / google-auth là thư viện tùy chọn
+    gspread = None
+
+from utils.rate_limit import API_SCHEDULER, throttle_session
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+DEFAULT_CREDENTIALS_FILE = Path("config/service_account.json")
+# Số kết nối giữ sẵn tới googleapis.com
+POOL_SIZE = 10
+
+
+def credentials_file():
+    """File service account: ưu tiên biến môi trường GOOGLE_CREDENTIALS_FILE"""
+    return os.getenv("GOOGLE_CREDENTIALS_FILE") or str(DEFAULT_CREDENTIALS_FILE)
+
+
+def authorize_client(credentials_path=None, scheduler=API_SCHEDULER):
+    """Client gspread đã xác thực, mọi request đi qua pool kết nối và scheduler"""
+    if gspread is None:
+        raise RuntimeError("Thiếu thư viện! Chạy: pip install gspread google-auth")
+    creds = Credentials.from_service_account_file(
+        credentials_path or credentials_file(), scopes=SCOPES
+    )
+    # AuthorizedSession tự làm mới access token khi hết hạn trước mỗi request
+    session = AuthorizedSession(creds)
+    # Pool kết nối; giới hạn tốc độ, thử lại (429, hoặc 5xx với GET) và gộp các
+    # GET trùng nhau ở tầng adapter
+    throttle_session(
+        session, scheduler, pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE
+    )
+    return gspread.Client(auth=creds, session=session)
+
+
+class SheetsSession:
+    """Client, spreadsheet và worksheet được tạo một lần rồi dùng lại
+
+    client: truyền sẵn một client (ví dụ FakeSheetsClient) để bỏ qua xác thực
+    """
+
+    def __init__(self, spreadsheet_id, credentials_path=None, client=None):
+        self.spreadsheet_id = spreadsheet_id
+        self.credentials_path = credentials_path
+        self._client = client
+        self._spreadsheet = None
+        self._worksheets = None
+        self._lock = threading.RLock()
+        self.auth_count = 0
+
+    def _authorize(self):
+        """Xác thực service account và tạo HTTP session có pool kết nối"""
+        self.auth_count += 1
+        return authorize_client(self.credentials_path)
+
+    @property
+    def client(self):
+        """Client đã xác thực (chỉ xác thực ở lần dùng đầu tiên)"""
+        with self._lock:
+            if self._client is None:
+                self._client = self._authorize()
+            return self._client
+
+    @property
+    def spreadsheet(self):
+        """Spreadsheet theo ID, chỉ mở một lần"""
+        with self._lock:
+            if self._spreadsheet is None:
+                if not self.spreadsheet_id:
+                    raise ValueError("Không tìm thấy Spreadsheet ID trong config")
+                self._spreadsheet = self.client.open_by_key(self.spreadsheet_id)
+            return self._spreadsheet
+
+    def worksheet(self, title):
+        """Handle worksheet theo tên; lấy metadata mọi worksheet trong một request"""
+        with self._lock:
+            if self._worksheets is None or title not in self._worksheets:
+                # Lần đầu hoặc worksheet mới được tạo từ nơi khác: tải lại danh sách
+                self._worksheets = {
+                    worksheet.title: worksheet
+                    for worksheet in self.spreadsheet.worksheets()
+                }
+            if title not in self._worksheets:
+                raise KeyError(f"Không tìm thấy worksheet: {title}")
+            return self._worksheets[title]
+
+    def add_worksheet(self, title, rows, cols):
+        """Tạo worksheet mới và giữ luôn handle (không phải tải lại danh sách)"""
+        with self._lock:
+            worksheet = self.spreadsheet.add_worksheet(title, rows=rows, cols=cols)
+            if self._worksheets is not None:
+                self._worksheets[title] = worksheet
+            return worksheet
+
+    def reset(self):
+        """Bỏ các handle đã cache (giữ client), ví dụ sau khi đổi cấu trúc sheet"""
+        with self._lock:
+            self._spreadsheet = None
+            self._worksheets = None
+
+
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def get_session(spreadsheet_id, credentials_path=None):
+    """Phiên dùng chung trong tiến trình cho mỗi (spreadsheet, credentials)"""
+    key = (spreadsheet_id, credentials_path or credentials_file())
+    with _SESSIONS_LOCK:
+        if key not in _SESSIONS:
+            _SESSIONS[key] = SheetsSession(spreadsheet_id, credentials_path)
+        return _SESSIONS[key]
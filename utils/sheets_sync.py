@@ -0,0 +1,312 @@
+"""
+Sheets Sync
+Đồng bộ KPI tổng quan và số liệu theo ngày lên worksheet "Thống kê tổng quan":
+so sánh từng dòng với lần đồng bộ trước và chỉ gửi các vùng đã đổi trong một batch
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from config.config import (
+    AUTO_SYNC,
+    CREDENTIALS_FILE,
+    DATA_PATH,
+    GOOGLE_SHEETS_ENABLED,
+    INTERVAL_HOURS,
+    SCHEDULING_ENABLED,
+    SPREADSHEET_ID,
+)
+from utils.helpers import get_order_aggregates
+from utils.kpi_engine import kpis_from_aggregates
+from utils.sheets_batch import SheetBatchWriter
+from utils.sheets_session import get_session
+
+STATS_WORKSHEET = "Thống kê tổng quan"
+# Số cột của worksheet (các dòng ngắn hơn được đệm ô trống để ghi đè dữ liệu cũ)
+STATS_WIDTH = 9
+# Nới lưới worksheet theo bước này khi số dòng vượt quá kích thước hiện tại
+GRID_ROWS_STEP = 500
+DEFAULT_STATE_PATH = Path(__file__).parent.parent / "data" / "stats_sync.state.json"
+
+KPI_ROWS = (
+    ("Tổng đơn hàng", lambda k: k.total_orders),
+    ("Tỷ lệ xác nhận đúng hạn (%)", lambda k: round(k.confirmation_rate, 1)),
+    ("Tỷ lệ giao hàng đúng hạn (%)", lambda k: round(k.delivery_rate, 1)),
+    ("Tỷ lệ hủy đơn (%)", lambda k: round(k.cancellation_rate, 1)),
+    ("Đơn chờ xử lý", lambda k: k.pending_orders),
+    ("Đơn đã giao", lambda k: k.delivered_orders),
+    ("Đơn đã hủy", lambda k: k.cancelled_orders),
+    ("Tổng giá trị (VND)", lambda k: round(k.total_value)),
+    ("Giá trị trung bình / đơn (VND)", lambda k: round(k.avg_order_value)),
+    (
+        "Thời gian xử lý trung bình (ngày)",
+        lambda k: (
+            "" if k.avg_processing_days is None else round(k.avg_processing_days, 2)
+        ),
+    ),
+)
+
+DAILY_HEADER = [
+    "NGÀY",
+    "TỔNG ĐƠN",
+    "XÁC NHẬN ĐÚNG HẠN",
+    "GIAO ĐÚNG HẠN",
+    "ĐÃ GIAO",
+    "ĐÃ HỦY",
+    "GIÁ TRỊ (VND)",
+    "TỶ LỆ XÁC NHẬN (%)",
+    "TỶ LỆ GIAO (%)",
+]
+
+
+def _pad(row):
+    return list(row) + [""] * (STATS_WIDTH - len(row))
+
+
+def _orders_by_day(aggregates, status):
+    counts = aggregates.rollup(["day"], where={"status": status})
+    return dict(zip(counts["day"], counts["orders"]))
+
+
+def daily_rows(aggregates):
+    """Một dòng cho mỗi ngày (cũ -> mới), để ngày mới chỉ thêm dòng ở cuối"""
+    daily = aggregates.rollup(["day"]).sort_values("day")
+    delivered = _orders_by_day(aggregates, "delivered")
+    cancelled = _orders_by_day(aggregates, "cancelled")
+    rows = []
+    for day, orders, confirmed, on_time, value in zip(
+        daily["day"],
+        daily["orders"],
+        daily["confirmed_ontime"],
+        daily["delivered_ontime"],
+        daily["order_value"],
+    ):
+        rows.append(
+            [
+                day.strftime("%d/%m/%Y"),
+                int(orders),
+                int(confirmed),
+                int(on_time),
+                int(delivered.get(day, 0)),
+                int(cancelled.get(day, 0)),
+                round(float(value)),
+                round(confirmed / orders * 100, 1) if orders else 0,
+                round(on_time / orders * 100, 1) if orders else 0,
+            ]
+        )
+    return rows
+
+
+def stats_rows(aggregates, synced_at=None):
+    """Toàn bộ nội dung worksheet thống kê: tiêu đề, KPI, bảng theo ngày"""
+    synced_at = synced_at or datetime.now()
+    kpis = kpis_from_aggregates(aggregates)
+    rows = [
+        ["📊 THỐNG KÊ TỔNG QUAN"],
+        ["📅 Cập nhật:", synced_at.strftime("%d/%m/%Y %H:%M:%S")],
+        [],
+        ["CHỈ SỐ", "GIÁ TRỊ"],
+    ]
+    rows += [[label, value(kpis)] for label, value in KPI_ROWS]
+    rows += [[], ["📅 THEO NGÀY"], DAILY_HEADER]
+    rows += daily_rows(aggregates)
+    return [_pad(row) for row in rows]
+
+
+def changed_runs(old, new):
+    """Các đoạn dòng liên tiếp khác nhau giữa hai bản: [(dòng đầu 1-based, dòng)]
+
+    Dòng có ở bản cũ nhưng không còn ở bản mới được ghi thành dòng trống
+    """
+    blank = _pad([])
+    runs = []
+    for i in range(max(len(old), len(new))):
+        row = new[i] if i < len(new) else blank
+        if i < len(old) and old[i] == row:
+            continue
+        if runs and runs[-1][0] + len(runs[-1][1]) == i + 1:
+            runs[-1][1].append(row)
+        else:
+            runs.append((i + 1, [row]))
+    return runs
+
+
+class StatsSync:
+    """Đẩy số liệu tổng hợp lên Sheets, chỉ ghi các dòng khác lần đồng bộ trước
+
+    Bản đã đồng bộ được lưu ở state_path (None: chỉ giữ trong bộ nhớ), nên sau
+    khi khởi động lại cũng không phải gửi lại toàn bộ worksheet
+    """
+
+    def __init__(self, session, aggregates_getter, state_path=DEFAULT_STATE_PATH):
+        self.session = session
+        self.aggregates_getter = aggregates_getter
+        self.state_path = Path(state_path) if state_path else None
+        self._state = self._load_state()
+        self._lock = threading.Lock()
+        self.last_sync = None
+        self.last_rows_written = 0
+
+    def _load_state(self):
+        if self.state_path is None:
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_state(self):
+        if self.state_path is None:
+            return
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    def _worksheet(self):
+        """Worksheet thống kê (tạo mới nếu chưa có)"""
+        try:
+            return self.session.worksheet(STATS_WORKSHEET)
+        except KeyError:
+            return self.session.add_worksheet(
+                STATS_WORKSHEET, rows=GRID_ROWS_STEP, cols=STATS_WIDTH
+            )
+
+    def _synced_rows(self, worksheet):
+        """Bản đã gửi lần trước, bỏ qua nếu state thuộc spreadsheet/worksheet khác"""
+        target = [self.session.spreadsheet_id, worksheet.id]
+        if self._state.get("target") != target:
+            self._state = {
+                "target": target,
+                "rows": [],
+                "grid_rows": worksheet.row_count,
+            }
+        return self._state["rows"]
+
+    def sync(self):
+        """Đồng bộ một lần; trả về số dòng đã ghi (0 nếu không có gì đổi)"""
+        with self._lock:
+            rows = stats_rows(self.aggregates_getter())
+            worksheet = self._worksheet()
+            old = self._synced_rows(worksheet)
+            # Chỉ khác thời điểm cập nhật: không cần gửi gì
+            if old[2:] == rows[2:]:
+                self.last_rows_written = 0
+                return 0
+
+            writer = SheetBatchWriter(self.session.spreadsheet)
+            grid_rows = self._state["grid_rows"]
+            if len(rows) > grid_rows:
+                grid_rows = (len(rows) // GRID_ROWS_STEP + 1) * GRID_ROWS_STEP
+                writer.resize(worksheet, rows=grid_rows)
+            runs = changed_runs(old, rows)
+            for start, block in runs:
+                writer.write_rows(worksheet, block, start_row=start)
+            writer.flush()
+
+            self._state["rows"] = rows
+            self._state["grid_rows"] = grid_rows
+            self._save_state()
+            self.last_sync = datetime.now()
+            self.last_rows_written = sum(len(block) for _, block in runs)
+            return self.last_rows_written
+
+
+class SyncScheduler:
+    """Chạy một tác vụ theo chu kỳ interval_hours
+
+    tick() chạy tác vụ nếu đã tới hạn (dùng trực tiếp với đồng hồ giả khi kiểm
+    thử); start() chạy tick trong luồng nền
+    """
+
+    def __init__(self, job, interval_hours=INTERVAL_HOURS, clock=time.monotonic):
+        self.job = job
+        self.interval = interval_hours * 3600
+        self.clock = clock
+        self.next_run = None
+        self.runs = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def due(self):
+        return self.next_run is None or self.clock() >= self.next_run
+
+    def tick(self):
+        """Chạy tác vụ nếu tới hạn; trả về True nếu đã chạy"""
+        with self._lock:
+            if not self.due():
+                return False
+            try:
+                self.job()
+                self.last_error = None
+            except Exception as e:
+                # Lỗi mạng / quota: giữ lịch, thử lại ở chu kỳ sau
+                self.last_error = e
+            self.runs += 1
+            self.next_run = self.clock() + self.interval
+            return True
+
+    def trigger(self):
+        """Chạy ở lần tick kế tiếp (ngay lập tức nếu luồng nền đang chạy)"""
+        self.next_run = None
+        if self._thread is not None:
+            self._wakeup.set()
+        else:
+            threading.Thread(
+                target=self.tick, name="sheets-sync-once", daemon=True
+            ).start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.tick()
+            wait = max(0.0, self.next_run - self.clock()) if self.next_run else 0.0
+            self._wakeup.wait(min(wait, 60.0))
+            self._wakeup.clear()
+
+    def start(self):
+        """Chạy theo lịch trong luồng nền (gọi nhiều lần cũng chỉ một luồng)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="sheets-sync", daemon=True
+                )
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+
+_SCHEDULER = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_stats_scheduler():
+    """Lịch đồng bộ thống kê dùng chung trong tiến trình (None nếu tắt Google Sheets)"""
+    global _SCHEDULER
+    if not (GOOGLE_SHEETS_ENABLED and SPREADSHEET_ID):
+        return None
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            session = get_session(SPREADSHEET_ID, CREDENTIALS_FILE or None)
+            sync = StatsSync(session, lambda: get_order_aggregates(DATA_PATH))
+            _SCHEDULER = SyncScheduler(sync.sync)
+        return _SCHEDULER
+
+
+def start_auto_sync():
+    """Bật đồng bộ định kỳ khi cấu hình cho phép (scheduling + auto_sync)"""
+    scheduler = get_stats_scheduler()
+    if scheduler is not None and AUTO_SYNC and SCHEDULING_ENABLED:
+        scheduler.start()
+    return scheduler
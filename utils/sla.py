@@ -0,0 +1,228 @@
+"""
+SLA Levels
+Phân loại mức trễ hạn (warning_levels) cho từng đơn: số ngày trễ so với thời hạn
+xác nhận theo mức ưu tiên và thời hạn giao theo nhóm vùng (region_rules), chia
+mức bằng một lượt searchsorted trên toàn bộ mảng
+"""
+
+import numpy as np
+import pandas as pd
+
+from config.config import (
+    CONFIRMATION_DEADLINES,
+    DELIVERY_DEADLINES,
+    REGION_RULES,
+    WARNING_LEVELS,
+)
+from utils.alerts import deadline_lookup
+from utils.column_buffer import FrameBuffer
+
+# Các giai đoạn được đo trễ hạn: (khóa, nhãn hiển thị)
+SLA_STAGES = (
+    ("confirmation", "Xác nhận"),
+    ("delivery", "Giao hàng"),
+    ("overall", "Tổng"),
+)
+
+
+def region_deadlines(df, region_rules=None, deadlines=None):
+    """Thời hạn giao (ngày) theo nhóm vùng, giao nhanh nếu shipping_method là express
+
+    Vùng không thuộc nhóm nào dùng delivery_deadlines.default
+    """
+    region_rules = REGION_RULES if region_rules is None else region_rules
+    deadlines = DELIVERY_DEADLINES if deadlines is None else deadlines
+    region = df["region"]
+    if not isinstance(region.dtype, pd.CategoricalDtype):
+        region = region.astype("category")
+
+    tiers = {
+        name: tier for tier in region_rules.values() for name in tier.get("regions", [])
+    }
+    default = deadlines.get("default", np.nan)
+    codes = region.cat.codes.to_numpy()
+    standard = np.array(
+        [
+            tiers.get(name, {}).get("delivery_time_standard", default)
+            for name in region.cat.categories
+        ]
+        + [default],
+        dtype=float,
+    )[codes]
+
+    if "shipping_method" not in df.columns:
+        return standard
+    express = np.array(
+        [
+            tiers.get(name, {}).get("delivery_time_express", default)
+            for name in region.cat.categories
+        ]
+        + [default],
+        dtype=float,
+    )[codes]
+    return np.where(df["shipping_method"].to_numpy() == "express", express, standard)
+
+
+class WarningLevels:
+    """Các mức của warning_levels, sắp theo min_delay_days
+
+    Mức của một số ngày trễ d là mức cuối cùng có min_delay_days <= d (khoảng
+    giữa max của mức trước và min của mức sau thuộc về mức trước)
+    """
+
+    def __init__(self, levels=None):
+        levels = WARNING_LEVELS if levels is None else levels
+        ordered = sorted(
+            levels.items(), key=lambda item: item[1].get("min_delay_days", 0)
+        )
+        self.names = [name for name, _ in ordered]
+        self.settings = dict(ordered)
+        self.edges = np.array(
+            [level.get("min_delay_days", 0) for _, level in ordered], float
+        )
+
+    def classify(self, delay_days):
+        """Mã mức (vị trí trong self.names) cho mảng số ngày trễ"""
+        codes = np.searchsorted(self.edges, delay_days, side="right") - 1
+        # Trễ nhỏ hơn mức thấp nhất (không xảy ra với số ngày trễ >= 0) vẫn là mức đầu
+        return np.clip(codes, 0, None).astype(np.int8)
+
+    def color(self, name):
+        return self.settings[name].get("color")
+
+
+def delay_days(hours, deadline_days):
+    """Số ngày trễ (làm tròn lên, 0 nếu đúng hạn) của thời gian xử lý so với thời hạn"""
+    late = np.asarray(hours, dtype=float) / 24 - deadline_days
+    return np.ceil(np.clip(late, 0, None))
+
+
+class SlaLevels:
+    """Mức trễ hạn của từng đơn theo giai đoạn, cùng thứ tự dòng với frame nguồn
+
+    codes[stage]: mã mức (theo levels.names) cho mỗi đơn; breakdown() đếm theo mức
+    bằng bincount nên lọc theo khoảng ngày không cần copy frame. Có priorities
+    (PriorityRules) thì append(batch) phân loại riêng lô mới và nối vào
+    """
+
+    def __init__(
+        self, levels, order_dates, regions, delays, codes=None, priorities=None
+    ):
+        self.levels = levels
+        self.order_dates = order_dates
+        self.regions = regions
+        self.delays = delays
+        if codes is None:
+            codes = {stage: levels.classify(days) for stage, days in delays.items()}
+        self.codes = codes
+        self.priorities = priorities
+        self._buffer = None
+
+    def __len__(self):
+        return len(self.order_dates)
+
+    def _frame(self):
+        columns = {"order_date": self.order_dates, "region": self.regions}
+        for stage, _ in SLA_STAGES:
+            columns[f"{stage}_delay"] = self.delays[stage]
+            columns[f"{stage}_level"] = self.codes[stage]
+        return pd.DataFrame(columns, copy=False)
+
+    def append(self, batch):
+        """Phiên bản mới gồm cả batch; None nếu không có priorities để phân loại lô"""
+        if self.priorities is None:
+            return None
+        if batch is None or batch.empty:
+            return self
+        added = classify_orders(
+            batch, None, self.priorities.names, self.levels, self.priorities
+        )
+        buffer = self._buffer or FrameBuffer(self._frame())
+        buffer.append(added._frame())
+
+        frame = buffer.frame()
+        appended = SlaLevels(
+            self.levels,
+            frame["order_date"].to_numpy(),
+            frame["region"].array,
+            {stage: frame[f"{stage}_delay"].to_numpy() for stage, _ in SLA_STAGES},
+            {stage: frame[f"{stage}_level"].to_numpy() for stage, _ in SLA_STAGES},
+            self.priorities,
+        )
+        appended._buffer = buffer
+        return appended
+
+    def _mask(self, start=None, end=None):
+        if start is None and end is None:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.order_dates >= np.datetime64(pd.Timestamp(start))
+        if end is not None:
+            mask &= self.order_dates < np.datetime64(
+                pd.Timestamp(end) + pd.Timedelta(days=1)
+            )
+        return mask
+
+    def _counts(self, codes, mask):
+        if mask is not None:
+            codes = codes[mask]
+        return np.bincount(codes, minlength=len(self.levels.names))
+
+    def breakdown(self, start=None, end=None):
+        """Số đơn theo mức (dòng) × giai đoạn (cột)"""
+        mask = self._mask(start, end)
+        return pd.DataFrame(
+            {stage: self._counts(self.codes[stage], mask) for stage, _ in SLA_STAGES},
+            index=pd.Index(self.levels.names, name="level"),
+        )
+
+    def by_region(self, stage="overall", start=None, end=None):
+        """Số đơn theo vùng (dòng) × mức (cột) của một giai đoạn"""
+        mask = self._mask(start, end)
+        codes, regions = self.codes[stage], self.regions
+        if mask is not None:
+            codes, regions = codes[mask], regions[mask]
+        width = len(self.levels.names)
+        region_codes = regions.codes
+        valid = region_codes >= 0
+        counts = np.bincount(
+            region_codes[valid].astype(np.int64) * width + codes[valid],
+            minlength=len(regions.categories) * width,
+        ).reshape(len(regions.categories), width)
+        return pd.DataFrame(
+            counts,
+            index=pd.Index(regions.categories, name="region"),
+            columns=self.levels.names,
+        )
+
+
+def classify_orders(df, priority_codes, priority_names, levels=None, priorities=None):
+    """Phân loại trễ hạn cho mọi đơn trong một lượt
+
+    priority_codes / priority_names: mức ưu tiên của từng đơn (PriorityRules.codes)
+    để tra thời hạn xác nhận theo confirmation_deadlines. priorities: PriorityRules
+    để tính mức ưu tiên khi priority_codes là None và khi nối thêm lô mới
+    """
+    levels = levels or WarningLevels()
+    if priority_codes is None:
+        priority_codes, _ = priorities.codes(df)
+    confirmation = delay_days(
+        df["confirm_hours"].to_numpy(),
+        deadline_lookup(CONFIRMATION_DEADLINES, priority_names, priority_codes),
+    )
+    delivery = delay_days(df["delivery_hours"].to_numpy(), region_deadlines(df))
+    regions = df["region"]
+    if not isinstance(regions.dtype, pd.CategoricalDtype):
+        regions = regions.astype("category")
+    return SlaLevels(
+        levels,
+        df["order_date"].to_numpy(),
+        regions.array,
+        {
+            "confirmation": confirmation,
+            "delivery": delivery,
+            "overall": np.maximum(confirmation, delivery),
+        },
+        priorities=priorities,
+    )
@@ -0,0 +1,396 @@
+"""
+Order Snapshot
+Nén file CSV đơn hàng thành snapshot Parquet phân vùng theo tháng đặt hàng,
+kèm một file Arrow IPC để đọc bằng memory-map
+"""
+
+import json
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.order_schema import ORDER_COLUMNS, ORDER_SCHEMA, read_orders_csv
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow là thư viện tùy chọn, thiếu thì đọc thẳng CSV
+    pa = None
+    pq = None
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+SNAPSHOT_FORMAT = 2
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".lock"
+IPC_NAME = "orders.arrow"
+READ_MODES = ("parquet", "mmap")
+# Số dòng lỗi tối đa lưu lại trong manifest
+MAX_STORED_ISSUES = 1000
+
+
+def snapshot_available():
+    """Kiểm tra đã cài pyarrow để dùng snapshot hay chưa"""
+    return pq is not None
+
+
+def snapshot_dir_for(csv_path):
+    """Thư mục snapshot mặc định đi kèm file CSV"""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(f"{csv_path.stem}.snapshot")
+
+
+def source_signature(csv_path):
+    """Chữ ký (mtime, kích thước) của file nguồn"""
+    stat = os.stat(csv_path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def load_manifest(snapshot_dir):
+    """Đọc manifest của snapshot, trả về None nếu chưa có"""
+    try:
+        with open(Path(snapshot_dir) / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        return None
+    return manifest
+
+
+def is_snapshot_fresh(csv_path, snapshot_dir=None):
+    """Snapshot còn khớp với file CSV nguồn hay không"""
+    snapshot_dir = snapshot_dir or snapshot_dir_for(csv_path)
+    manifest = load_manifest(snapshot_dir)
+    if manifest is None:
+        return False
+    if not os.path.exists(csv_path):
+        # Không còn CSV nguồn: snapshot là bản duy nhất
+        return True
+    return manifest["source"] == source_signature(csv_path)
+
+
+@contextmanager
+def _publish_lock(snapshot_dir):
+    """Khóa độc quyền (có chờ) giữa các tiến trình khi công bố / dọn phiên bản"""
+    with open(Path(snapshot_dir) / LOCK_NAME, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _write_snapshot(frame, target):
+    """Ghi các phân vùng Parquet và file Arrow IPC vào target, trả về các phân vùng"""
+    partitions = []
+    months = frame["order_date"].dt.to_period("M")
+    for month, part in frame.groupby(months, sort=True):
+        month = str(month)
+        relative = f"order_month={month}/part-0.parquet"
+        path = target / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(
+            part.sort_values("order_date"), preserve_index=False
+        )
+        pq.write_table(table, path)
+        partitions.append(
+            {
+                "month": month,
+                "file": relative,
+                "rows": len(part),
+                "min_date": part["order_date"].min().isoformat(),
+                "max_date": part["order_date"].max().isoformat(),
+            }
+        )
+
+    # Bản Arrow IPC không nén, một record batch, sắp theo ngày: các tiến trình
+    # memory-map cùng file nên dùng chung trang bộ nhớ thay vì mỗi worker một bản
+    ipc_table = pa.Table.from_pandas(
+        frame.sort_values("order_date", kind="stable"), preserve_index=False
+    ).combine_chunks()
+    with pa.OSFile(str(target / IPC_NAME), "wb") as sink:
+        with pa.ipc.new_file(sink, ipc_table.schema) as writer:
+            writer.write_table(ipc_table)
+    return partitions
+
+
+def _publish(snapshot_dir, staging, manifest):
+    """Đưa thư mục tạm thành phiên bản của manifest (gọi khi giữ khóa)
+
+    Trả về manifest đang dùng: nếu tiến trình khác vừa nén cùng chữ ký thì
+    giữ bản của tiến trình đó. Các phiên bản cũ bị dọn, trừ bản manifest trước
+    đó trỏ tới vì tiến trình khác có thể vẫn đang đọc
+    """
+    current = load_manifest(snapshot_dir)
+    if (
+        current is not None
+        and current["source"] == manifest["source"]
+        and (snapshot_dir / current["data_dir"]).exists()
+    ):
+        return current
+
+    final = snapshot_dir / manifest["data_dir"]
+    # Cùng tên mà manifest không trỏ tới: phần còn lại của lần nén bị dừng
+    shutil.rmtree(final, ignore_errors=True)
+    os.replace(staging, final)
+
+    manifest_tmp = snapshot_dir / f".{MANIFEST_NAME}.tmp"
+    with open(manifest_tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_tmp, snapshot_dir / MANIFEST_NAME)
+
+    keep = {manifest["data_dir"]}
+    if current is not None:
+        keep.add(current["data_dir"])
+    for old in snapshot_dir.glob("v-*"):
+        if old.name not in keep:
+            shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+
+def compact_csv(csv_path, snapshot_dir=None, signature=None):
+    """Nén CSV thành snapshot Parquet theo tháng, trả về manifest mới
+
+    signature: chữ ký của phần file cần nén (mặc định: hiện tại); chỉ đọc đúng
+    signature["size"] byte đầu nên dòng được ghi nối trong lúc nén không lọt
+    vào snapshot mang chữ ký cũ
+    """
+    if not snapshot_available():
+        raise RuntimeError("Cần cài pyarrow để tạo snapshot (pip install pyarrow)")
+
+    snapshot_dir = Path(snapshot_dir or snapshot_dir_for(csv_path))
+    signature = signature or source_signature(csv_path)
+    frame, issues = read_orders_csv(csv_path, size=signature["size"])
+
+    # Mỗi lần nén ghi vào thư mục tạm riêng của tiến trình (nhiều worker có thể
+    # cùng nén một chữ ký), chỉ bước công bố và dọn dẹp chạy dưới khóa; manifest
+    # được thay thế nguyên tử nên không ai đọc phải snapshot dở dang
+    data_dir = f"v-{signature['mtime_ns']}-{signature['size']}"
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    staging = snapshot_dir / f".{data_dir}.{os.getpid()}-{uuid.uuid4().hex}.tmp"
+    staging.mkdir()
+    try:
+        partitions = _write_snapshot(frame, staging)
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "source": signature,
+            "data_dir": data_dir,
+            "rows": len(frame),
+            "min_date": frame["order_date"].min().isoformat() if len(frame) else None,
+            "max_date": frame["order_date"].max().isoformat() if len(frame) else None,
+            "partitions": partitions,
+            "ipc_file": IPC_NAME,
+            "invalid_rows": int(issues["line"].nunique()),
+            "issues": issues.head(MAX_STORED_ISSUES)
+            .astype({"value": str})
+            .to_dict("records"),
+        }
+        with _publish_lock(snapshot_dir):
+            return _publish(snapshot_dir, staging, manifest)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _select_partitions(manifest, start=None, end=None):
+    """Chọn các phân vùng giao với khoảng [start, end]"""
+    selected = []
+    for partition in manifest["partitions"]:
+        if start is not None and pd.Timestamp(partition["max_date"]) < start:
+            continue
+        if end is not None and pd.Timestamp(partition["min_date"]) > end:
+            continue
+        selected.append(partition)
+    return selected
+
+
+def _empty_frame(columns):
+    """Frame rỗng đúng schema"""
+    return pd.DataFrame(
+        {column: pd.Series(dtype=ORDER_SCHEMA[column]) for column in columns}
+    )
+
+
+def _window_bounds(start=None, end=None):
+    """Chuẩn hóa khoảng ngày: start tính từ đầu ngày, end tính hết ngày"""
+    if start is not None:
+        start = pd.Timestamp(start).normalize()
+    if end is not None:
+        end = pd.Timestamp(end).normalize() + pd.Timedelta(days=1, microseconds=-1)
+    return start, end
+
+
+def read_snapshot(snapshot_dir, columns=None, start=None, end=None, manifest=None):
+    """Đọc snapshot, chỉ lấy các cột và phân vùng ngày cần thiết
+
+    manifest: manifest đã kiểm tra chữ ký (mặc định đọc bản hiện tại)
+    """
+    manifest = manifest or load_manifest(snapshot_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"Không tìm thấy snapshot: {snapshot_dir}")
+
+    columns = list(columns) if columns is not None else ORDER_COLUMNS
+    start, end = _window_bounds(start, end)
+    partitions = _select_partitions(manifest, start, end)
+    if not partitions:
+        return _empty_frame(columns)
+
+    # Cần order_date để cắt chính xác theo ngày trong phân vùng biên
+    filter_by_date = start is not None or end is not None
+    read_columns = list(columns)
+    if filter_by_date and "order_date" not in read_columns:
+        read_columns.append("order_date")
+
+    data_dir = Path(snapshot_dir) / manifest["data_dir"]
+    table = pa.concat_tables(
+        [pq.read_table(data_dir / p["file"], columns=read_columns) for p in partitions]
+    )
+    frame = table.to_pandas()
+
+    if filter_by_date:
+        mask = pd.Series(True, index=frame.index)
+        if start is not None:
+            mask &= frame["order_date"] >= start
+        if end is not None:
+            mask &= frame["order_date"] <= end
+        frame = frame[mask].reset_index(drop=True)
+
+    return _restore_categories(frame, columns)[columns]
+
+
+def read_snapshot_mmap(snapshot_dir, columns=None, start=None, end=None, manifest=None):
+    """Đọc snapshot qua memory-map file Arrow IPC, không sao chép dữ liệu
+
+    manifest: như read_snapshot
+    """
+    manifest = manifest or load_manifest(snapshot_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"Không tìm thấy snapshot: {snapshot_dir}")
+
+    columns = list(columns) if columns is not None else ORDER_COLUMNS
+    path = Path(snapshot_dir) / manifest["data_dir"] / manifest["ipc_file"]
+    table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+    if table.num_rows == 0:
+        return _empty_frame(columns)
+
+    # File đã sắp theo order_date: khoảng ngày là một lát cắt liên tục
+    start, end = _window_bounds(start, end)
+    if start is not None or end is not None:
+        dates = table.column("order_date").chunk(0).to_numpy(zero_copy_only=True)
+        lo = 0 if start is None else np.searchsorted(dates, start.to_datetime64())
+        hi = len(dates)
+        if end is not None:
+            hi = np.searchsorted(dates, end.to_datetime64(), side="right")
+        table = table.slice(lo, hi - lo)
+
+    # split_blocks giữ các cột số / thời gian trỏ thẳng vào vùng nhớ đã map;
+    # order_id là object như ORDER_SCHEMA, giống chế độ parquet và đọc CSV
+    frame = table.select(columns).to_pandas(split_blocks=True)
+    return _restore_categories(frame, columns)
+
+
+def _restore_categories(frame, columns):
+    """Arrow có thể sắp xếp lại dictionary, khôi phục thứ tự categories cố định"""
+    for column in columns:
+        dtype = ORDER_SCHEMA[column]
+        if isinstance(dtype, pd.CategoricalDtype) and not frame[
+            column
+        ].cat.categories.equals(dtype.categories):
+            frame[column] = frame[column].cat.set_categories(dtype.categories)
+    return frame
+
+
+def project_orders(frame, columns=None, start=None, end=None):
+    """Lọc cột và khoảng ngày trên frame đã tải đầy đủ (hoặc một lô đơn mới)"""
+    start, end = _window_bounds(start, end)
+    if start is not None:
+        frame = frame[frame["order_date"] >= start]
+    if end is not None:
+        frame = frame[frame["order_date"] <= end]
+    if columns is not None:
+        frame = frame[list(columns)]
+    return frame.reset_index(drop=True)
+
+
+def _read_prefix(csv_path, signature, columns=None, start=None, end=None):
+    """Đọc thẳng từ CSV phần file ứng với chữ ký, không qua snapshot"""
+    frame, issues = read_orders_csv(csv_path, size=signature["size"])
+    return project_orders(frame, columns, start, end), issues
+
+
+def read_orders(
+    csv_path, columns=None, start=None, end=None, mode="parquet", signature=None
+):
+    """Đọc đơn hàng qua snapshot (tự nén lại khi CSV thay đổi), trả về (frame, lỗi)
+
+    signature: (mtime_ns, kích thước) của file nguồn mà dữ liệu trả về phải
+    khớp, để người gọi ghép tiếp phần được ghi nối sau chữ ký đó không bị trùng
+    """
+    if mode not in READ_MODES:
+        raise ValueError(f"Chế độ đọc không hợp lệ: {mode}")
+    if signature is not None:
+        signature = {"mtime_ns": signature[0], "size": signature[1]}
+    if not snapshot_available():
+        return _read_prefix(
+            csv_path, signature or source_signature(csv_path), columns, start, end
+        )
+
+    snapshot_dir = snapshot_dir_for(csv_path)
+    if signature is None:
+        if is_snapshot_fresh(csv_path, snapshot_dir):
+            manifest = load_manifest(snapshot_dir)
+        else:
+            manifest = compact_csv(csv_path, snapshot_dir)
+    else:
+        manifest = load_manifest(snapshot_dir)
+        if manifest is None or manifest["source"] != signature:
+            if source_signature(csv_path) != signature:
+                # File đã được ghi thêm sau chữ ký: đọc đúng phần cũ từ CSV,
+                # không ghi đè snapshot bằng một phiên bản đã cũ
+                return _read_prefix(csv_path, signature, columns, start, end)
+            manifest = compact_csv(csv_path, snapshot_dir, signature)
+
+    issues = pd.DataFrame(manifest["issues"], columns=["line", "column", "value"])
+    # Manifest chỉ giữ MAX_STORED_ISSUES dòng lỗi đầu, số dòng bị loại lấy từ manifest
+    issues.attrs["invalid_rows"] = manifest["invalid_rows"]
+    # Đọc đúng phiên bản của manifest đã kiểm tra, không phải bản mà tiến
+    # trình khác có thể vừa công bố
+    if mode == "mmap":
+        frame = read_snapshot_mmap(snapshot_dir, columns, start, end, manifest)
+    else:
+        frame = read_snapshot(snapshot_dir, columns, start, end, manifest)
+    return frame, issues
+
+
+def read_orders_date_range(csv_path):
+    """Ngày đặt hàng sớm nhất và muộn nhất, lấy từ manifest nếu có"""
+    if snapshot_available():
+        snapshot_dir = snapshot_dir_for(csv_path)
+        if not is_snapshot_fresh(csv_path, snapshot_dir):
+            compact_csv(csv_path, snapshot_dir)
+        manifest = load_manifest(snapshot_dir)
+        if manifest["min_date"] is None:
+            return None, None
+        return pd.Timestamp(manifest["min_date"]), pd.Timestamp(manifest["max_date"])
+
+    frame, _ = read_orders_csv(csv_path)
+    if frame.empty:
+        return None, None
+    return frame["order_date"].min(), frame["order_date"].max()